@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+
+from psycopg2.extras import execute_values
+
+from odoo.addons.eazynova.models.eazynova_facial_service import pack_encoding
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Convertit les encodages JSON au format binaire"""
+    cr.execute("""
+        SELECT 1
+          FROM information_schema.columns
+         WHERE table_name = 'eazynova_facial_data'
+           AND column_name = 'encoding_data_legacy'
+    """)
+    if not cr.fetchone():
+        return
+
+    cr.execute("""
+        SELECT id, encoding_data_legacy
+          FROM eazynova_facial_data
+         WHERE encoding_data_legacy IS NOT NULL
+    """)
+
+    values = []
+    for record_id, encoding_json in cr.fetchall():
+        try:
+            values.append((record_id, pack_encoding(json.loads(encoding_json))))
+        except ValueError:
+            _logger.warning("Encodage facial illisible non migré (enregistrement %s)", record_id)
+
+    if values:
+        execute_values(cr, """
+            UPDATE eazynova_facial_data AS data
+               SET encoding_vector = v.encoding_vector
+              FROM (VALUES %s) AS v (id, encoding_vector)
+             WHERE data.id = v.id
+        """, values, template="(%s, %s::bytea)")
+
+    cr.execute("ALTER TABLE eazynova_facial_data DROP COLUMN encoding_data_legacy")
+    _logger.info("%d encodage(s) facial(aux) converti(s) au format binaire", len(values))
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Met de côté les encodages JSON avant que encoding_data ne devienne calculé"""
+    cr.execute("""
+        SELECT 1
+          FROM information_schema.columns
+         WHERE table_name = 'eazynova_facial_data'
+           AND column_name = 'encoding_data'
+    """)
+    if cr.fetchone():
+        cr.execute("ALTER TABLE eazynova_facial_data RENAME COLUMN encoding_data TO encoding_data_legacy")
+        _logger.info("Encodages faciaux JSON conservés dans encoding_data_legacy")
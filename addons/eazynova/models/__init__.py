@@ -2,6 +2,7 @@
 
 from . import eazynova_ai_service
 from . import eazynova_facial_service
+from . import eazynova_ocr_service
 from . import res_config_settings
 from . import res_company
 from . import res_users
@@ -2,11 +2,16 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from .eazynova_facial_service import is_packed_encoding, load_encoding, pack_encoding
 import base64
+import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Champs dont la modification invalide l'index des visages
+FACE_INDEX_FIELDS = {'user_id', 'encoding_data', 'encoding_vector', 'active'}
+
 
 class EazynovaFacialData(models.Model):
     _name = 'eazynova.facial.data'
@@ -37,8 +42,18 @@ class EazynovaFacialData(models.Model):
         help="Photo utilisée pour l'enregistrement facial"
     )
 
+    encoding_vector = fields.Binary(
+        string='Encodage Facial',
+        attachment=False,
+        copy=False,
+        readonly=True,
+        help="Encodage facial au format binaire (128 float32 précédés d'un en-tête de version)"
+    )
+
     encoding_data = fields.Text(
         string='Données d\'Encodage',
+        compute='_compute_encoding_data',
+        inverse='_inverse_encoding_data',
         help="Encodage facial pour la reconnaissance (format JSON)"
     )
 
@@ -76,6 +91,24 @@ class EazynovaFacialData(models.Model):
 
     note = fields.Text(string='Notes')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Les statistiques de vérification n'invalident pas l'index
+        if FACE_INDEX_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends('user_id')
     def _compute_name(self):
         for record in self:
@@ -84,6 +117,23 @@ class EazynovaFacialData(models.Model):
             else:
                 record.name = "Facial Data"
 
+    @api.depends('encoding_vector')
+    def _compute_encoding_data(self):
+        for record in self:
+            # bin_size renverrait la taille du champ au lieu de son contenu
+            vector = record.with_context(bin_size=False).encoding_vector
+            if is_packed_encoding(vector):
+                record.encoding_data = json.dumps(load_encoding(vector).tolist())
+            else:
+                record.encoding_data = False
+
+    def _inverse_encoding_data(self):
+        for record in self:
+            if record.encoding_data:
+                record.encoding_vector = pack_encoding(json.loads(record.encoding_data))
+            else:
+                record.encoding_vector = False
+
     @api.constrains('user_id')
     def _check_unique_user(self):
         """Un seul enregistrement facial actif par utilisateur"""
@@ -117,7 +167,7 @@ class EazynovaFacialData(models.Model):
 
             # Mettre à jour les données
             self.write({
-                'encoding_data': result.get('encoding'),
+                'encoding_vector': result.get('encoding_vector'),
                 'face_count': result.get('face_count', 0),
                 'quality_score': result.get('quality_score', 0),
                 'registration_date': fields.Datetime.now()
@@ -149,14 +199,14 @@ class EazynovaFacialData(models.Model):
         """Vérifie un visage contre les données enregistrées"""
         self.ensure_one()
 
-        if not self.encoding_data:
+        if not self.encoding_vector:
             raise UserError(_("Aucune donnée d'encodage disponible. Veuillez réenregistrer."))
 
         try:
             facial_service = self.env['eazynova.facial.service']
             result = facial_service.verify_face(
                 photo_to_verify,
-                self.encoding_data
+                self.encoding_vector
             )
 
             # Mettre à jour les statistiques
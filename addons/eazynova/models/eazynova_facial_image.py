@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Prétraitement des photos pour la reconnaissance faciale.
+
+Fonctions sans dépendance à Odoo (PIL et numpy seulement), partagées par
+eazynova.facial.service et le script de mesure
+scripts/benchmark_facial_detection.py.
+"""
+
+import io
+
+from PIL import Image, ImageOps
+
+# Plus grand côté de l'image utilisée pour la détection (pixels)
+DEFAULT_MAX_EDGE = 800
+
+# Nombre de suréchantillonnages de la détection (0 = aucun)
+DEFAULT_UPSAMPLE = 1
+
+# Modèle de détection face_recognition : 'hog' (CPU) ou 'cnn' (GPU conseillé)
+DEFAULT_MODEL = 'hog'
+DETECTION_MODELS = ('hog', 'cnn')
+
+
+def prepare_image(image_data, max_edge=DEFAULT_MAX_EDGE):
+    """
+    Décode une photo, applique l'orientation EXIF et en prépare une copie
+    réduite pour la détection
+
+    :param image_data: octets de l'image
+    :param max_edge: plus grand côté de la copie réduite (0 = pas de réduction)
+    :return: tuple (image RGB pleine résolution, image RGB réduite, facteur
+             d'échelle pleine résolution / réduite)
+    """
+    image = Image.open(io.BytesIO(image_data))
+
+    # Les téléphones enregistrent souvent la rotation dans l'EXIF
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    longest = max(image.size)
+    if not max_edge or longest <= max_edge:
+        return image, image, 1.0
+
+    scale = longest / float(max_edge)
+    size = (max(1, round(image.width / scale)), max(1, round(image.height / scale)))
+    small = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return image, small, image.width / float(small.width)
+
+
+def scale_box(box, scale, width, height):
+    """
+    Ramène un cadre de visage détecté sur l'image réduite à la pleine
+    résolution
+
+    :param box: tuple (haut, droite, bas, gauche) de face_recognition
+    :return: tuple (haut, droite, bas, gauche) borné à l'image d'origine
+    """
+    top, right, bottom, left = box
+    return (
+        max(0, int(round(top * scale))),
+        min(width, int(round(right * scale))),
+        min(height, int(round(bottom * scale))),
+        max(0, int(round(left * scale))),
+    )
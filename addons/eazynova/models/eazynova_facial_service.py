@@ -1,13 +1,118 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, api, _
+from odoo import models, api, tools, _
 from odoo.exceptions import UserError
 import base64
 import json
 import logging
 
+import numpy as np
+
+from .eazynova_facial_image import (
+    DEFAULT_MAX_EDGE, DEFAULT_MODEL, DEFAULT_UPSAMPLE, DETECTION_MODELS,
+    prepare_image, scale_box,
+)
+
 _logger = logging.getLogger(__name__)
 
+# Dimension des encodages produits par face_recognition
+ENCODING_SIZE = 128
+
+# Format binaire des encodages : en-tête (signature + version) sur 4 octets,
+# suivi des 128 composantes en float32 little-endian. L'en-tête occupe la
+# place d'un float32, les composantes restent donc alignées.
+ENCODING_HEADER = b'EZF\x01'
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_BYTES = len(ENCODING_HEADER) + ENCODING_SIZE * ENCODING_DTYPE.itemsize
+
+# Nombre de correspondances renvoyées par identify_user
+IDENTIFY_TOP_K = 3
+
+
+def pack_encoding(encoding):
+    """Encodage facial (liste ou tableau de 128 valeurs) au format binaire"""
+    vector = np.asarray(encoding, dtype=ENCODING_DTYPE).reshape(-1)
+    if vector.size != ENCODING_SIZE:
+        raise ValueError(f"Encodage facial de taille invalide ({vector.size})")
+    return ENCODING_HEADER + vector.tobytes()
+
+
+def is_packed_encoding(blob):
+    """Vrai si les octets sont un encodage binaire de la version courante"""
+    return blob is not None and len(blob) == ENCODING_BYTES \
+        and bytes(blob[:len(ENCODING_HEADER)]) == ENCODING_HEADER
+
+
+def unpack_encoding(blob):
+    """Vue numpy (sans copie) sur un encodage binaire"""
+    if not is_packed_encoding(blob):
+        raise ValueError("Format d'encodage facial inconnu")
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE, offset=len(ENCODING_HEADER))
+
+
+def load_encoding(stored):
+    """Encodage stocké, binaire ou JSON (ancien format), en tableau numpy"""
+    if isinstance(stored, (bytes, bytearray, memoryview)):
+        return unpack_encoding(stored)
+    return np.array(json.loads(stored), dtype=ENCODING_DTYPE)
+
+
+class FaceIndex:
+    """
+    Index des encodages faciaux actifs.
+
+    Les encodages binaires sont concaténés puis vus comme une seule matrice
+    float32 (une ligne par enregistrement, sans décodage) : l'identification
+    se résume à un calcul de distances vectorisé sur toute la matrice.
+    """
+
+    __slots__ = ('facial_data_ids', 'user_ids', 'matrix')
+
+    def __init__(self, rows):
+        """
+        :param rows: tuples (facial_data_id, user_id, encodage binaire)
+        """
+        self.facial_data_ids = []
+        self.user_ids = []
+        blobs = []
+        for facial_data_id, user_id, blob in rows:
+            if not is_packed_encoding(blob):
+                _logger.warning(f"Encodage facial illisible ignoré (enregistrement {facial_data_id})")
+                continue
+            self.facial_data_ids.append(facial_data_id)
+            self.user_ids.append(user_id)
+            blobs.append(blob)
+
+        # Chaque ligne compte 129 float32 : l'en-tête puis les composantes
+        row_size = ENCODING_BYTES // ENCODING_DTYPE.itemsize
+        buffer = np.frombuffer(b''.join(blobs), dtype=ENCODING_DTYPE)
+        self.matrix = buffer.reshape(len(blobs), row_size)[:, 1:]
+
+    def __len__(self):
+        return len(self.facial_data_ids)
+
+    def search(self, encoding, top_k=IDENTIFY_TOP_K):
+        """
+        Enregistrements les plus proches d'un encodage
+
+        :return: liste de tuples (facial_data_id, user_id, distance) triée
+                 par distance croissante
+        """
+        if not len(self):
+            return []
+
+        probe = np.asarray(encoding, dtype=np.float32)
+        distances = np.linalg.norm(self.matrix - probe, axis=1)
+
+        k = min(top_k, len(distances))
+        candidates = np.argpartition(distances, k - 1)[:k]
+        candidates = candidates[np.argsort(distances[candidates])]
+
+        return [
+            (self.facial_data_ids[i], self.user_ids[i], float(distances[i]))
+            for i in candidates
+        ]
+
 
 class EazynovaFacialService(models.AbstractModel):
     """Service de Reconnaissance Faciale EAZYNOVA"""
@@ -27,25 +132,11 @@ class EazynovaFacialService(models.AbstractModel):
             # Vérifier si la bibliothèque face_recognition est disponible
             try:
                 import face_recognition
-                import numpy as np
-                from PIL import Image
-                import io
             except ImportError:
                 return self._register_face_fallback(photo_data, user_id)
 
-            # Décoder l'image
-            image_data = base64.b64decode(photo_data)
-            image = Image.open(io.BytesIO(image_data))
-
-            # Convertir en RGB si nécessaire
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-
-            # Convertir en array numpy
-            image_array = np.array(image)
-
-            # Détecter les visages
-            face_locations = face_recognition.face_locations(image_array)
+            # Détecter les visages (image réduite, cadres en pleine résolution)
+            image_array, face_locations = self._detect_faces(photo_data)
 
             if len(face_locations) == 0:
                 raise UserError(_(
@@ -84,7 +175,7 @@ class EazynovaFacialService(models.AbstractModel):
             # Score de qualité (0-100)
             quality_score = min(100, face_ratio * 500)  # Optimum ~20% de l'image
 
-            # Convertir l'encoding en JSON
+            # Convertir l'encoding en JSON et au format binaire
             encoding_json = json.dumps(encoding.tolist())
 
             _logger.info(
@@ -95,6 +186,7 @@ class EazynovaFacialService(models.AbstractModel):
             return {
                 'success': True,
                 'encoding': encoding_json,
+                'encoding_vector': pack_encoding(encoding),
                 'face_count': len(face_locations),
                 'quality_score': quality_score,
                 'face_location': face_location,
@@ -109,67 +201,127 @@ class EazynovaFacialService(models.AbstractModel):
             raise UserError(_("Erreur lors de l'enregistrement: %s") % str(e))
 
     @api.model
-    def verify_face(self, photo_data, stored_encoding_json, tolerance=0.6):
+    def _get_detection_settings(self):
+        """Paramètres de détection (ir.config_parameter)"""
+        params = self.env['ir.config_parameter'].sudo()
+        try:
+            max_edge = int(params.get_param('eazynova.facial_max_edge', DEFAULT_MAX_EDGE))
+            upsample = int(params.get_param('eazynova.facial_upsample', DEFAULT_UPSAMPLE))
+        except ValueError:
+            max_edge, upsample = DEFAULT_MAX_EDGE, DEFAULT_UPSAMPLE
+
+        model = params.get_param('eazynova.facial_detection_model', DEFAULT_MODEL)
+        if model not in DETECTION_MODELS:
+            model = DEFAULT_MODEL
+
+        return {'max_edge': max(max_edge, 0), 'upsample': max(upsample, 0), 'model': model}
+
+    @api.model
+    def _detect_faces(self, photo_data):
         """
-        Vérifie si un visage correspond à un encodage stocké
+        Détecte les visages sur une copie réduite de la photo
+
+        La photo est décodée et orientée selon l'EXIF ; la détection tourne
+        sur une copie dont le plus grand côté est borné, puis les cadres
+        sont ramenés à la pleine résolution pour l'encodage.
 
         :param photo_data: Données de l'image en base64
-        :param stored_encoding_json: Encodage stocké (JSON)
-        :param tolerance: Seuil de tolérance (0.6 par défaut)
-        :return: Dict avec résultat de la vérification
+        :return: tuple (image pleine résolution en tableau numpy, cadres
+                 (haut, droite, bas, gauche) en pleine résolution)
+        """
+        import face_recognition
+
+        settings = self._get_detection_settings()
+        image, small, scale = prepare_image(base64.b64decode(photo_data), settings['max_edge'])
+
+        face_locations = face_recognition.face_locations(
+            np.array(small),
+            number_of_times_to_upsample=settings['upsample'],
+            model=settings['model'],
+        )
+
+        image_array = np.array(image)
+        height, width = image_array.shape[:2]
+        return image_array, [scale_box(box, scale, width, height) for box in face_locations]
+
+    @api.model
+    def _encode_probe(self, photo_data):
+        """
+        Détecte et encode le visage d'une photo à vérifier
+
+        :param photo_data: Données de l'image en base64
+        :return: Dict avec 'success', 'encoding' et 'faces_detected', ou
+                 'error' ; 'fallback' si face_recognition est absent
         """
         try:
-            try:
-                import face_recognition
-                import numpy as np
-                from PIL import Image
-                import io
-            except ImportError:
-                return self._verify_face_fallback(photo_data, stored_encoding_json)
+            import face_recognition
+        except ImportError:
+            return {'success': False, 'fallback': True, 'error': 'Bibliothèque face_recognition non disponible'}
 
-            # Décoder l'image
-            image_data = base64.b64decode(photo_data)
-            image = Image.open(io.BytesIO(image_data))
+        # Détecter les visages (image réduite, cadres en pleine résolution)
+        image_array, face_locations = self._detect_faces(photo_data)
 
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+        if len(face_locations) == 0:
+            return {'success': False, 'error': 'Aucun visage détecté'}
 
-            image_array = np.array(image)
+        # Encoder le visage
+        face_encodings = face_recognition.face_encodings(
+            image_array,
+            face_locations
+        )
 
-            # Détecter les visages
-            face_locations = face_recognition.face_locations(image_array)
+        if not face_encodings:
+            return {'success': False, 'error': 'Impossible d\'encoder le visage'}
 
-            if len(face_locations) == 0:
-                return {
-                    'success': False,
-                    'match': False,
-                    'error': 'Aucun visage détecté',
-                    'confidence': 0.0
-                }
+        return {
+            'success': True,
+            'encoding': face_encodings[0],
+            'faces_detected': len(face_locations),
+        }
 
-            # Encoder le visage
-            face_encodings = face_recognition.face_encodings(
-                image_array,
-                face_locations
-            )
+    @api.model
+    @tools.ormcache()
+    def _get_face_index(self):
+        """Index des encodages faciaux actifs, chargé en une requête (mis en
+        cache, invalidé par eazynova.facial.data)"""
+        FacialData = self.env['eazynova.facial.data']
+        FacialData.flush_model(['user_id', 'encoding_vector', 'active'])
+        self.env.cr.execute("""
+            SELECT id, user_id, encoding_vector
+              FROM eazynova_facial_data
+             WHERE active AND encoding_vector IS NOT NULL
+          ORDER BY id
+        """)
+        return FaceIndex(self.env.cr.fetchall())
 
-            if not face_encodings:
+    @api.model
+    def verify_face(self, photo_data, stored_encoding_json, tolerance=0.6):
+        """
+        Vérifie si un visage correspond à un encodage stocké
+
+        :param photo_data: Données de l'image en base64
+        :param stored_encoding_json: Encodage stocké (binaire, ou JSON)
+        :param tolerance: Seuil de tolérance (0.6 par défaut)
+        :return: Dict avec résultat de la vérification
+        """
+        try:
+            probe = self._encode_probe(photo_data)
+            if probe.get('fallback'):
+                return self._verify_face_fallback(photo_data, stored_encoding_json)
+
+            if not probe['success']:
                 return {
                     'success': False,
                     'match': False,
-                    'error': 'Impossible d\'encoder le visage',
+                    'error': probe['error'],
                     'confidence': 0.0
                 }
 
             # Charger l'encodage stocké
-            stored_encoding = np.array(json.loads(stored_encoding_json))
+            stored_encoding = load_encoding(stored_encoding_json)
 
             # Comparer les visages
-            current_encoding = face_encodings[0]
-            distance = face_recognition.face_distance(
-                [stored_encoding],
-                current_encoding
-            )[0]
+            distance = float(np.linalg.norm(stored_encoding - probe['encoding']))
 
             match = distance <= tolerance
             confidence = max(0, min(100, (1 - distance) * 100))
@@ -183,14 +335,11 @@ class EazynovaFacialService(models.AbstractModel):
                 'success': True,
                 'match': match,
                 'confidence': confidence,
-                'distance': float(distance),
+                'distance': distance,
                 'tolerance': tolerance,
-                'faces_detected': len(face_locations)
+                'faces_detected': probe['faces_detected']
             }
 
-        except ImportError:
-            return self._verify_face_fallback(photo_data, stored_encoding_json)
-
         except Exception as e:
             _logger.exception("Erreur dans verify_face")
             return {
@@ -201,22 +350,22 @@ class EazynovaFacialService(models.AbstractModel):
             }
 
     @api.model
-    def identify_user(self, photo_data, tolerance=0.6):
+    def identify_user(self, photo_data, tolerance=0.6, top_k=IDENTIFY_TOP_K):
         """
         Identifie un utilisateur à partir d'une photo
 
+        Le visage est encodé une seule fois puis comparé en un calcul
+        vectorisé à l'index des encodages actifs.
+
         :param photo_data: Données de l'image en base64
         :param tolerance: Seuil de tolérance
+        :param top_k: Nombre de correspondances renvoyées dans 'matches'
         :return: Dict avec utilisateur identifié
         """
         try:
-            # Récupérer tous les enregistrements faciaux actifs
-            facial_records = self.env['eazynova.facial.data'].search([
-                ('active', '=', True),
-                ('encoding_data', '!=', False)
-            ])
+            index = self._get_face_index()
 
-            if not facial_records:
+            if not len(index):
                 return {
                     'success': False,
                     'user_id': None,
@@ -224,35 +373,42 @@ class EazynovaFacialService(models.AbstractModel):
                     'confidence': 0.0
                 }
 
-            best_match = None
-            best_confidence = 0.0
+            probe = self._encode_probe(photo_data)
+            if not probe['success']:
+                return {
+                    'success': False,
+                    'user_id': None,
+                    'error': 'Aucune correspondance trouvée' if probe.get('fallback') else probe['error'],
+                    'confidence': 0.0,
+                    'checked_users': len(index)
+                }
 
-            # Comparer avec chaque enregistrement
-            for record in facial_records:
-                result = self.verify_face(
-                    photo_data,
-                    record.encoding_data,
-                    tolerance
-                )
+            matches = []
+            for facial_data_id, user_id, distance in index.search(probe['encoding'], top_k):
+                matches.append({
+                    'facial_data_id': facial_data_id,
+                    'user_id': user_id,
+                    'distance': distance,
+                    'confidence': max(0, min(100, (1 - distance) * 100)),
+                    'match': distance <= tolerance,
+                })
 
-                if result.get('success') and result.get('match'):
-                    confidence = result.get('confidence', 0)
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        best_match = record
+            best_match = matches[0] if matches and matches[0]['match'] else None
 
             if best_match:
+                user = self.env['res.users'].sudo().browse(best_match['user_id'])
                 _logger.info(
-                    f"Utilisateur identifié: {best_match.user_id.name} "
-                    f"(confiance: {best_confidence:.1f}%)"
+                    f"Utilisateur identifié: {user.name} "
+                    f"(confiance: {best_match['confidence']:.1f}%)"
                 )
 
                 return {
                     'success': True,
-                    'user_id': best_match.user_id.id,
-                    'user_name': best_match.user_id.name,
-                    'confidence': best_confidence,
-                    'facial_data_id': best_match.id
+                    'user_id': user.id,
+                    'user_name': user.name,
+                    'confidence': best_match['confidence'],
+                    'facial_data_id': best_match['facial_data_id'],
+                    'matches': matches
                 }
             else:
                 return {
@@ -260,7 +416,8 @@ class EazynovaFacialService(models.AbstractModel):
                     'user_id': None,
                     'error': 'Aucune correspondance trouvée',
                     'confidence': 0.0,
-                    'checked_users': len(facial_records)
+                    'checked_users': len(index),
+                    'matches': matches
                 }
 
         except Exception as e:
@@ -281,6 +438,7 @@ class EazynovaFacialService(models.AbstractModel):
         return {
             'success': True,
             'encoding': json.dumps([0] * 128),  # Encodage factice
+            'encoding_vector': pack_encoding([0] * ENCODING_SIZE),
             'face_count': 1,
             'quality_score': 50.0,
             'fallback': True,
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api, _
+from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+
+_logger = logging.getLogger(__name__)
+
+# Les pages sont reconnues en parallèle, un processus Tesseract par page :
+# chaque exécution est limitée à un thread OpenMP pour ne pas sur-allouer
+# les cœurs. Fixé à l'import (hérité par les processus Tesseract) plutôt
+# que pendant une requête ; une valeur définie par l'environnement de
+# déploiement est conservée.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Résolution de rastérisation des PDF (valeur par défaut de pdf2image)
+DEFAULT_OCR_DPI = 200
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.webp')
+
+
+def parse_tesseract_data(data):
+    """
+    Texte, lignes et confiance moyenne d'une page à partir du seul résultat
+    de pytesseract.image_to_data (Output.DICT)
+
+    Le texte reconstruit suit la mise en page d'image_to_string : un mot par
+    espace, une ligne par saut de ligne et une ligne vide entre les
+    paragraphes, sans relancer la reconnaissance.
+
+    :return: dict {'text', 'confidence', 'lines', 'words'}
+    """
+    words = []
+    for index, text in enumerate(data['text']):
+        text = (text or '').strip()
+        confidence = float(data['conf'][index])
+        if not text or confidence < 0:
+            continue
+        words.append({
+            'text': text,
+            'left': data['left'][index],
+            'top': data['top'][index],
+            'width': data['width'][index],
+            'height': data['height'][index],
+            'confidence': confidence,
+            'block': data['block_num'][index],
+            'paragraph': data['par_num'][index],
+            'line': data['line_num'][index],
+        })
+
+    lines = []
+    current = None
+    for word in words:
+        key = (word['block'], word['paragraph'], word['line'])
+        if key != current:
+            lines.append([])
+            current = key
+        lines[-1].append(word)
+
+    line_records = []
+    chunks = []
+    previous_paragraph = None
+    for line_words in lines:
+        paragraph = (line_words[0]['block'], line_words[0]['paragraph'])
+        if previous_paragraph is not None and paragraph != previous_paragraph:
+            chunks.append('')
+        previous_paragraph = paragraph
+
+        text = ' '.join(word['text'] for word in line_words)
+        chunks.append(text)
+
+        left = min(word['left'] for word in line_words)
+        top = min(word['top'] for word in line_words)
+        line_records.append({
+            'text': text,
+            'left': left,
+            'top': top,
+            'width': max(word['left'] + word['width'] for word in line_words) - left,
+            'height': max(word['top'] + word['height'] for word in line_words) - top,
+            'confidence': sum(word['confidence'] for word in line_words) / len(line_words),
+            'block': paragraph[0],
+            'paragraph': paragraph[1],
+        })
+
+    confidences = [word['confidence'] for word in words]
+    return {
+        'text': '\n'.join(chunks),
+        'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+        'lines': line_records,
+        'words': words,
+    }
+
+
+class EazynovaOCRService(models.AbstractModel):
+    """Service OCR partagé des modules EAZYNOVA"""
+    _name = 'eazynova.ocr.service'
+    _description = 'Service OCR EAZYNOVA'
+
+    @api.model
+    def extract(self, data, filename=None, mimetype=None, lang=None, native_text=True, max_pages=None):
+        """
+        Extrait le texte d'un PDF ou d'une image
+
+        Les pages d'un PDF sont rastérisées une à une, à la demande, et
+        reconnues en parallèle (une exécution de Tesseract par page).
+
+        :param data: Contenu du document (octets, pas base64)
+        :param filename: Nom de fichier (détection du format)
+        :param mimetype: Type MIME (détection du format)
+        :param lang: Langue(s) Tesseract (par défaut eazynova.ocr_language)
+        :param native_text: Utiliser le texte natif du PDF s'il existe
+        :param max_pages: Nombre maximum de pages à reconnaître
+        :return: Dict avec 'text', 'confidence' (0-100), 'pages' (texte,
+                 confiance, lignes et mots avec leurs cadres, par page, issus
+                 d'une seule reconnaissance) et 'native'
+                 (texte natif du PDF, sans OCR)
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        lang = lang or params.get_param('eazynova.ocr_language', 'fra+eng')
+
+        if self._is_pdf(data, filename, mimetype):
+            if native_text:
+                text = self._extract_pdf_native_text(data)
+                if text.strip():
+                    return {'text': text, 'confidence': 100.0, 'pages': [], 'native': True}
+            pages = self._ocr_pdf(data, lang, max_pages)
+
+        elif (mimetype or '').startswith('image') or (filename or '').lower().endswith(IMAGE_EXTENSIONS):
+            pytesseract = self._import_ocr_libraries()[0]
+            from PIL import Image
+
+            page = parse_tesseract_data(pytesseract.image_to_data(
+                Image.open(io.BytesIO(data)),
+                lang=lang,
+                output_type=pytesseract.Output.DICT
+            ))
+            page['page'] = 1
+            pages = [page]
+
+        else:
+            raise UserError(_("Format de fichier non supporté: %s") % (filename or mimetype or ''))
+
+        confidences = [page['confidence'] for page in pages if page['words']]
+        return {
+            'text': '\n\n'.join(page['text'] for page in pages),
+            'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+            'pages': pages,
+            'native': False,
+        }
+
+    def _is_pdf(self, data, filename, mimetype):
+        return (
+            'pdf' in (mimetype or '')
+            or (filename or '').lower().endswith('.pdf')
+            or data[:5] == b'%PDF-'
+        )
+
+    def _import_ocr_libraries(self):
+        """Importe pytesseract et pdf2image, avec un message explicite s'ils manquent"""
+        try:
+            import pytesseract
+            import pdf2image
+        except ImportError:
+            raise UserError(_(
+                "Dépendances OCR manquantes. Veuillez installer: "
+                "pip install pytesseract Pillow pdf2image PyPDF2"
+            ))
+        return pytesseract, pdf2image
+
+    def _extract_pdf_native_text(self, data):
+        """Texte natif du PDF (couche texte), vide pour un PDF scanné"""
+        try:
+            import PyPDF2
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            return '\n'.join(page.extract_text() or '' for page in reader.pages)
+        except Exception as e:
+            _logger.info(f"Texte natif du PDF illisible, utilisation de l'OCR: {str(e)}")
+            return ''
+
+    def _get_ocr_settings(self):
+        """Résolution et nombre de pages traitées en parallèle (ir.config_parameter)"""
+        params = self.env['ir.config_parameter'].sudo()
+        try:
+            dpi = int(params.get_param('eazynova.ocr_dpi', DEFAULT_OCR_DPI))
+            workers = int(params.get_param('eazynova.ocr_workers', 0))
+        except ValueError:
+            dpi, workers = DEFAULT_OCR_DPI, 0
+        return {
+            'dpi': dpi if dpi > 0 else DEFAULT_OCR_DPI,
+            'workers': workers if workers > 0 else (os.cpu_count() or 1),
+        }
+
+    def _ocr_pdf(self, data, lang, max_pages=None):
+        """Reconnaît les pages d'un PDF en parallèle"""
+        pytesseract, pdf2image = self._import_ocr_libraries()
+        settings = self._get_ocr_settings()
+
+        page_count = pdf2image.pdfinfo_from_bytes(data)['Pages']
+        if max_pages:
+            page_count = min(page_count, max_pages)
+
+        def ocr_page(page_number):
+            # Rastérisation de la seule page traitée : la mémoire reste
+            # bornée au nombre de pages en cours, pas à la taille du PDF
+            image = pdf2image.convert_from_bytes(
+                data,
+                dpi=settings['dpi'],
+                first_page=page_number,
+                last_page=page_number,
+            )[0]
+            page = parse_tesseract_data(pytesseract.image_to_data(
+                image,
+                lang=lang,
+                output_type=pytesseract.Output.DICT
+            ))
+            page['page'] = page_number
+            return page
+
+        # pdftoppm et tesseract tournent dans leurs propres processus : des
+        # threads suffisent à occuper tous les cœurs
+        workers = min(settings['workers'], page_count) or 1
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pages = list(executor.map(ocr_page, range(1, page_count + 1)))
+        else:
+            pages = [ocr_page(page_number) for page_number in range(1, page_count + 1)]
+
+        _logger.info(f"OCR: {page_count} page(s) reconnue(s) avec {workers} processus")
+        return pages
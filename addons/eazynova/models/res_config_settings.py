@@ -68,6 +68,40 @@ class ResConfigSettings(models.TransientModel):
         help="Seuil minimum de confiance pour l'OCR (0-100)"
     )
 
+    eazynova_ocr_dpi = fields.Integer(
+        string="Résolution OCR (dpi)",
+        config_parameter='eazynova.ocr_dpi',
+        default=200,
+        help="Résolution de rastérisation des pages PDF avant reconnaissance"
+    )
+
+    eazynova_ocr_workers = fields.Integer(
+        string="Pages OCR en parallèle",
+        config_parameter='eazynova.ocr_workers',
+        default=0,
+        help="Nombre de pages PDF reconnues simultanément (0 = nombre de processeurs)"
+    )
+
+    # Reconnaissance faciale
+    eazynova_facial_max_edge = fields.Integer(
+        string="Taille max. des photos (px)",
+        config_parameter='eazynova.facial_max_edge',
+        default=800,
+        help="Plus grand côté de l'image utilisée pour détecter les visages (0 = pleine résolution)"
+    )
+
+    eazynova_facial_upsample = fields.Integer(
+        string="Suréchantillonnage de la détection",
+        config_parameter='eazynova.facial_upsample',
+        default=1,
+        help="Nombre de suréchantillonnages pour détecter les petits visages (0 = aucun)"
+    )
+
+    eazynova_facial_detection_model = fields.Selection([
+        ('hog', 'HOG (processeur)'),
+        ('cnn', 'CNN (GPU conseillé)'),
+    ], string="Modèle de détection", config_parameter='eazynova.facial_detection_model', default='hog')
+
     # Paramètres généraux
     eazynova_auto_backup = fields.Boolean(
         string="Sauvegarde automatique",
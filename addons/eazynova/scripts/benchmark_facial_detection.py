@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mesure de la détection faciale selon les réglages de prétraitement
+
+Pour chaque combinaison taille max. × suréchantillonnage × modèle, le script
+chronomètre la préparation, la détection et l'encodage de chaque photo, puis
+mesure l'exactitude de l'identification (plus proche voisin, en excluant la
+photo elle-même).
+
+Les photos sont rangées par personne :
+    photos/
+        alice/1.jpg, alice/2.jpg...
+        bob/1.jpg...
+
+Exécuter :
+    python3 benchmark_facial_detection.py photos/ --max-edges 0,640,800,1200 --upsample 0,1 --models hog
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models'))
+
+from eazynova_facial_image import prepare_image, scale_box  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def load_dataset(directory):
+    """Liste de tuples (personne, octets de l'image)"""
+    dataset = []
+    for person in sorted(os.listdir(directory)):
+        person_dir = os.path.join(directory, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for filename in sorted(os.listdir(person_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(person_dir, filename), 'rb') as image_file:
+                    dataset.append((person, image_file.read()))
+    return dataset
+
+
+def run_setting(face_recognition, dataset, max_edge, upsample, model, tolerance):
+    """Latences (ms), taux de détection et exactitude pour un réglage"""
+    latencies = []
+    labels = []
+    encodings = []
+    detected = 0
+
+    for person, image_data in dataset:
+        started = time.perf_counter()
+        image, small, scale = prepare_image(image_data, max_edge)
+        locations = face_recognition.face_locations(
+            np.array(small), number_of_times_to_upsample=upsample, model=model)
+        encoding = None
+        if len(locations) == 1:
+            image_array = np.array(image)
+            height, width = image_array.shape[:2]
+            boxes = [scale_box(box, scale, width, height) for box in locations]
+            result = face_recognition.face_encodings(image_array, boxes)
+            encoding = result[0] if result else None
+        latencies.append((time.perf_counter() - started) * 1000.0)
+
+        if encoding is not None:
+            detected += 1
+            labels.append(person)
+            encodings.append(encoding)
+
+    correct = evaluated = 0
+    if len(encodings) > 1:
+        matrix = np.asarray(encodings, dtype=np.float32)
+        for i, label in enumerate(labels):
+            distances = np.linalg.norm(matrix - matrix[i], axis=1)
+            distances[i] = np.inf
+            if labels.count(label) < 2:
+                # Aucune autre photo de la personne : rien à retrouver
+                continue
+            evaluated += 1
+            best = int(np.argmin(distances))
+            correct += distances[best] <= tolerance and labels[best] == label
+
+    return {
+        'mean_ms': float(np.mean(latencies)) if latencies else 0.0,
+        'p95_ms': float(np.percentile(latencies, 95)) if latencies else 0.0,
+        'detection_rate': 100.0 * detected / len(dataset) if dataset else 0.0,
+        'accuracy': 100.0 * correct / evaluated if evaluated else 0.0,
+        'evaluated': evaluated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help="Dossier des photos (un sous-dossier par personne)")
+    parser.add_argument('--max-edges', default='0,640,800,1200',
+                        help="Tailles max. à tester, 0 = pleine résolution (défaut: 0,640,800,1200)")
+    parser.add_argument('--upsample', default='0,1', help="Suréchantillonnages à tester (défaut: 0,1)")
+    parser.add_argument('--models', default='hog', help="Modèles à tester: hog, cnn (défaut: hog)")
+    parser.add_argument('--tolerance', type=float, default=0.6, help="Seuil de correspondance (défaut: 0.6)")
+    args = parser.parse_args()
+
+    try:
+        import face_recognition
+    except ImportError:
+        sys.exit("Installez face_recognition : pip install face_recognition")
+
+    dataset = load_dataset(args.directory)
+    if not dataset:
+        sys.exit(f"Aucune photo trouvée dans {args.directory}")
+
+    print(f"{len(dataset)} photo(s), {len({person for person, __ in dataset})} personne(s)\n")
+    print(f"{'taille max':>10} {'suréch.':>8} {'modèle':>7} {'moy. ms':>9} {'p95 ms':>9} "
+          f"{'détection':>10} {'exactitude':>11}")
+
+    settings = itertools.product(
+        [int(value) for value in args.max_edges.split(',')],
+        [int(value) for value in args.upsample.split(',')],
+        args.models.split(','),
+    )
+    for max_edge, upsample, model in settings:
+        result = run_setting(face_recognition, dataset, max_edge, upsample, model, args.tolerance)
+        print(f"{max_edge or 'pleine':>10} {upsample:>8} {model:>7} {result['mean_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['detection_rate']:>9.1f}% {result['accuracy']:>10.1f}%")
+
+
+if __name__ == '__main__':
+    main()
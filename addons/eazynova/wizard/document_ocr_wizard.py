@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from odoo import api, fields, models, _
-from odoo.exceptions import UserError, ValidationError
+from odoo.exceptions import UserError
 import base64
 import logging
 import tempfile
@@ -79,107 +79,22 @@ class DocumentOCRWizard(models.TransientModel):
 
     def _extract_text_from_document(self):
         """Extrait le texte d'un document via OCR"""
-        try:
-            import pytesseract
-            from PIL import Image
-            from pdf2image import convert_from_bytes
-            import PyPDF2
-            import io
-        except ImportError as e:
-            raise UserError(_(
-                "Dépendances OCR manquantes. Veuillez installer: "
-                "pip install pytesseract Pillow pdf2image PyPDF2"
-            ))
-
         # Décoder le document
         document_data = base64.b64decode(self.document)
-        filename = self.document_filename.lower() if self.document_filename else ''
-
-        extracted_text = ""
-        confidence = 0.0
 
         try:
-            if filename.endswith('.pdf'):
-                # Traiter un PDF
-                # D'abord essayer d'extraire le texte natif
-                try:
-                    pdf_file = io.BytesIO(document_data)
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    native_text = ""
-
-                    for page in pdf_reader.pages:
-                        native_text += page.extract_text() + "\n"
-
-                    if native_text.strip():
-                        # PDF avec texte natif
-                        extracted_text = native_text
-                        confidence = 95.0
-                    else:
-                        raise Exception("PDF sans texte natif, utilisation de l'OCR")
-
-                except Exception:
-                    # PDF scanné, utiliser l'OCR
-                    images = convert_from_bytes(document_data)
-                    ocr_texts = []
-                    ocr_confidences = []
-
-                    for image in images:
-                        # OCR sur chaque page
-                        data = pytesseract.image_to_data(
-                            image,
-                            lang=self.language,
-                            output_type=pytesseract.Output.DICT
-                        )
-
-                        page_text = " ".join([
-                            text for text in data['text']
-                            if text.strip()
-                        ])
-
-                        # Calculer la confiance moyenne
-                        confidences = [
-                            int(conf) for conf in data['conf']
-                            if int(conf) > 0
-                        ]
-                        page_confidence = sum(confidences) / len(confidences) if confidences else 0
-
-                        ocr_texts.append(page_text)
-                        ocr_confidences.append(page_confidence)
-
-                    extracted_text = "\n\n".join(ocr_texts)
-                    confidence = sum(ocr_confidences) / len(ocr_confidences) if ocr_confidences else 0
-
-            elif filename.endswith(('.jpg', '.jpeg', '.png', '.tiff', '.bmp')):
-                # Traiter une image
-                image = Image.open(io.BytesIO(document_data))
-
-                # OCR
-                data = pytesseract.image_to_data(
-                    image,
-                    lang=self.language,
-                    output_type=pytesseract.Output.DICT
-                )
-
-                extracted_text = " ".join([
-                    text for text in data['text']
-                    if text.strip()
-                ])
-
-                # Calculer la confiance
-                confidences = [
-                    int(conf) for conf in data['conf']
-                    if int(conf) > 0
-                ]
-                confidence = sum(confidences) / len(confidences) if confidences else 0
-
-            else:
-                raise ValidationError(_("Format de fichier non supporté: %s") % filename)
-
+            result = self.env['eazynova.ocr.service'].extract(
+                document_data,
+                filename=self.document_filename,
+                lang=self.language,
+            )
         except Exception as e:
             _logger.error(f"Erreur lors de l'extraction OCR: {str(e)}")
             raise
 
-        return extracted_text, confidence
+        # PDF avec texte natif
+        confidence = 95.0 if result['native'] else result['confidence']
+        return result['text'], confidence
 
     def action_cancel(self):
         """Annule et ferme le wizard"""
@@ -130,14 +130,11 @@ class AchatOrderOCR(models.Model):
     chantier_id = fields.Many2one('project.project', string="Chantier lié")
 
     def action_ocr_extract(self):
-        import pytesseract
-        from pdf2image import convert_from_bytes
-        from PIL import Image
         import base64
-        import io
         import logging
         _logger = logging.getLogger(__name__)
         _logger.error("OCR : entrée dans action_ocr_extract !")
+        ocr_service = self.env['eazynova.ocr.service']
         try:
             extracted_text = ""
             for rec in self:
@@ -148,28 +145,20 @@ class AchatOrderOCR(models.Model):
                     continue
                 file_data = base64.b64decode(attachment.datas)
                 _logger.error(f"OCR : mimetype={attachment.mimetype}, nom={attachment.name}")
-                if attachment.mimetype == 'application/pdf' or (attachment.name and attachment.name.lower().endswith('.pdf')):
-                    # PDF : conversion en images puis OCR sur chaque page
+                is_pdf = attachment.mimetype == 'application/pdf' or (attachment.name and attachment.name.lower().endswith('.pdf'))
+                if is_pdf or (attachment.mimetype and attachment.mimetype.startswith('image')):
+                    # PDF (pages reconnues en parallèle) ou image : OCR direct
                     try:
-                        images = convert_from_bytes(file_data)
-                        text_pages = []
-                        for img in images:
-                            page_text = pytesseract.image_to_string(img, lang='fra+eng')
-                            text_pages.append(page_text)
-                            _logger.error(f"OCR : texte page PDF = {page_text}")
-                        extracted_text = "\n".join(text_pages)
+                        extracted_text = ocr_service.extract(
+                            file_data,
+                            filename=attachment.name,
+                            mimetype=attachment.mimetype,
+                            lang='fra+eng',
+                            native_text=False,
+                        )['text']
                     except Exception as e:
-                        extracted_text = f"Erreur OCR PDF : {e}"
-                        _logger.error(f"OCR : erreur PDF = {e}")
-                elif attachment.mimetype and attachment.mimetype.startswith('image'):
-                    # Image : OCR direct
-                    try:
-                        img = Image.open(io.BytesIO(file_data))
-                        extracted_text = pytesseract.image_to_string(img, lang='fra+eng')
-                        _logger.error(f"OCR : texte image = {extracted_text}")
-                    except Exception as e:
-                        extracted_text = f"Erreur OCR image : {e}"
-                        _logger.error(f"OCR : erreur image = {e}")
+                        extracted_text = f"Erreur OCR {'PDF' if is_pdf else 'image'} : {e}"
+                        _logger.error(f"OCR : erreur {'PDF' if is_pdf else 'image'} = {e}")
                 else:
                     extracted_text = "Format de fichier non supporté pour l'OCR."
                     _logger.error("OCR : format non supporté")
@@ -25,7 +25,7 @@
         * PDF : Extraction OCR avec IA (Claude/OpenAI)
 
         Technologies :
-        * ofxparse : Parser OFX
+        * Parser OFX en flux intégré (OFX 1.x SGML et 2.x XML)
         * Tesseract OCR : Reconnaissance de caractères
         * Anthropic Claude / OpenAI : Analyse intelligente
         * pandas : Traitement CSV
@@ -47,7 +47,6 @@
     ],
     'external_dependencies': {
         'python': [
-            'ofxparse',          # Parser OFX
             'pandas',            # CSV processing
             'PyPDF2',            # PDF processing
             'pytesseract',       # OCR
@@ -69,6 +68,7 @@
         'views/bank_statement_line_views.xml',
         'views/reconciliation_rule_views.xml',
         'views/reconciliation_alert_views.xml',
+        'views/bank_format_profile_views.xml',
         'views/bank_statement_menu.xml',
 
         # Wizards
@@ -4,5 +4,8 @@ from . import bank_statement_import
 from . import bank_statement_line
 from . import reconciliation_rule
 from . import reconciliation_alert
+from . import bank_format_profile
 from . import bank_statement_parser
+from . import bank_reconciliation_engine
+from . import reconciliation_ai_matcher
 from . import account_bank_statement
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools, _
+import hashlib
+import json
+import logging
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+
+class BankFormatProfile(models.Model):
+    """
+    Profil de format CSV d'une banque.
+
+    Identifié par l'empreinte de la ligne d'en-tête, il mémorise le
+    délimiteur, la correspondance des colonnes, le format de date et le
+    séparateur décimal détectés lors du premier import. Les imports suivants
+    du même format réutilisent ces réglages sans nouvelle détection.
+    """
+    _name = 'eazynova.bank.format.profile'
+    _description = 'Profil de Format de Relevé Bancaire'
+    _order = 'last_used desc, id desc'
+
+    name = fields.Char(string='Nom', required=True)
+
+    fingerprint = fields.Char(
+        string='Empreinte',
+        required=True,
+        readonly=True,
+        index=True,
+        help="Empreinte de la ligne d'en-tête du fichier CSV"
+    )
+
+    header = fields.Text(string='En-tête', readonly=True)
+
+    delimiter = fields.Char(string='Délimiteur', required=True, default=';')
+
+    column_mapping = fields.Text(
+        string='Correspondance des Colonnes',
+        help="Correspondance JSON champ → colonne du fichier "
+             "(date, description, amount, debit, credit, reference, balance)"
+    )
+
+    date_format = fields.Char(
+        string='Format de Date',
+        default='%d/%m/%Y',
+        help="Format strptime des dates (ex: %d/%m/%Y)"
+    )
+
+    decimal_separator = fields.Selection([
+        (',', 'Virgule (1 234,56)'),
+        ('.', 'Point (1,234.56)'),
+    ], string='Séparateur Décimal', default=',',
+        help="Vide si aucun fichier n'a encore permis de le déterminer : "
+             "chaque montant est alors interprété séparément")
+
+    use_count = fields.Integer(string="Nombre d'Utilisations", readonly=True, default=0)
+
+    last_used = fields.Datetime(string='Dernière Utilisation', readonly=True)
+
+    _sql_constraints = [
+        ('fingerprint_unique', 'UNIQUE(fingerprint)',
+         "Un profil existe déjà pour cet en-tête de fichier."),
+    ]
+
+    @api.model
+    def fingerprint_header(self, header_line):
+        """Calcule l'empreinte d'une ligne d'en-tête CSV"""
+        normalized = (header_line or '').strip().lower()
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    @api.model
+    def find_by_header(self, header_line):
+        """Retourne le profil correspondant à la ligne d'en-tête"""
+        return self.search([
+            ('fingerprint', '=', self.fingerprint_header(header_line)),
+        ], limit=1)
+
+    @api.model
+    def create_from_settings(self, header_line, settings, name=None):
+        """
+        Crée un profil à partir des réglages détectés par le parser
+
+        Si le même en-tête vient d'être enregistré par un import simultané,
+        la création est annulée (point de sauvegarde) et le profil existant
+        est retourné ; il peut être vide s'il n'est pas encore visible dans
+        cette transaction.
+        """
+        vals = {
+            'name': name or (header_line or '').strip()[:64] or _('Profil CSV'),
+            'fingerprint': self.fingerprint_header(header_line),
+            'header': (header_line or '').strip(),
+            'delimiter': settings['delimiter'],
+            'column_mapping': json.dumps(settings['column_mapping'], ensure_ascii=False),
+            'date_format': settings['date_format'],
+            'decimal_separator': settings['decimal_separator'] or False,
+        }
+        try:
+            with tools.mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+                return self.create(vals)
+        except psycopg2.IntegrityError:
+            _logger.info("Profil de format déjà créé pour cet en-tête par un autre import")
+            return self.find_by_header(header_line)
+
+    def get_settings(self):
+        """Réglages du profil au format attendu par le parser"""
+        self.ensure_one()
+
+        try:
+            column_mapping = json.loads(self.column_mapping or '{}')
+        except ValueError:
+            _logger.warning("Correspondance de colonnes invalide pour le profil %s", self.id)
+            column_mapping = {}
+
+        return {
+            'delimiter': self.delimiter or ',',
+            'column_mapping': column_mapping,
+            'date_format': self.date_format,
+            'decimal_separator': self.decimal_separator or None,
+        }
+
+    def mark_used(self):
+        """Met à jour les statistiques d'utilisation"""
+        for profile in self:
+            profile.write({
+                'use_count': profile.use_count + 1,
+                'last_used': fields.Datetime.now(),
+            })
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api, _
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+OPEN_ACCOUNT_TYPES = ['asset_receivable', 'liability_payable']
+
+# Limites identiques aux recherches unitaires de eazynova.bank.statement.line
+REFERENCE_LIMIT = 5
+AMOUNT_DATE_LIMIT = 10
+PARTNER_AMOUNT_LIMIT = 5
+AMOUNT_DATE_DAYS = 7
+AI_CANDIDATE_LIMIT = 50
+AI_CANDIDATE_DAYS = 30
+MAX_SUGGESTIONS = 10
+
+
+class BankReconciliationEngine(models.AbstractModel):
+    """
+    Moteur de rapprochement ensembliste.
+
+    Charge une seule fois les écritures ouvertes (clients/fournisseurs)
+    concernées par un lot de lignes bancaires, les indexe en mémoire par
+    référence, montant arrondi et partenaire, puis évalue toutes les lignes
+    en une passe. Les suggestions sont créées en un seul create(vals_list).
+    """
+    _name = 'eazynova.bank.reconciliation.engine'
+    _description = 'Moteur de Rapprochement Bancaire'
+
+    @api.model
+    def reconcile_lines(self, lines, use_ai=True, confidence_threshold=0.8):
+        """
+        Rapproche un ensemble de lignes bancaires importées
+
+        :param lines: recordset eazynova.bank.statement.line
+        :param use_ai: active l'analyse sémantique par IA
+        :param confidence_threshold: seuil de validation automatique
+        :return: nombre de suggestions créées
+        """
+        if not lines:
+            return 0
+
+        # Nettoyer les anciennes suggestions
+        lines.suggestion_ids.unlink()
+
+        index = self._build_candidate_index(lines)
+
+        ai_suggestions = defaultdict(list)
+        if use_ai:
+            ai_suggestions = self._score_ai_candidates(lines)
+
+        suggestion_vals = []
+
+        for line in lines:
+            suggestions = self._score_line(line, index)
+
+            # Analyse sémantique par IA (si activée)
+            suggestions.extend(ai_suggestions[line.id])
+
+            unique_suggestions = self._deduplicate_suggestions(suggestions)
+            suggestion_vals.extend(unique_suggestions[:MAX_SUGGESTIONS])
+
+            self._apply_best_suggestion(line, unique_suggestions, confidence_threshold)
+
+        if suggestion_vals:
+            self.env['eazynova.reconciliation.suggestion'].create(suggestion_vals)
+
+        _logger.info(
+            "Rapprochement de %d lignes: %d suggestions créées",
+            len(lines), len(suggestion_vals)
+        )
+
+        return len(suggestion_vals)
+
+    # ------------------------------------------------------------------
+    # Chargement et indexation des candidats
+    # ------------------------------------------------------------------
+
+    def _amount_key(self, amount):
+        """Clé d'index pour un montant (valeur absolue arrondie)"""
+        return round(abs(amount or 0.0), 2)
+
+    def _open_move_line_domain(self):
+        """Domaine des écritures ouvertes rapprochables"""
+        return [
+            ('account_id.account_type', 'in', OPEN_ACCOUNT_TYPES),
+            ('reconciled', '=', False),
+        ]
+
+    def _build_candidate_index(self, lines):
+        """
+        Charge les écritures candidates en trois requêtes au plus et
+        construit les index en mémoire.
+
+        L'ordre par défaut de account.move.line est conservé dans chaque
+        index, afin que les limites appliquées ensuite donnent les mêmes
+        résultats que les recherches unitaires.
+        """
+        MoveLine = self.env['account.move.line']
+        base_domain = self._open_move_line_domain()
+
+        index = {
+            'by_ref': defaultdict(list),
+            'by_amount': defaultdict(list),
+            'by_partner_amount': defaultdict(list),
+        }
+
+        # 1. Références exactes
+        refs = {ref for ref in lines.mapped('ref') if ref}
+        if refs:
+            for move_line in MoveLine.search(base_domain + [('ref', 'in', list(refs))]):
+                index['by_ref'][move_line.ref].append(move_line)
+
+        amount_lines = lines.filtered(lambda l: l.amount)
+        amounts = list({self._amount_key(l.amount) for l in amount_lines})
+        if not amounts:
+            return index
+
+        amount_domain = ['|', ('debit', 'in', amounts), ('credit', 'in', amounts)]
+
+        # 2. Montant dans la fenêtre de dates du relevé
+        dates = [d for d in amount_lines.mapped('date') if d]
+        if dates:
+            date_min = min(dates) - timedelta(days=AMOUNT_DATE_DAYS)
+            date_max = max(dates) + timedelta(days=AMOUNT_DATE_DAYS)
+
+            window_lines = MoveLine.search(base_domain + [
+                ('date', '>=', date_min),
+                ('date', '<=', date_max),
+            ] + amount_domain)
+
+            for move_line in window_lines:
+                for key in self._move_line_amount_keys(move_line):
+                    index['by_amount'][key].append(move_line)
+
+        # 3. Partenaire et montant (sans restriction de date)
+        partners = amount_lines.mapped('partner_id')
+        if partners:
+            partner_lines = MoveLine.search(base_domain + [
+                ('partner_id', 'in', partners.ids),
+            ] + amount_domain)
+
+            for move_line in partner_lines:
+                for key in self._move_line_amount_keys(move_line):
+                    index['by_partner_amount'][(move_line.partner_id.id, key)].append(move_line)
+
+        return index
+
+    def _move_line_amount_keys(self, move_line):
+        """Clés de montant sous lesquelles indexer une écriture"""
+        keys = set()
+        if move_line.debit:
+            keys.add(self._amount_key(move_line.debit))
+        if move_line.credit:
+            keys.add(self._amount_key(move_line.credit))
+        return keys
+
+    # ------------------------------------------------------------------
+    # Évaluation
+    # ------------------------------------------------------------------
+
+    def _score_line(self, line, index):
+        """Calcule les suggestions d'une ligne à partir des index"""
+        suggestions = []
+
+        # 1. Recherche par référence exacte
+        if line.ref:
+            for match in index['by_ref'].get(line.ref, [])[:REFERENCE_LIMIT]:
+                suggestions.append({
+                    'line_id': line.id,
+                    'move_line_id': match.id,
+                    'match_type': 'exact_reference',
+                    'confidence_score': 1.0,
+                    'match_reason': _("Correspondance exacte par référence: %s") % line.ref,
+                })
+
+        if not line.amount:
+            return suggestions
+
+        amount_key = self._amount_key(line.amount)
+
+        # 2. Recherche par montant et date
+        if line.date:
+            amount_matches = [
+                match for match in index['by_amount'].get(amount_key, [])
+                if abs((match.date - line.date).days) <= AMOUNT_DATE_DAYS
+            ][:AMOUNT_DATE_LIMIT]
+
+            for match in amount_matches:
+                # Calculer un score basé sur la proximité de date
+                date_diff = abs((match.date - line.date).days)
+                score = max(0.5, 1.0 - (date_diff / 30.0))  # Décroissance sur 30 jours
+
+                suggestions.append({
+                    'line_id': line.id,
+                    'move_line_id': match.id,
+                    'match_type': 'amount_date',
+                    'confidence_score': score,
+                    'match_reason': _("Correspondance par montant et date (±%d jours)") % date_diff,
+                })
+
+        # 3. Recherche par partenaire et montant
+        if line.partner_id:
+            partner_matches = index['by_partner_amount'].get(
+                (line.partner_id.id, amount_key), []
+            )[:PARTNER_AMOUNT_LIMIT]
+
+            for match in partner_matches:
+                date_diff = abs((match.date - line.date).days)
+                score = max(0.6, 0.9 - (date_diff / 60.0))
+
+                suggestions.append({
+                    'line_id': line.id,
+                    'move_line_id': match.id,
+                    'match_type': 'partner_amount',
+                    'confidence_score': score,
+                    'match_reason': _("Correspondance par partenaire et montant"),
+                })
+
+        return suggestions
+
+    def _score_ai_candidates(self, lines):
+        """
+        Analyse sémantique par IA de toutes les lignes en une étape
+
+        Les écritures de la fenêtre de dates du relevé sont chargées en une
+        requête ; chaque ligne garde les mêmes candidats que la recherche
+        unitaire (±30 jours, 50 premiers), puis toutes les paires sont
+        évaluées par lots via eazynova.reconciliation.ai.matcher.
+        """
+        suggestions = defaultdict(list)
+
+        ai_lines = lines.filtered(lambda l: l.name and l.date)
+        if not ai_lines:
+            return suggestions
+
+        dates = ai_lines.mapped('date')
+        candidates = self.env['account.move.line'].search(self._open_move_line_domain() + [
+            ('date', '>=', min(dates) - timedelta(days=AI_CANDIDATE_DAYS)),
+            ('date', '<=', max(dates) + timedelta(days=AI_CANDIDATE_DAYS)),
+        ])
+        if not candidates:
+            return suggestions
+
+        # Les candidats sont triés par date décroissante : la fenêtre de
+        # chaque ligne est une tranche contiguë, trouvée par bisection.
+        candidate_list = list(candidates)
+        ordinals = [-move_line.date.toordinal() for move_line in candidate_list]
+
+        pairs = []
+        for line in ai_lines:
+            start = bisect_left(ordinals, -(line.date + timedelta(days=AI_CANDIDATE_DAYS)).toordinal())
+            end = bisect_right(ordinals, -(line.date - timedelta(days=AI_CANDIDATE_DAYS)).toordinal())
+            for move_line in candidate_list[start:end][:AI_CANDIDATE_LIMIT]:
+                pairs.append((line, move_line))
+
+        results = self.env['eazynova.reconciliation.ai.matcher'].score_pairs(pairs)
+
+        for (line_id, move_line_id), result in results.items():
+            if result['score'] >= 0.5:
+                suggestions[line_id].append({
+                    'line_id': line_id,
+                    'move_line_id': move_line_id,
+                    'match_type': 'ai_semantic',
+                    'confidence_score': result['score'],
+                    'match_reason': result['reason'] or _("Analyse IA"),
+                })
+
+        return suggestions
+
+    def _deduplicate_suggestions(self, suggestions):
+        """Garde la meilleure suggestion par écriture, triées par score"""
+        seen_move_lines = set()
+        unique_suggestions = []
+
+        for sugg in sorted(suggestions, key=lambda x: x['confidence_score'], reverse=True):
+            move_line_id = sugg['move_line_id']
+            if move_line_id not in seen_move_lines:
+                seen_move_lines.add(move_line_id)
+                unique_suggestions.append(sugg)
+
+        return unique_suggestions
+
+    def _apply_best_suggestion(self, line, unique_suggestions, confidence_threshold):
+        """Détermine l'état de rapprochement de la ligne"""
+        if not unique_suggestions:
+            line.reconciliation_state = 'not_reconciled'
+            line.confidence_score = 0.0
+            return
+
+        best_suggestion = unique_suggestions[0]
+        best_score = best_suggestion['confidence_score']
+
+        if best_score >= confidence_threshold:
+            line.reconciliation_state = 'reconciled'
+            line.confidence_score = best_score
+            line.matching_move_line_id = best_suggestion['move_line_id']
+            line.matching_move_id = self.env['account.move.line'].browse(
+                best_suggestion['move_line_id']
+            ).move_id.id
+        elif best_score >= 0.5:
+            line.reconciliation_state = 'uncertain'
+            line.confidence_score = best_score
+        else:
+            line.reconciliation_state = 'not_reconciled'
+            line.confidence_score = best_score
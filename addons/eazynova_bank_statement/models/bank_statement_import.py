@@ -2,12 +2,18 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
-import base64
+from odoo.tools import split_every
 import logging
 from datetime import datetime
 
+from .bank_statement_line import compute_import_fingerprint
+from .bank_statement_parser import StatementParseStats
+
 _logger = logging.getLogger(__name__)
 
+# Nombre de lignes créées par create(vals_list) lors de l'import
+IMPORT_BATCH_SIZE = 1000
+
 
 class BankStatementImport(models.Model):
     _name = 'eazynova.bank.statement.import'
@@ -151,6 +157,19 @@ class BankStatementImport(models.Model):
         help="Seuil minimum de confiance pour valider automatiquement un rapprochement (0-1)"
     )
 
+    skip_duplicates = fields.Boolean(
+        string='Ignorer les Doublons',
+        default=True,
+        help="Ne pas créer les lignes déjà importées dans ce journal "
+             "(même identifiant bancaire, ou même date, montant et libellé)"
+    )
+
+    duplicate_count = fields.Integer(
+        string='Doublons Ignorés',
+        readonly=True,
+        default=0
+    )
+
     @api.model
     def create(self, vals):
         if vals.get('name', _('Nouveau')) == _('Nouveau'):
@@ -187,10 +206,9 @@ class BankStatementImport(models.Model):
         """Détecte automatiquement le type de fichier"""
         self.ensure_one()
 
-        if not self.file_data:
+        if not self.with_context(bin_size=True).file_data:
             raise UserError(_("Veuillez d'abord charger un fichier."))
 
-        file_content = base64.b64decode(self.file_data)
         file_name_lower = (self.file_name or '').lower()
 
         # Détection par extension
@@ -201,9 +219,11 @@ class BankStatementImport(models.Model):
         elif file_name_lower.endswith('.pdf'):
             self.file_type = 'pdf'
         else:
-            # Détection par contenu
+            # Détection par contenu (début du fichier uniquement)
             try:
-                content_str = file_content.decode('utf-8', errors='ignore')
+                parser = self.env['eazynova.bank.statement.parser']
+                with parser.open_binary_stream(self, 'file_data') as stream:
+                    content_str = stream.read(4096).decode('utf-8', errors='ignore')
 
                 if '<OFX>' in content_str or 'OFXHEADER' in content_str:
                     self.file_type = 'ofx'
@@ -221,7 +241,7 @@ class BankStatementImport(models.Model):
         """Parse le fichier et crée les lignes d'import"""
         self.ensure_one()
 
-        if not self.file_data:
+        if not self.with_context(bin_size=True).file_data:
             raise UserError(_("Veuillez d'abord charger un fichier."))
 
         if self.file_type == 'auto':
@@ -232,18 +252,17 @@ class BankStatementImport(models.Model):
         try:
             parser = self.env['eazynova.bank.statement.parser']
 
-            if self.file_type == 'csv':
-                result = parser.parse_csv(self.file_data, self.file_name)
-            elif self.file_type == 'ofx':
-                result = parser.parse_ofx(self.file_data)
+            if self.file_type in ('csv', 'ofx'):
+                # Parsing en flux : les lignes sont créées par lots
+                result = self._parse_file_streaming(parser)
             elif self.file_type == 'pdf':
                 result = parser.parse_pdf(self.file_data, self.use_ai)
+
+                # Créer les lignes d'import
+                result['transaction_count'] = self._create_import_lines(result)
             else:
                 raise UserError(_("Type de fichier non supporté : %s") % self.file_type)
 
-            # Créer les lignes d'import
-            self._create_import_lines(result)
-
             # Mettre à jour les dates et soldes
             if result.get('date_start'):
                 self.date_start = result['date_start']
@@ -257,7 +276,9 @@ class BankStatementImport(models.Model):
             self.state = 'parsed'
             self.parsing_log = result.get('log', '')
 
-            message = _("Fichier analysé avec succès. %d lignes importées.") % len(result.get('transactions', []))
+            message = _("Fichier analysé avec succès. %d lignes importées.") % result.get('transaction_count', 0)
+            if self.duplicate_count:
+                message += ' ' + _("%d doublons ignorés.") % self.duplicate_count
             self.message_post(body=message)
 
             # Lancer le rapprochement automatique si activé
@@ -270,6 +291,30 @@ class BankStatementImport(models.Model):
             self.error_message = str(e)
             raise UserError(_("Erreur lors de l'analyse du fichier : %s") % str(e))
 
+    def _parse_file_streaming(self, parser):
+        """
+        Parse un fichier CSV/OFX en flux depuis la pièce jointe
+
+        Les transactions sont lues au fil de l'eau et insérées par lots :
+        la mémoire consommée ne dépend pas de la taille du fichier.
+        """
+        self.ensure_one()
+
+        # Supprimer les anciennes lignes
+        self.line_ids.unlink()
+
+        stats = StatementParseStats()
+
+        with parser.open_binary_stream(self, 'file_data') as stream:
+            if self.file_type == 'csv':
+                transactions = parser.iter_csv_transactions(stream, stats)
+            else:
+                transactions = parser.iter_ofx_transactions(stream, stats)
+
+            self._create_import_lines_batched(transactions)
+
+        return stats.to_result()
+
     def _create_import_lines(self, parse_result):
         """Crée les lignes d'import à partir du résultat du parsing"""
         self.ensure_one()
@@ -277,20 +322,107 @@ class BankStatementImport(models.Model):
         # Supprimer les anciennes lignes
         self.line_ids.unlink()
 
-        transactions = parse_result.get('transactions', [])
-
-        for trans in transactions:
-            self.env['eazynova.bank.statement.line'].create({
-                'import_id': self.id,
-                'date': trans.get('date'),
-                'name': trans.get('name', trans.get('description', '/')),
-                'ref': trans.get('ref', trans.get('reference', '')),
-                'partner_name': trans.get('partner_name', ''),
-                'amount': trans.get('amount', 0.0),
-                'unique_import_id': trans.get('unique_import_id', ''),
-                'account_number': trans.get('account_number', ''),
-                'note': trans.get('note', ''),
-            })
+        return self._create_import_lines_batched(parse_result.get('transactions', []))
+
+    def _create_import_lines_batched(self, transactions, batch_size=IMPORT_BATCH_SIZE):
+        """
+        Crée les lignes d'import par lots de create(vals_list)
+
+        :param transactions: itérable (liste ou générateur) de transactions
+        :return: nombre de lignes créées
+        """
+        self.ensure_one()
+
+        LineModel = self.env['eazynova.bank.statement.line']
+        count = 0
+        duplicate_count = 0
+
+        for batch in split_every(batch_size, transactions):
+            vals_list = [self._prepare_import_line_vals(trans) for trans in batch]
+
+            if self.skip_duplicates:
+                vals_list = self._filter_duplicate_line_vals(vals_list)
+                duplicate_count += len(batch) - len(vals_list)
+
+            if vals_list:
+                LineModel.create(vals_list)
+                count += len(vals_list)
+
+            # Écrire en base et vider le cache pour garder une mémoire constante
+            self.env.flush_all()
+            self.env.invalidate_all()
+
+        self.duplicate_count = duplicate_count
+
+        return count
+
+    def _filter_duplicate_line_vals(self, vals_list):
+        """
+        Retire les lignes déjà importées dans le journal (autres imports)
+
+        Une seule requête par lot, sur les index unique_import_id et
+        import_fingerprint ; l'empreinte composite n'est utilisée que pour
+        les transactions sans identifiant bancaire.
+        """
+        self.ensure_one()
+
+        unique_ids = set()
+        fingerprints = {}
+
+        for index, vals in enumerate(vals_list):
+            if vals.get('unique_import_id'):
+                unique_ids.add(vals['unique_import_id'])
+            else:
+                fingerprints[index] = compute_import_fingerprint(
+                    vals.get('date'), vals.get('amount'), vals.get('name')
+                )
+
+        key_domain = []
+        if unique_ids:
+            key_domain.append(('unique_import_id', 'in', list(unique_ids)))
+        if any(fingerprints.values()):
+            key_domain.append(('import_fingerprint', 'in', [f for f in fingerprints.values() if f]))
+        if not key_domain:
+            return vals_list
+        if len(key_domain) == 2:
+            key_domain.insert(0, '|')
+
+        existing = self.env['eazynova.bank.statement.line'].search_read([
+            ('journal_id', '=', self.journal_id.id),
+            ('import_id', '!=', self.id),
+        ] + key_domain, ['unique_import_id', 'import_fingerprint'])
+
+        existing_ids = {rec['unique_import_id'] for rec in existing if rec['unique_import_id']}
+        existing_fingerprints = {
+            rec['import_fingerprint'] for rec in existing
+            if rec['import_fingerprint'] and not rec['unique_import_id']
+        }
+
+        filtered_vals = []
+
+        for index, vals in enumerate(vals_list):
+            if vals.get('unique_import_id'):
+                if vals['unique_import_id'] in existing_ids:
+                    continue
+            elif fingerprints.get(index) in existing_fingerprints:
+                continue
+            filtered_vals.append(vals)
+
+        return filtered_vals
+
+    def _prepare_import_line_vals(self, trans):
+        """Valeurs d'une ligne d'import à partir d'une transaction normalisée"""
+        return {
+            'import_id': self.id,
+            'date': trans.get('date'),
+            'name': trans.get('name', trans.get('description', '/')),
+            'ref': trans.get('ref', trans.get('reference', '')),
+            'partner_name': trans.get('partner_name', ''),
+            'amount': trans.get('amount', 0.0),
+            'unique_import_id': trans.get('unique_import_id', ''),
+            'account_number': trans.get('account_number', ''),
+            'note': trans.get('note', ''),
+        }
 
     def action_auto_reconcile(self):
         """Lance le rapprochement automatique des lignes"""
@@ -302,13 +434,13 @@ class BankStatementImport(models.Model):
         self.state = 'reconciling'
 
         try:
-            reconciliation_engine = self.env['eazynova.bank.statement.line']
+            reconciliation_engine = self.env['eazynova.bank.reconciliation.engine']
 
-            for line in self.line_ids:
-                line.action_find_matching_entries(
-                    use_ai=self.use_ai,
-                    confidence_threshold=self.confidence_threshold
-                )
+            reconciliation_engine.reconcile_lines(
+                self.line_ids,
+                use_ai=self.use_ai,
+                confidence_threshold=self.confidence_threshold
+            )
 
             self.state = 'reconciled'
 
@@ -331,43 +463,103 @@ class BankStatementImport(models.Model):
             raise UserError(_("Erreur lors du rapprochement : %s") % str(e))
 
     def _create_reconciliation_alerts(self):
-        """Crée des alertes pour les lignes problématiques"""
+        """
+        Crée des alertes pour les lignes problématiques
+
+        Les alertes sont créées en un seul create(vals_list). Les alertes
+        ouvertes existantes pour la même ligne et le même type sont
+        conservées, celles devenues sans objet sont supprimées, et une
+        seule notification récapitulative est postée sur l'import.
+        """
         self.ensure_one()
 
-        # Supprimer les anciennes alertes
-        self.alert_ids.unlink()
-
         AlertModel = self.env['eazynova.reconciliation.alert']
 
-        # Alertes pour lignes incertaines
-        uncertain_lines = self.line_ids.filtered(
-            lambda l: l.reconciliation_state == 'uncertain'
-        )
-
-        for line in uncertain_lines:
-            AlertModel.create({
-                'import_id': self.id,
-                'line_id': line.id,
-                'alert_type': 'uncertain',
-                'severity': 'warning',
-                'message': _("Rapprochement incertain (confiance: %.0f%%)") % (
-                    line.confidence_score * 100
-                ),
-            })
-
-        # Alertes pour lignes non rapprochées
-        unreconciled_lines = self.line_ids.filtered(
-            lambda l: l.reconciliation_state == 'not_reconciled'
-        )
-
-        for line in unreconciled_lines:
-            AlertModel.create({
-                'import_id': self.id,
-                'line_id': line.id,
-                'alert_type': 'not_reconciled',
-                'severity': 'error',
-                'message': _("Aucun rapprochement trouvé"),
-            })
+        alert_vals = {}
+
+        for line in self.line_ids:
+            if line.reconciliation_state == 'uncertain':
+                # Alertes pour lignes incertaines
+                alert_vals[(line.id, 'uncertain')] = {
+                    'import_id': self.id,
+                    'line_id': line.id,
+                    'alert_type': 'uncertain',
+                    'severity': 'warning',
+                    'message': _("Rapprochement incertain (confiance: %.0f%%)") % (
+                        line.confidence_score * 100
+                    ),
+                }
+            elif line.reconciliation_state == 'not_reconciled':
+                # Alertes pour lignes non rapprochées
+                alert_vals[(line.id, 'not_reconciled')] = {
+                    'import_id': self.id,
+                    'line_id': line.id,
+                    'alert_type': 'not_reconciled',
+                    'severity': 'error',
+                    'message': _("Aucun rapprochement trouvé"),
+                }
+
+        # Alertes ouvertes existantes (une seule requête)
+        open_alerts = AlertModel.search([
+            ('import_id', '=', self.id),
+            ('alert_type', 'in', ['uncertain', 'not_reconciled']),
+            ('state', 'in', ['new', 'in_progress']),
+        ])
+
+        existing_keys = set()
+        obsolete_alerts = AlertModel
+
+        for alert in open_alerts:
+            key = (alert.line_id.id, alert.alert_type)
+            if key in alert_vals and key not in existing_keys:
+                existing_keys.add(key)
+            else:
+                obsolete_alerts |= alert
+
+        obsolete_alerts.unlink()
+
+        new_vals = [vals for key, vals in alert_vals.items() if key not in existing_keys]
+
+        alerts = AlertModel.with_context(
+            skip_alert_activity=True,
+            mail_create_nolog=True,
+            mail_create_nosubscribe=True,
+            tracking_disable=True,
+        ).create(new_vals)
+
+        self._notify_reconciliation_alerts(alerts)
+
+        return alerts
+
+    def _notify_reconciliation_alerts(self, alerts):
+        """Poste une notification récapitulative pour les alertes créées"""
+        self.ensure_one()
+
+        if not alerts:
+            return
+
+        uncertain_count = len(alerts.filtered(lambda a: a.alert_type == 'uncertain'))
+        error_alerts = alerts.filtered(lambda a: a.severity in ['error', 'critical'])
+
+        message = _(
+            "%(count)d alertes de rapprochement créées "
+            "(%(uncertain)d incertaines, %(errors)d non rapprochées)."
+        ) % {
+            'count': len(alerts),
+            'uncertain': uncertain_count,
+            'errors': len(error_alerts),
+        }
+
+        self.message_post(body=message)
+
+        # Une seule activité par import pour les alertes bloquantes
+        if error_alerts:
+            self.activity_schedule(
+                'mail.mail_activity_data_todo',
+                summary=_('Alertes de rapprochement: %d') % len(error_alerts),
+                note=message,
+                user_id=self.env.user.id,
+            )
 
     def action_create_bank_statement(self):
         """Crée le relevé bancaire dans Odoo"""
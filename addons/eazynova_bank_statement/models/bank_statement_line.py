@@ -2,10 +2,30 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+import hashlib
 import logging
+import re
+import unicodedata
 
 _logger = logging.getLogger(__name__)
 
+LABEL_CLEAN_RE = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_label(label):
+    """Normalise un libellé bancaire (minuscules, sans accents ni ponctuation)"""
+    label = unicodedata.normalize('NFKD', (label or '').casefold())
+    label = ''.join(c for c in label if not unicodedata.combining(c))
+    return LABEL_CLEAN_RE.sub(' ', label).strip()
+
+
+def compute_import_fingerprint(date, amount, label):
+    """Empreinte (date, montant, libellé normalisé) d'une transaction importée"""
+    if not date:
+        return False
+    content = '%s|%.2f|%s' % (date, round(amount or 0.0, 2) + 0.0, normalize_label(label))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
 
 class BankStatementLine(models.Model):
     _name = 'eazynova.bank.statement.line'
@@ -49,9 +69,27 @@ class BankStatementLine(models.Model):
 
     unique_import_id = fields.Char(
         string='ID Unique Import',
+        index=True,
         help="Identifiant unique pour éviter les doublons"
     )
 
+    import_fingerprint = fields.Char(
+        string='Empreinte',
+        compute='_compute_import_fingerprint',
+        store=True,
+        index=True,
+        help="Empreinte (date, montant, libellé normalisé) utilisée pour détecter "
+             "les doublons quand la banque ne fournit pas d'identifiant unique"
+    )
+
+    journal_id = fields.Many2one(
+        'account.journal',
+        string='Journal',
+        related='import_id.journal_id',
+        store=True,
+        index=True
+    )
+
     account_number = fields.Char(string='Numéro de Compte')
 
     note = fields.Text(string='Notes')
@@ -110,115 +148,80 @@ class BankStatementLine(models.Model):
         for record in self:
             record.suggestion_count = len(record.suggestion_ids)
 
-    @api.depends('unique_import_id', 'date', 'amount', 'name')
-    def _compute_is_duplicate(self):
+    @api.depends('date', 'amount', 'name')
+    def _compute_import_fingerprint(self):
         for record in self:
-            if not record.unique_import_id:
-                record.is_duplicate = False
-                continue
+            record.import_fingerprint = compute_import_fingerprint(
+                record.date, record.amount, record.name
+            )
 
-            # Chercher des doublons potentiels
-            domain = [
-                ('id', '!=', record.id),
-                ('unique_import_id', '=', record.unique_import_id),
-            ]
+    @api.depends('unique_import_id', 'import_fingerprint', 'journal_id')
+    def _compute_is_duplicate(self):
+        duplicate_keys = self._get_duplicate_keys()
 
-            duplicate = self.search(domain, limit=1)
-            record.is_duplicate = bool(duplicate)
+        for record in self:
+            record.is_duplicate = record._get_duplicate_key() in duplicate_keys
 
-    def action_find_matching_entries(self, use_ai=True, confidence_threshold=0.8):
-        """Trouve les écritures comptables correspondantes"""
+    def _get_duplicate_key(self):
+        """Clé de doublon : identifiant bancaire, sinon empreinte composite"""
         self.ensure_one()
 
-        # Nettoyer les anciennes suggestions
-        self.suggestion_ids.unlink()
-
-        suggestions = []
+        if self.unique_import_id:
+            return ('unique_import_id', self.journal_id.id, self.unique_import_id)
+        if self.import_fingerprint:
+            return ('import_fingerprint', self.journal_id.id, self.import_fingerprint)
+        return None
+
+    def _get_duplicate_keys(self):
+        """
+        Clés en doublon parmi celles de l'ensemble, en une requête groupée
+        par type de clé.
+
+        Un identifiant bancaire est en doublon s'il apparaît plusieurs fois
+        dans le journal. Une empreinte composite l'est si elle apparaît dans
+        plusieurs imports (deux opérations identiques du même relevé sont
+        légitimes).
+        """
+        records = self.filtered('id')
+        duplicate_keys = set()
+
+        unique_ids = {r.unique_import_id for r in records if r.unique_import_id}
+        if unique_ids:
+            groups = self._read_group(
+                [('unique_import_id', 'in', list(unique_ids))],
+                ['journal_id', 'unique_import_id'],
+                ['__count'],
+            )
+            for journal, unique_import_id, count in groups:
+                if count > 1:
+                    duplicate_keys.add(('unique_import_id', journal.id, unique_import_id))
+
+        fingerprints = {
+            r.import_fingerprint for r in records
+            if not r.unique_import_id and r.import_fingerprint
+        }
+        if fingerprints:
+            groups = self._read_group(
+                [
+                    ('import_fingerprint', 'in', list(fingerprints)),
+                    ('unique_import_id', 'in', [False, '']),
+                ],
+                ['journal_id', 'import_fingerprint'],
+                ['import_id:count_distinct'],
+            )
+            for journal, fingerprint, import_count in groups:
+                if import_count > 1:
+                    duplicate_keys.add(('import_fingerprint', journal.id, fingerprint))
+
+        return duplicate_keys
 
-        # 1. Recherche par référence exacte
-        if self.ref:
-            exact_matches = self._find_by_reference(self.ref)
-            for match in exact_matches:
-                suggestions.append({
-                    'line_id': self.id,
-                    'move_line_id': match.id,
-                    'match_type': 'exact_reference',
-                    'confidence_score': 1.0,
-                    'match_reason': _("Correspondance exacte par référence: %s") % self.ref,
-                })
-
-        # 2. Recherche par montant et date
-        amount_matches = self._find_by_amount_date(self.amount, self.date)
-        for match in amount_matches:
-            # Calculer un score basé sur la proximité de date
-            date_diff = abs((match.date - self.date).days)
-            score = max(0.5, 1.0 - (date_diff / 30.0))  # Décroissance sur 30 jours
-
-            suggestions.append({
-                'line_id': self.id,
-                'move_line_id': match.id,
-                'match_type': 'amount_date',
-                'confidence_score': score,
-                'match_reason': _("Correspondance par montant et date (±%d jours)") % date_diff,
-            })
-
-        # 3. Recherche par partenaire et montant
-        if self.partner_id:
-            partner_matches = self._find_by_partner_amount(self.partner_id, self.amount)
-            for match in partner_matches:
-                date_diff = abs((match.date - self.date).days)
-                score = max(0.6, 0.9 - (date_diff / 60.0))
-
-                suggestions.append({
-                    'line_id': self.id,
-                    'move_line_id': match.id,
-                    'match_type': 'partner_amount',
-                    'confidence_score': score,
-                    'match_reason': _("Correspondance par partenaire et montant"),
-                })
-
-        # 4. Analyse sémantique par IA (si activée)
-        if use_ai and self.name:
-            ai_matches = self._find_by_ai_analysis(self.name, self.amount, self.date)
-            suggestions.extend(ai_matches)
-
-        # Créer les suggestions
-        SuggestionModel = self.env['eazynova.reconciliation.suggestion']
-
-        # Dédupliquer les suggestions
-        seen_move_lines = set()
-        unique_suggestions = []
-
-        for sugg in sorted(suggestions, key=lambda x: x['confidence_score'], reverse=True):
-            move_line_id = sugg['move_line_id']
-            if move_line_id not in seen_move_lines:
-                seen_move_lines.add(move_line_id)
-                unique_suggestions.append(sugg)
-
-        for sugg in unique_suggestions[:10]:  # Limiter à 10 suggestions
-            SuggestionModel.create(sugg)
-
-        # Déterminer l'état de rapprochement
-        if unique_suggestions:
-            best_suggestion = unique_suggestions[0]
-            best_score = best_suggestion['confidence_score']
-
-            if best_score >= confidence_threshold:
-                self.reconciliation_state = 'reconciled'
-                self.confidence_score = best_score
-                self.matching_move_line_id = best_suggestion['move_line_id']
-                self.matching_move_id = self.env['account.move.line'].browse(
-                    best_suggestion['move_line_id']
-                ).move_id.id
-            elif best_score >= 0.5:
-                self.reconciliation_state = 'uncertain'
-                self.confidence_score = best_score
-            else:
-                self.reconciliation_state = 'not_reconciled'
-                self.confidence_score = best_score
-        else:
-            self.reconciliation_state = 'not_reconciled'
-            self.confidence_score = 0.0
+    def action_find_matching_entries(self, use_ai=True, confidence_threshold=0.8):
+        """Trouve les écritures comptables correspondantes"""
+        self.env['eazynova.bank.reconciliation.engine'].reconcile_lines(
+            self,
+            use_ai=use_ai,
+            confidence_threshold=confidence_threshold
+        )
 
     def _find_by_reference(self, reference):
         """Recherche par référence exacte"""
@@ -272,9 +275,13 @@ class BankStatementLine(models.Model):
         return self.env['account.move.line'].search(domain, limit=5)
 
     def _find_by_ai_analysis(self, description, amount, date):
-        """Analyse sémantique du libellé par IA"""
+        """Analyse sémantique du libellé par IA (paires évaluées par lots)"""
+        self.ensure_one()
         suggestions = []
 
+        if not description or not date:
+            return suggestions
+
         try:
             # Chercher des écritures potentielles
             from datetime import timedelta
@@ -294,60 +301,20 @@ class BankStatementLine(models.Model):
             if not potential_matches:
                 return suggestions
 
-            # Utiliser l'IA pour analyser la similarité
-            ai_service = self.env['eazynova.ai.service']
+            results = self.env['eazynova.reconciliation.ai.matcher'].score_pairs(
+                [(self, move_line) for move_line in potential_matches]
+            )
 
             for move_line in potential_matches:
-                # Construire un contexte pour l'IA
-                context = {
-                    'bank_description': description,
-                    'bank_amount': amount,
-                    'bank_date': str(date),
-                    'move_name': move_line.name or '',
-                    'move_ref': move_line.ref or '',
-                    'move_amount': move_line.debit or move_line.credit,
-                    'move_date': str(move_line.date),
-                    'partner_name': move_line.partner_id.name if move_line.partner_id else '',
-                }
-
-                # Demander à l'IA d'évaluer la correspondance
-                prompt = f"""
-Analyse si ces deux transactions correspondent :
-
-Transaction bancaire :
-- Libellé : {context['bank_description']}
-- Montant : {context['bank_amount']}
-- Date : {context['bank_date']}
-
-Écriture comptable :
-- Nom : {context['move_name']}
-- Référence : {context['move_ref']}
-- Montant : {context['move_amount']}
-- Date : {context['move_date']}
-- Partenaire : {context['partner_name']}
-
-Réponds avec un score de confiance entre 0 et 1, et une raison courte.
-Format JSON : {{"score": 0.0-1.0, "reason": "..."}}
-"""
-
-                try:
-                    result = ai_service.analyze_text(prompt, format='json')
-
-                    if result and 'score' in result:
-                        score = float(result.get('score', 0))
-
-                        if score >= 0.5:
-                            suggestions.append({
-                                'line_id': self.id,
-                                'move_line_id': move_line.id,
-                                'match_type': 'ai_semantic',
-                                'confidence_score': score,
-                                'match_reason': result.get('reason', _("Analyse IA")),
-                            })
-
-                except Exception as e:
-                    _logger.warning("Erreur analyse IA pour ligne %s: %s", move_line.id, e)
-                    continue
+                result = results.get((self.id, move_line.id))
+                if result and result['score'] >= 0.5:
+                    suggestions.append({
+                        'line_id': self.id,
+                        'move_line_id': move_line.id,
+                        'match_type': 'ai_semantic',
+                        'confidence_score': result['score'],
+                        'match_reason': result['reason'] or _("Analyse IA"),
+                    })
 
         except Exception as e:
             _logger.error("Erreur dans l'analyse IA: %s", e)
@@ -4,13 +4,100 @@ from odoo import models, api, _
 from odoo.exceptions import UserError
 import base64
 import csv
+import html
 import io
+import itertools
 import logging
+import re
+import unicodedata
 from datetime import datetime
 from decimal import Decimal
 
 _logger = logging.getLogger(__name__)
 
+# Taille des blocs lus dans les fichiers OFX
+OFX_CHUNK_SIZE = 64 * 1024
+
+# Balises d'ouverture d'un relevé OFX (compte bancaire ou carte)
+OFX_STATEMENT_TAGS = ('STMTRS', 'CCSTMTRS')
+
+# Balise OFX (SGML ou XML) suivie de sa valeur éventuelle
+OFX_TAG_RE = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+# Nombre de lignes CSV analysées pour détecter les formats de date et de montant
+CSV_SAMPLE_SIZE = 50
+
+# Formats de date reconnus, par ordre de préférence
+DATE_FORMATS = [
+    '%d/%m/%Y',
+    '%d-%m-%Y',
+    '%Y-%m-%d',
+    '%d.%m.%Y',
+    '%d/%m/%y',
+    '%d-%m-%y',
+]
+
+# Caractères à supprimer d'un montant (après normalisation du séparateur)
+AMOUNT_CLEAN_RE = re.compile(r'[^\d.-]')
+
+# Séparateur décimal suivi de 1 ou 2 chiffres en fin de montant
+DECIMAL_SUFFIX_RE = re.compile(r'([.,])\d{1,2}$')
+
+
+class StatementParseStats:
+    """Statistiques d'un relevé calculées au fil de l'eau pendant le parsing"""
+
+    def __init__(self):
+        self.count = 0
+        self.date_start = None
+        self.date_end = None
+        self.total_amount = 0.0
+        self.balance_start = None
+        self.balance_end = None
+        self.log_lines = []
+
+    def add(self, trans):
+        """Prend en compte une transaction normalisée"""
+        self.count += 1
+        self.total_amount += trans.get('amount', 0.0)
+
+        date = trans.get('date')
+        balance = trans.get('balance')
+
+        if date:
+            if self.date_start is None or date < self.date_start:
+                self.date_start = date
+                if balance is not None:
+                    # Solde avant la première opération
+                    self.balance_start = balance - trans.get('amount', 0.0)
+            if self.date_end is None or date >= self.date_end:
+                self.date_end = date
+                if balance is not None:
+                    self.balance_end = balance
+
+    def log(self, message):
+        self.log_lines.append(message)
+
+    def to_result(self):
+        """Résultat au format de parse_csv / parse_ofx (sans les transactions)"""
+        result = {
+            'log': '\n'.join(self.log_lines),
+            'transaction_count': self.count,
+        }
+
+        if self.date_start:
+            result['date_start'] = self.date_start
+        if self.date_end:
+            result['date_end'] = self.date_end
+        if self.balance_end is not None:
+            result['balance_end'] = self.balance_end
+            if self.balance_start is None:
+                self.balance_start = self.balance_end - self.total_amount
+        if self.balance_start is not None:
+            result['balance_start'] = self.balance_start
+
+        return result
+
 
 class BankStatementParser(models.AbstractModel):
     _name = 'eazynova.bank.statement.parser'
@@ -19,117 +106,500 @@ class BankStatementParser(models.AbstractModel):
     @api.model
     def parse_csv(self, file_data, file_name=None):
         """Parse un fichier CSV"""
+        stats = StatementParseStats()
+        stream = io.BytesIO(base64.b64decode(file_data))
+
+        transactions = list(self.iter_csv_transactions(stream, stats))
+
+        result = stats.to_result()
+        result['transactions'] = transactions
+        return result
+
+    @api.model
+    def parse_ofx(self, file_data):
+        """Parse un fichier OFX"""
+        stats = StatementParseStats()
+        stream = io.BytesIO(base64.b64decode(file_data))
+
+        transactions = list(self.iter_ofx_transactions(stream, stats))
+
+        result = stats.to_result()
+        result['transactions'] = transactions
+        return result
+
+    @api.model
+    def open_binary_stream(self, record, field_name):
+        """
+        Ouvre le contenu d'un champ binaire en lecture incrémentale
+
+        Lit directement le fichier du filestore quand le champ est stocké en
+        pièce jointe, sans décoder le base64 complet en mémoire.
+
+        :return: objet fichier binaire (à fermer par l'appelant)
+        """
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', record._name),
+            ('res_field', '=', field_name),
+            ('res_id', '=', record.id),
+        ], limit=1)
+
+        if attachment and attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+
+        if attachment:
+            return io.BytesIO(attachment.raw or b'')
+
+        data = record[field_name]
+        return io.BytesIO(base64.b64decode(data) if data else b'')
+
+    @api.model
+    def iter_csv_transactions(self, stream, stats):
+        """
+        Parse un fichier CSV en flux
+
+        Le format (délimiteur, colonnes, format de date, séparateur décimal)
+        est lu depuis le profil eazynova.bank.format.profile correspondant à
+        l'en-tête, ou détecté une fois sur un échantillon puis mémorisé.
+
+        :param stream: objet fichier binaire
+        :param stats: StatementParseStats mis à jour au fil de l'eau
+        :return: générateur de transactions normalisées
+        """
         try:
-            # Décoder le fichier
-            content = base64.b64decode(file_data).decode('utf-8-sig')
+            text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+            head = [line for line in itertools.islice(iter(text.readline, ''), 5)]
+            header_line = head[0] if head else ''
+
+            ProfileModel = self.env['eazynova.bank.format.profile']
+            profile = ProfileModel.find_by_header(header_line)
 
-            # Détecter le délimiteur
-            delimiter = self._detect_csv_delimiter(content)
+            if profile:
+                delimiter = profile.delimiter
+            else:
+                # Détecter le délimiteur sur les premières lignes uniquement
+                delimiter = self._detect_csv_delimiter(''.join(head))
+
+            reader = csv.reader(itertools.chain(head, text), delimiter=delimiter)
+            header = next(reader, [])
+
+            if profile:
+                settings = profile.get_settings()
+                rows = reader
+                profile.mark_used()
+                stats.log(f"Profil de format: {profile.name}")
+
+                if not settings['decimal_separator']:
+                    # Séparateur encore indéterminé : retenter sur ce fichier
+                    sample = list(itertools.islice(reader, CSV_SAMPLE_SIZE))
+                    rows = itertools.chain(sample, reader)
+                    decimal_separator = self._detect_decimal_separator(
+                        self._sample_amount_values(header, sample, settings['column_mapping'])
+                    )
+                    if decimal_separator:
+                        settings['decimal_separator'] = decimal_separator
+                        profile.decimal_separator = decimal_separator
+            else:
+                # Détecter les formats une seule fois sur un échantillon
+                sample = list(itertools.islice(reader, CSV_SAMPLE_SIZE))
+                settings = self._detect_csv_profile(header, sample, delimiter)
+                rows = itertools.chain(sample, reader)
 
-            # Parser le CSV
-            reader = csv.DictReader(io.StringIO(content), delimiter=delimiter)
+                if settings['column_mapping'].get('date'):
+                    profile = ProfileModel.create_from_settings(header_line, settings)
+                    if profile:
+                        profile.mark_used()
+                        stats.log(f"Nouveau profil de format: {profile.name}")
 
-            # Détecter les colonnes
-            column_mapping = self._detect_csv_columns(reader.fieldnames)
+            if not settings['column_mapping'].get('date'):
+                raise UserError(_("Impossible de détecter la colonne date"))
 
-            transactions = []
-            log_lines = []
+            stats.log(f"Colonnes détectées: {settings['column_mapping']}")
+            stats.log(
+                f"Format de date: {settings['date_format']}, "
+                f"séparateur décimal: {settings['decimal_separator'] or 'indéterminé'}"
+            )
 
-            log_lines.append(f"Colonnes détectées: {column_mapping}")
+            convert = self._compile_row_converter(header, settings)
 
-            for row_num, row in enumerate(reader, start=2):
+            for row_num, values in enumerate(rows, start=2):
                 try:
-                    trans = self._parse_csv_row(row, column_mapping)
-                    if trans:
-                        transactions.append(trans)
+                    trans = convert(values)
                 except Exception as e:
-                    log_lines.append(f"Ligne {row_num}: Erreur - {str(e)}")
+                    stats.log(f"Ligne {row_num}: Erreur - {str(e)}")
                     _logger.warning("Erreur ligne %d: %s", row_num, e)
+                    continue
 
-            log_lines.append(f"Total: {len(transactions)} transactions importées")
-
-            # Calculer les soldes si possible
-            result = {
-                'transactions': transactions,
-                'log': '\n'.join(log_lines),
-            }
-
-            if transactions:
-                result['date_start'] = min(t['date'] for t in transactions)
-                result['date_end'] = max(t['date'] for t in transactions)
+                if trans:
+                    stats.add(trans)
+                    yield trans
 
-            return result
+            stats.log(f"Total: {stats.count} transactions importées")
 
+        except UserError:
+            raise
         except Exception as e:
             _logger.exception("Erreur parsing CSV")
             raise UserError(_("Erreur lors du parsing CSV: %s") % str(e))
 
-    @api.model
-    def parse_ofx(self, file_data):
-        """Parse un fichier OFX"""
-        try:
-            import ofxparse
-        except ImportError:
-            raise UserError(_(
-                "La bibliothèque 'ofxparse' n'est pas installée.\n"
-                "Installez-la avec: pip install ofxparse"
-            ))
+    def _detect_csv_profile(self, header, sample, delimiter):
+        """Détecte les réglages d'un format CSV à partir d'un échantillon"""
+        column_mapping = self._detect_csv_columns(header)
 
-        try:
-            # Décoder le fichier
-            content = base64.b64decode(file_data)
+        return {
+            'delimiter': delimiter,
+            'column_mapping': column_mapping,
+            'date_format': self._detect_date_format(
+                self._sample_column_values(header, sample, column_mapping, 'date')
+            ),
+            'decimal_separator': self._detect_decimal_separator(
+                self._sample_amount_values(header, sample, column_mapping)
+            ),
+        }
 
-            # Parser OFX
-            ofx = ofxparse.OfxParser.parse(io.BytesIO(content))
+    def _sample_column_values(self, header, sample, column_mapping, key):
+        """Valeurs non vides d'une colonne de l'échantillon"""
+        index = {col: i for i, col in enumerate(header)}.get(column_mapping.get(key))
+        if index is None:
+            return []
+        return [
+            row[index].strip() for row in sample
+            if index < len(row) and row[index] and row[index].strip()
+        ]
 
-            transactions = []
-            log_lines = []
+    def _sample_amount_values(self, header, sample, column_mapping):
+        """Valeurs des colonnes de montant de l'échantillon"""
+        values = []
+        for key in ('amount', 'debit', 'credit', 'balance'):
+            values.extend(self._sample_column_values(header, sample, column_mapping, key))
+        return values
+
+    def _detect_date_format(self, values):
+        """Retourne le format de date qui reconnaît le plus de valeurs"""
+        best_format = DATE_FORMATS[0]
+        best_count = 0
+
+        for fmt in DATE_FORMATS:
+            count = 0
+            for value in values:
+                try:
+                    datetime.strptime(value, fmt)
+                    count += 1
+                except ValueError:
+                    continue
 
-            # Récupérer le compte
-            if not ofx.accounts:
-                raise UserError(_("Aucun compte trouvé dans le fichier OFX"))
+            if count > best_count:
+                best_format, best_count = fmt, count
+                if count == len(values):
+                    break
 
-            account = ofx.accounts[0]
+        return best_format
 
-            log_lines.append(f"Compte: {account.account_id}")
-            log_lines.append(f"Institution: {account.institution.organization if account.institution else 'N/A'}")
+    def _detect_decimal_separator(self, values):
+        """
+        Détecte le séparateur décimal (',' ou '.') sur un échantillon de montants
 
-            # Parser les transactions
-            for trans in account.statement.transactions:
-                try:
-                    transaction = {
-                        'date': trans.date.date() if hasattr(trans.date, 'date') else trans.date,
-                        'name': trans.payee or trans.memo or '/',
-                        'ref': trans.id or '',
-                        'amount': float(trans.amount),
-                        'unique_import_id': trans.id or '',
-                        'description': trans.memo or '',
-                        'partner_name': trans.payee or '',
-                        'note': f"Type: {trans.type}",
-                    }
-                    transactions.append(transaction)
+        Retourne None si aucun montant de l'échantillon n'a de partie
+        décimale, ou en cas d'égalité : le séparateur reste indéterminé.
+        """
+        votes = {',': 0, '.': 0}
 
-                except Exception as e:
-                    log_lines.append(f"Transaction {trans.id}: Erreur - {str(e)}")
-                    _logger.warning("Erreur transaction OFX %s: %s", trans.id, e)
+        for value in values:
+            value = value.replace(' ', '').replace('\xa0', '')
+            match = DECIMAL_SUFFIX_RE.search(value)
+            if match:
+                votes[match.group(1)] += 1
 
-            log_lines.append(f"Total: {len(transactions)} transactions importées")
+        if votes['.'] == votes[',']:
+            return None
+        return '.' if votes['.'] > votes[','] else ','
+
+    def _compile_amount_parser(self, decimal_separator):
+        """
+        Construit la fonction de conversion des montants d'un format
+
+        Sans séparateur décimal connu, chaque montant est interprété
+        séparément d'après ses derniers chiffres.
+        """
+        thousands_separator = '.' if decimal_separator == ',' else ','
+        clean = AMOUNT_CLEAN_RE.sub
+        decimal_suffix = DECIMAL_SUFFIX_RE.search
+
+        def parse_amount(amount_str):
+            if not amount_str:
+                return 0.0
+
+            amount_str = amount_str.replace(' ', '').replace('\xa0', '')
+            if decimal_separator:
+                amount_str = amount_str.replace(thousands_separator, '')
+                if decimal_separator == ',':
+                    amount_str = amount_str.replace(',', '.')
+            else:
+                match = decimal_suffix(amount_str)
+                if match:
+                    integer_part = amount_str[:match.start()].replace(',', '').replace('.', '')
+                    amount_str = f"{integer_part}.{amount_str[match.start() + 1:]}"
+                else:
+                    amount_str = amount_str.replace(',', '').replace('.', '')
 
-            result = {
-                'transactions': transactions,
-                'log': '\n'.join(log_lines),
-                'date_start': account.statement.start_date.date() if hasattr(account.statement.start_date, 'date') else account.statement.start_date,
-                'date_end': account.statement.end_date.date() if hasattr(account.statement.end_date, 'date') else account.statement.end_date,
-                'balance_start': float(account.statement.balance) if hasattr(account.statement, 'balance') else 0.0,
-                'balance_end': float(account.statement.balance) if hasattr(account.statement, 'balance') else 0.0,
+            try:
+                return float(clean('', amount_str))
+            except ValueError:
+                return 0.0
+
+        return parse_amount
+
+    def _compile_row_converter(self, header, settings):
+        """
+        Compile les réglages d'un format en une fonction de conversion
+
+        Les positions des colonnes, le format de date et le parser de
+        montant sont résolus une fois ; la fonction retournée convertit une
+        ligne (liste de valeurs) en transaction normalisée.
+        """
+        column_mapping = settings['column_mapping']
+        positions = {col: i for i, col in enumerate(header)}
+
+        def position(key):
+            return positions.get(column_mapping.get(key))
+
+        i_date = position('date')
+        i_description = position('description')
+        i_amount = position('amount')
+        i_debit = position('debit')
+        i_credit = position('credit')
+        i_reference = position('reference')
+        i_balance = position('balance')
+
+        excluded = {i_date, i_amount, i_debit, i_credit, i_balance}
+
+        date_format = settings['date_format']
+        parse_amount = self._compile_amount_parser(settings['decimal_separator'])
+        parse_date = self._parse_date
+        strptime = datetime.strptime
+
+        def cell(values, index):
+            if index is None or index >= len(values):
+                return ''
+            return (values[index] or '').strip()
+
+        def convert(values):
+            # Extraire la date
+            date_str = cell(values, i_date)
+            if not date_str:
+                return None
+
+            try:
+                date = strptime(date_str, date_format).date()
+            except ValueError:
+                date = parse_date(date_str)
+
+            if not date:
+                return None
+
+            # Extraire la description
+            description = cell(values, i_description)
+
+            if not description:
+                # Essayer de trouver une colonne non vide
+                for index, value in enumerate(values):
+                    if value and index not in excluded:
+                        description = value.strip()
+                        break
+
+            # Extraire le montant
+            amount = 0.0
+
+            if i_amount is not None:
+                amount = parse_amount(cell(values, i_amount))
+            elif i_debit is not None or i_credit is not None:
+                amount = parse_amount(cell(values, i_credit)) - parse_amount(cell(values, i_debit))
+
+            trans = {
+                'date': date,
+                'name': description or '/',
+                'amount': amount,
+                'ref': cell(values, i_reference),
+                'description': description,
+                'partner_name': '',
+                'note': '',
             }
 
-            return result
+            # Extraire le solde (utilisé pour les soldes de début et de fin)
+            balance_str = cell(values, i_balance)
+            if balance_str:
+                trans['balance'] = parse_amount(balance_str)
+
+            return trans
+
+        return convert
 
+    @api.model
+    def iter_ofx_transactions(self, stream, stats):
+        """
+        Parse un fichier OFX (1.x SGML ou 2.x XML) en flux
+
+        Le fichier est lu par blocs et seules les balises utiles sont
+        conservées : la mémoire reste constante quelle que soit la taille.
+        Seul le premier relevé (STMTRS ou CCSTMTRS) est importé : les
+        comptes suivants d'un fichier multi-comptes sont ignorés.
+
+        :param stream: objet fichier binaire
+        :param stats: StatementParseStats mis à jour au fil de l'eau
+        :return: générateur de transactions normalisées
+        """
+        try:
+            head = stream.read(1024)
+            stream.seek(0)
+
+            text = io.TextIOWrapper(
+                stream, encoding=self._detect_ofx_encoding(head), errors='replace'
+            )
+
+            current = None
+            in_ledger = False
+            has_account = False
+            statement_count = 0
+
+            for closing, tag, value in self._iter_ofx_tags(text):
+                if tag in OFX_STATEMENT_TAGS and not closing:
+                    statement_count += 1
+                    if statement_count > 1:
+                        stats.log("Fichier multi-comptes : seul le premier relevé est importé")
+                        break
+                    continue
+
+                if tag == 'STMTTRN':
+                    if closing:
+                        trans = self._parse_ofx_transaction(current or {}, stats)
+                        if trans:
+                            stats.add(trans)
+                            yield trans
+                        current = None
+                    else:
+                        current = {}
+                    continue
+
+                if closing:
+                    if tag == 'LEDGERBAL':
+                        in_ledger = False
+                    continue
+
+                if current is not None:
+                    current[tag] = value
+                elif tag == 'LEDGERBAL':
+                    in_ledger = True
+                elif tag == 'BALAMT' and in_ledger:
+                    stats.balance_end = self._parse_ofx_amount(value)
+                elif tag == 'ACCTID':
+                    has_account = True
+                    stats.log(f"Compte: {value}")
+                elif tag == 'ORG':
+                    stats.log(f"Institution: {value or 'N/A'}")
+                elif tag == 'DTSTART':
+                    date = self._parse_ofx_date(value)
+                    if date and (stats.date_start is None or date < stats.date_start):
+                        stats.date_start = date
+                elif tag == 'DTEND':
+                    date = self._parse_ofx_date(value)
+                    if date and (stats.date_end is None or date > stats.date_end):
+                        stats.date_end = date
+
+            if not has_account:
+                raise UserError(_("Aucun compte trouvé dans le fichier OFX"))
+
+            stats.log(f"Total: {stats.count} transactions importées")
+
+        except UserError:
+            raise
         except Exception as e:
             _logger.exception("Erreur parsing OFX")
             raise UserError(_("Erreur lors du parsing OFX: %s") % str(e))
 
+    def _detect_ofx_encoding(self, head):
+        """Détecte l'encodage à partir de l'en-tête OFX"""
+        head_str = head.decode('ascii', errors='ignore').upper()
+
+        if 'ENCODING="UTF-8"' in head_str or 'ENCODING:UTF-8' in head_str:
+            return 'utf-8'
+        if 'CHARSET:1252' in head_str or 'ENCODING:USASCII' in head_str:
+            return 'cp1252'
+
+        return 'utf-8'
+
+    def _iter_ofx_tags(self, text):
+        """Génère les balises OFX (fermante, nom, valeur) bloc par bloc"""
+        buffer = ''
+
+        while True:
+            chunk = text.read(OFX_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            buffer += chunk
+
+            # Ne traiter que les balises complètes (jusqu'au dernier '<')
+            last = buffer.rfind('<')
+            if last <= 0:
+                continue
+
+            complete, buffer = buffer[:last], buffer[last:]
+
+            for match in OFX_TAG_RE.finditer(complete):
+                yield self._ofx_tag(match)
+
+        for match in OFX_TAG_RE.finditer(buffer):
+            yield self._ofx_tag(match)
+
+    def _ofx_tag(self, match):
+        """(fermante, nom, valeur) d'une balise, entités SGML décodées (&amp; → &)"""
+        return bool(match.group(1)), match.group(2).upper(), html.unescape(match.group(3).strip())
+
+    def _parse_ofx_transaction(self, values, stats):
+        """Normalise une transaction OFX (balises STMTTRN)"""
+        fitid = values.get('FITID', '')
+
+        try:
+            date = self._parse_ofx_date(values.get('DTPOSTED', ''))
+            if not date:
+                raise ValueError(_("date manquante"))
+
+            payee = values.get('NAME') or values.get('PAYEE') or ''
+            memo = values.get('MEMO', '')
+
+            return {
+                'date': date,
+                'name': payee or memo or '/',
+                'ref': fitid,
+                'amount': self._parse_ofx_amount(values.get('TRNAMT', '')),
+                'unique_import_id': fitid,
+                'description': memo,
+                'partner_name': payee,
+                'note': f"Type: {values.get('TRNTYPE', '')}",
+            }
+
+        except Exception as e:
+            stats.log(f"Transaction {fitid}: Erreur - {str(e)}")
+            _logger.warning("Erreur transaction OFX %s: %s", fitid, e)
+            return None
+
+    def _parse_ofx_date(self, value):
+        """Parse une date OFX (YYYYMMDD[HHMMSS[.XXX]][TZ])"""
+        if not value or len(value) < 8:
+            return None
+
+        try:
+            return datetime.strptime(value[:8], '%Y%m%d').date()
+        except ValueError:
+            return None
+
+    def _parse_ofx_amount(self, value):
+        """Parse un montant OFX"""
+        if not value:
+            return 0.0
+
+        return float(value.replace(',', '.'))
+
     @api.model
     def parse_pdf(self, file_data, use_ai=True):
         """Parse un fichier PDF avec OCR"""
@@ -200,22 +670,15 @@ class BankStatementParser(models.AbstractModel):
             raise UserError(_("Erreur lors du parsing PDF: %s") % str(e))
 
     def _ocr_pdf(self, content):
-        """Effectue l'OCR sur un PDF"""
+        """Effectue l'OCR sur un PDF (pages reconnues en parallèle)"""
         try:
-            from pdf2image import convert_from_bytes
-            import pytesseract
+            result = self.env['eazynova.ocr.service'].extract(
+                content, mimetype='application/pdf', lang='fra', native_text=False)
 
-            # Convertir PDF en images
-            images = convert_from_bytes(content)
-
-            text = ''
-
-            for i, image in enumerate(images):
-                # OCR sur chaque page
-                page_text = pytesseract.image_to_string(image, lang='fra')
-                text += f"\n--- Page {i+1} ---\n{page_text}\n"
-
-            return text
+            return ''.join(
+                f"\n--- Page {page['page']} ---\n{page['text']}\n"
+                for page in result['pages']
+            )
 
         except Exception as e:
             _logger.exception("Erreur OCR")
@@ -355,16 +818,24 @@ Texte du relevé :
 
         return ','
 
+    def _normalize_header(self, field):
+        """Normalise un nom de colonne (minuscules, sans accents)"""
+        field = unicodedata.normalize('NFKD', (field or '').lower().strip())
+        return ''.join(c for c in field if not unicodedata.combining(c))
+
     def _detect_csv_columns(self, fieldnames):
         """Détecte les colonnes du CSV"""
         if not fieldnames:
             return {}
 
         # Normaliser les noms de colonnes
-        fieldnames_lower = [f.lower().strip() for f in fieldnames]
+        fieldnames_lower = [self._normalize_header(f) for f in fieldnames]
 
         mapping = {}
 
+        def available(i):
+            return fieldnames[i] not in mapping.values()
+
         # Détecter la colonne date
         date_keywords = ['date', 'date operation', 'date valeur', 'date comptable']
         for i, field in enumerate(fieldnames_lower):
@@ -373,15 +844,24 @@ Texte du relevé :
                 break
 
         # Détecter la colonne libellé
-        desc_keywords = ['libelle', 'libellé', 'description', 'detail', 'détail', 'operation']
+        desc_keywords = ['libelle', 'description', 'detail', 'operation']
         for i, field in enumerate(fieldnames_lower):
-            if any(kw in field for kw in desc_keywords):
+            if available(i) and 'date' not in field and any(kw in field for kw in desc_keywords):
                 mapping['description'] = fieldnames[i]
                 break
 
+        # Détecter la colonne solde
+        balance_keywords = ['solde', 'balance']
+        for i, field in enumerate(fieldnames_lower):
+            if available(i) and any(kw in field for kw in balance_keywords):
+                mapping['balance'] = fieldnames[i]
+                break
+
         # Détecter la colonne montant
         amount_keywords = ['montant', 'amount', 'debit', 'credit', 'valeur']
         for i, field in enumerate(fieldnames_lower):
+            if not available(i) or 'date' in field:
+                continue
             if any(kw in field for kw in amount_keywords):
                 if 'debit' in field:
                     mapping['debit'] = fieldnames[i]
@@ -391,88 +871,20 @@ Texte du relevé :
                     mapping['amount'] = fieldnames[i]
 
         # Détecter la colonne référence
-        ref_keywords = ['reference', 'référence', 'ref', 'numero', 'numéro']
+        ref_keywords = ['reference', 'ref', 'numero']
         for i, field in enumerate(fieldnames_lower):
-            if any(kw in field for kw in ref_keywords):
+            if available(i) and any(kw in field for kw in ref_keywords):
                 mapping['reference'] = fieldnames[i]
                 break
 
         return mapping
 
-    def _parse_csv_row(self, row, column_mapping):
-        """Parse une ligne CSV"""
-        if not column_mapping.get('date'):
-            raise UserError(_("Impossible de détecter la colonne date"))
-
-        # Extraire la date
-        date_str = row.get(column_mapping['date'], '').strip()
-        if not date_str:
-            return None
-
-        # Parser la date
-        date = self._parse_date(date_str)
-        if not date:
-            return None
-
-        # Extraire la description
-        description = ''
-        if column_mapping.get('description'):
-            description = row.get(column_mapping['description'], '').strip()
-
-        if not description:
-            # Essayer de trouver une colonne non vide
-            for key, value in row.items():
-                if value and key not in [column_mapping.get('date'), column_mapping.get('amount'), column_mapping.get('debit'), column_mapping.get('credit')]:
-                    description = value.strip()
-                    break
-
-        # Extraire le montant
-        amount = 0.0
-
-        if column_mapping.get('amount'):
-            amount_str = row.get(column_mapping['amount'], '').strip()
-            amount = self._parse_amount(amount_str)
-
-        elif column_mapping.get('debit') or column_mapping.get('credit'):
-            debit_str = row.get(column_mapping.get('debit', ''), '').strip()
-            credit_str = row.get(column_mapping.get('credit', ''), '').strip()
-
-            debit = self._parse_amount(debit_str) if debit_str else 0.0
-            credit = self._parse_amount(credit_str) if credit_str else 0.0
-
-            amount = credit - debit
-
-        # Extraire la référence
-        ref = ''
-        if column_mapping.get('reference'):
-            ref = row.get(column_mapping['reference'], '').strip()
-
-        return {
-            'date': date,
-            'name': description or '/',
-            'amount': amount,
-            'ref': ref,
-            'description': description,
-            'partner_name': '',
-            'note': '',
-        }
-
     def _parse_date(self, date_str):
-        """Parse une date à partir d'une chaîne"""
+        """Parse une date à partir d'une chaîne (essai des formats communs)"""
         if not date_str:
             return None
 
-        # Formats communs
-        formats = [
-            '%d/%m/%Y',
-            '%d-%m-%Y',
-            '%Y-%m-%d',
-            '%d.%m.%Y',
-            '%d/%m/%y',
-            '%d-%m-%y',
-        ]
-
-        for fmt in formats:
+        for fmt in DATE_FORMATS:
             try:
                 return datetime.strptime(date_str, fmt).date()
             except ValueError:
@@ -485,18 +897,11 @@ Texte du relevé :
         if not amount_str:
             return 0.0
 
-        # Nettoyer la chaîne
-        amount_str = amount_str.strip()
-
-        # Supprimer les espaces
-        amount_str = amount_str.replace(' ', '')
-
-        # Remplacer les virgules par des points
-        amount_str = amount_str.replace(',', '.')
+        # Supprimer les espaces et remplacer les virgules par des points
+        amount_str = amount_str.strip().replace(' ', '').replace(',', '.')
 
         # Supprimer les caractères non numériques (sauf . et -)
-        import re
-        amount_str = re.sub(r'[^\d.-]', '', amount_str)
+        amount_str = AMOUNT_CLEAN_RE.sub('', amount_str)
 
         try:
             return float(amount_str)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from psycopg2.extras import execute_values
+import hashlib
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Score minimum pour qu'une analyse IA devienne une suggestion
+AI_MIN_SCORE = 0.5
+
+# Estimation grossière du nombre de tokens par caractère de prompt
+CHARS_PER_TOKEN = 4
+RESPONSE_TOKENS_PER_PAIR = 40
+
+
+class ReconciliationAICache(models.Model):
+    _name = 'eazynova.reconciliation.ai.cache'
+    _description = 'Cache des Scores IA de Rapprochement'
+    _rec_name = 'cache_key'
+
+    cache_key = fields.Char(string="Clé de cache", required=True, index=True)
+    provider = fields.Char(string="Fournisseur")
+    score = fields.Float(string="Score", required=True)
+    reason = fields.Text(string="Raison")
+    created_at = fields.Datetime(string="Créé le", default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('cache_key_unique', 'UNIQUE(cache_key)',
+         'La clé de cache doit être unique.'),
+    ]
+
+    @api.model
+    def _store_scores(self, provider, results):
+        """
+        Enregistre des scores en ignorant les clés déjà présentes
+
+        Deux rapprochements simultanés peuvent évaluer la même paire : la
+        seconde insertion est ignorée au lieu d'interrompre la transaction.
+
+        :param results: dict {cache_key: {'score': float, 'reason': str}}
+        """
+        if not results:
+            return
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        execute_values(self.env.cr, """
+            INSERT INTO eazynova_reconciliation_ai_cache
+                   (cache_key, provider, score, reason, created_at,
+                    create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT (cache_key) DO NOTHING
+        """, [
+            (key, provider, result['score'], result['reason'], now, uid, now, uid, now)
+            for key, result in results.items()
+        ])
+
+    @api.model
+    def cleanup_old_cache(self, days=90):
+        """Nettoyer les anciens scores (plus de 90 jours par défaut)"""
+        from datetime import timedelta
+        cutoff_date = fields.Datetime.now() - timedelta(days=days)
+        self.search([('created_at', '<', cutoff_date)]).unlink()
+        return True
+
+
+class AIRequestBudget:
+    """Budget de requêtes et de tokens pour une exécution du rapprochement IA"""
+
+    def __init__(self, max_requests, max_tokens):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.requests = 0
+        self.tokens = 0
+
+    def consume(self, tokens):
+        """Réserve une requête de `tokens` tokens, False si le budget est épuisé"""
+        if self.max_requests and self.requests + 1 > self.max_requests:
+            return False
+        if self.max_tokens and self.tokens + tokens > self.max_tokens:
+            return False
+        self.requests += 1
+        self.tokens += tokens
+        return True
+
+
+class ReconciliationAIMatcher(models.AbstractModel):
+    """
+    Étape de rapprochement par IA.
+
+    Les paires (ligne bancaire, écriture candidate) sont regroupées en lots
+    envoyés dans un seul prompt. Chaque score est mémorisé par une empreinte
+    du contenu des deux côtés : relancer un rapprochement ne rappelle pas
+    l'IA. Les lots sont traités par un pool borné de workers, dans la
+    limite d'un budget de requêtes et de tokens.
+
+    Fournisseurs (paramètre eazynova_bank_statement.ai_match_provider) :
+    * service : eazynova.ai.service (défaut)
+    * stub : évaluation locale heuristique, sans appel réseau
+    """
+    _name = 'eazynova.reconciliation.ai.matcher'
+    _description = 'Rapprochement Bancaire par IA'
+
+    @api.model
+    def _get_settings(self):
+        """Lit la configuration du rapprochement IA"""
+        params = self.env['ir.config_parameter'].sudo()
+        return {
+            'provider': params.get_param('eazynova_bank_statement.ai_match_provider', 'service'),
+            'batch_size': max(1, int(params.get_param('eazynova_bank_statement.ai_match_batch_size', 25))),
+            'max_workers': max(1, int(params.get_param('eazynova_bank_statement.ai_match_max_workers', 4))),
+            'max_requests': int(params.get_param('eazynova_bank_statement.ai_match_max_requests', 200)),
+            'max_tokens': int(params.get_param('eazynova_bank_statement.ai_match_max_tokens', 400000)),
+        }
+
+    @api.model
+    def score_pairs(self, pairs):
+        """
+        Évalue des paires (ligne bancaire, écriture candidate)
+
+        :param pairs: liste de tuples (eazynova.bank.statement.line, account.move.line)
+        :return: dict {(line_id, move_line_id): {'score': float, 'reason': str}}
+        """
+        if not pairs:
+            return {}
+
+        settings = self._get_settings()
+        provider = settings['provider']
+
+        # Empreinte de chaque paire
+        payloads = {}
+        for line, move_line in pairs:
+            payload = {
+                'bank': self._bank_payload(line),
+                'move': self._move_payload(move_line),
+            }
+            key = self._cache_key(provider, payload)
+            payloads[(line.id, move_line.id)] = (key, payload)
+
+        # Scores déjà connus
+        CacheModel = self.env['eazynova.reconciliation.ai.cache'].sudo()
+        keys = list({key for key, dummy in payloads.values()})
+        cached = {
+            entry.cache_key: {'score': entry.score, 'reason': entry.reason}
+            for entry in CacheModel.search([('cache_key', 'in', keys)])
+        }
+
+        pending = {}
+        for key, payload in payloads.values():
+            if key not in cached:
+                pending[key] = payload
+
+        if pending:
+            _logger.info(
+                "Rapprochement IA: %d paires en cache, %d à évaluer",
+                len(payloads) - len(pending), len(pending)
+            )
+            computed = self._score_pending(provider, settings, pending)
+
+            if computed:
+                CacheModel._store_scores(provider, computed)
+                cached.update(computed)
+
+        return {
+            pair_key: cached[key]
+            for pair_key, (key, dummy) in payloads.items()
+            if key in cached
+        }
+
+    def _bank_payload(self, line):
+        return {
+            'description': line.name or '',
+            'amount': line.amount,
+            'date': str(line.date),
+        }
+
+    def _move_payload(self, move_line):
+        return {
+            'name': move_line.name or '',
+            'ref': move_line.ref or '',
+            'amount': move_line.debit or move_line.credit,
+            'date': str(move_line.date),
+            'partner_name': move_line.partner_id.name if move_line.partner_id else '',
+        }
+
+    def _cache_key(self, provider, payload):
+        content = json.dumps([provider, payload], sort_keys=True, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _score_pending(self, provider, settings, pending):
+        """Découpe les paires en lots et les évalue via le pool de workers"""
+        items = list(pending.items())
+        batch_size = settings['batch_size']
+        budget = AIRequestBudget(settings['max_requests'], settings['max_tokens'])
+
+        batches = []
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            prompt = self._build_batch_prompt([payload for dummy, payload in batch])
+            tokens = len(prompt) // CHARS_PER_TOKEN + RESPONSE_TOKENS_PER_PAIR * len(batch)
+
+            if not budget.consume(tokens):
+                _logger.warning(
+                    "Budget IA atteint (%d requêtes, %d tokens): %d paires non évaluées",
+                    budget.requests, budget.tokens, len(items) - start
+                )
+                break
+
+            batches.append((batch, prompt))
+
+        if not batches:
+            return {}
+
+        registry = self.env.registry
+        uid = self.env.uid
+        context = dict(self.env.context)
+
+        def run(batch_prompt):
+            batch, prompt = batch_prompt
+            try:
+                if provider == 'stub':
+                    response = self._call_stub_provider([payload for dummy, payload in batch])
+                else:
+                    # Chaque worker utilise son propre curseur
+                    with registry.cursor() as cr:
+                        env = api.Environment(cr, uid, context)
+                        response = env['eazynova.ai.service'].analyze_text(prompt, format='json')
+                return batch, response
+            except Exception as e:
+                _logger.warning("Erreur analyse IA par lot: %s", e)
+                return batch, None
+
+        results = {}
+        max_workers = min(settings['max_workers'], len(batches))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch, response in executor.map(run, batches):
+                results.update(self._parse_batch_response(batch, response))
+
+        return results
+
+    def _build_batch_prompt(self, payloads):
+        """Construit un prompt unique pour un lot de paires"""
+        pairs = [
+            {'id': index, 'bank': payload['bank'], 'move': payload['move']}
+            for index, payload in enumerate(payloads)
+        ]
+
+        return f"""
+Analyse si chaque transaction bancaire correspond à l'écriture comptable associée.
+
+Paires à évaluer (JSON) :
+{json.dumps(pairs, ensure_ascii=False, default=str)}
+
+Pour chaque paire, réponds avec un score de confiance entre 0 et 1, et une raison courte.
+Format JSON : {{"results": [{{"id": 0, "score": 0.0-1.0, "reason": "..."}}, ...]}}
+"""
+
+    def _parse_batch_response(self, batch, response):
+        """Associe la réponse IA aux clés de cache du lot"""
+        results = {}
+
+        if not response or not isinstance(response, dict):
+            return results
+
+        for item in response.get('results') or []:
+            try:
+                index = int(item.get('id'))
+                score = float(item.get('score', 0))
+            except (TypeError, ValueError, AttributeError):
+                continue
+
+            if 0 <= index < len(batch):
+                key = batch[index][0]
+                results[key] = {
+                    'score': max(0.0, min(1.0, score)),
+                    'reason': item.get('reason') or _("Analyse IA"),
+                }
+
+        return results
+
+    def _call_stub_provider(self, payloads):
+        """Fournisseur local : score heuristique déterministe (hors ligne)"""
+        results = []
+
+        for index, payload in enumerate(payloads):
+            bank = payload['bank']
+            move = payload['move']
+
+            score = 0.0
+
+            if round(abs(bank['amount'] or 0.0), 2) == round(abs(move['amount'] or 0.0), 2):
+                score += 0.5
+
+            move_text = ' '.join(filter(None, [move['name'], move['ref'], move['partner_name']]))
+            similarity = SequenceMatcher(
+                None, bank['description'].lower(), move_text.lower()
+            ).ratio()
+            score += 0.3 * similarity
+
+            try:
+                date_diff = abs((fields.Date.to_date(bank['date']) - fields.Date.to_date(move['date'])).days)
+                score += 0.2 * max(0.0, 1.0 - date_diff / 30.0)
+            except (TypeError, ValueError):
+                pass
+
+            results.append({
+                'id': index,
+                'score': round(score, 4),
+                'reason': _("Analyse locale (similarité libellé %.0f%%)") % (similarity * 100),
+            })
+
+        return {'results': results}
@@ -80,12 +80,16 @@ class ReconciliationAlert(models.Model):
         ('3', 'Urgent'),
     ], string='Priorité', default='1', tracking=True)
 
-    @api.model
-    def create(self, vals):
-        alert = super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        alerts = super().create(vals_list)
+
+        # Les créations par lot (import) notifient une seule fois par import
+        if self.env.context.get('skip_alert_activity'):
+            return alerts
 
         # Créer une activité si nécessaire
-        if alert.severity in ['error', 'critical']:
+        for alert in alerts.filtered(lambda a: a.severity in ['error', 'critical']):
             alert.activity_schedule(
                 'mail.mail_activity_data_todo',
                 summary=_('Alerte de rapprochement: %s') % alert.alert_type,
@@ -93,7 +97,7 @@ class ReconciliationAlert(models.Model):
                 user_id=alert.user_id.id if alert.user_id else self.env.user.id,
             )
 
-        return alert
+        return alerts
 
     def action_resolve(self):
         """Marque l'alerte comme résolue"""
@@ -1,11 +1,186 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
+from collections import deque
 import re
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Champs dont la modification invalide le cache des règles compilées
+RULE_MATCHING_FIELDS = {
+    'active', 'sequence', 'company_id', 'journal_ids', 'rule_type',
+    'reference_pattern', 'description_keywords', 'partner_keywords',
+    'amount_min', 'amount_max', 'partner_id', 'confidence_boost', 'name',
+}
+
+
+class KeywordAutomaton:
+    """
+    Automate d'Aho–Corasick : trouve en une passe tous les mots-clés
+    présents (en sous-chaîne) dans un texte.
+    """
+
+    def __init__(self, keywords):
+        self.transitions = [{}]
+        self.failure = [0]
+        self.outputs = [set()]
+
+        for keyword in keywords:
+            self._add(keyword)
+
+        self._build_failure_links()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.failure.append(0)
+                self.outputs.append(set())
+                self.transitions[state][char] = next_state
+            state = next_state
+        self.outputs[state].add(keyword)
+
+    def _build_failure_links(self):
+        queue = deque(self.transitions[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+
+                fallback = self.failure[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.failure[fallback]
+
+                self.failure[next_state] = self.transitions[fallback].get(char, 0)
+                if self.failure[next_state] == next_state:
+                    self.failure[next_state] = 0
+                self.outputs[next_state] |= self.outputs[self.failure[next_state]]
+
+    def find(self, text):
+        """Retourne l'ensemble des mots-clés présents dans le texte"""
+        found = set()
+        state = 0
+
+        for char in text:
+            while state and char not in self.transitions[state]:
+                state = self.failure[state]
+            state = self.transitions[state].get(char, 0)
+            if self.outputs[state]:
+                found |= self.outputs[state]
+
+        return found
+
+
+class CompiledRuleSet:
+    """
+    Ensemble des règles actives d'une société, compilé pour l'évaluation :
+    expressions régulières précompilées et un automate unique pour tous les
+    mots-clés (description et partenaire).
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        keywords = set()
+
+        for rule in rules:
+            pattern = None
+            if rule.reference_pattern:
+                try:
+                    pattern = re.compile(rule.reference_pattern, re.IGNORECASE)
+                except re.error:
+                    _logger.warning("Pattern invalide pour règle %s: %s", rule.id, rule.reference_pattern)
+
+            description_keywords = self._split_keywords(rule.description_keywords)
+            partner_keywords = self._split_keywords(rule.partner_keywords)
+            keywords.update(description_keywords)
+            keywords.update(partner_keywords)
+
+            self.rules.append({
+                'id': rule.id,
+                'name': rule.name,
+                'rule_type': rule.rule_type,
+                'journal_ids': frozenset(rule.journal_ids.ids),
+                'has_reference_pattern': bool(rule.reference_pattern),
+                'pattern': pattern,
+                'description_keywords': description_keywords,
+                'partner_keywords': partner_keywords,
+                'amount_min': rule.amount_min,
+                'amount_max': rule.amount_max,
+                'partner_id': rule.partner_id.id,
+                'confidence_boost': rule.confidence_boost,
+            })
+
+        self.automaton = KeywordAutomaton(keywords)
+
+    @staticmethod
+    def _split_keywords(keywords):
+        if not keywords:
+            return frozenset()
+        return frozenset(k.strip().lower() for k in keywords.split(',') if k.strip())
+
+    def match(self, journal_id, ref, amount, description, partner_name):
+        """Retourne les règles (dans l'ordre de séquence) qui correspondent"""
+        description_found = self.automaton.find((description or '').lower())
+        partner_found = self.automaton.find((partner_name or '').lower())
+        amount = abs(amount or 0.0)
+
+        matched = []
+
+        for rule in self.rules:
+            if rule['journal_ids'] and journal_id not in rule['journal_ids']:
+                continue
+            if self._check_rule(rule, ref, amount, description_found, partner_found):
+                matched.append(rule)
+
+        return matched
+
+    def _check_rule(self, rule, ref, amount, description_found, partner_found):
+        rule_type = rule['rule_type']
+
+        def check_reference():
+            return bool(rule['pattern'] and ref and rule['pattern'].search(ref))
+
+        def check_amount():
+            if rule['amount_min'] and amount < rule['amount_min']:
+                return False
+            if rule['amount_max'] and amount > rule['amount_max']:
+                return False
+            return True
+
+        def check_description():
+            return bool(rule['description_keywords'] & description_found)
+
+        def check_partner():
+            return bool(rule['partner_keywords'] & partner_found)
+
+        if rule_type == 'reference_pattern':
+            return check_reference()
+        elif rule_type == 'amount_range':
+            return check_amount()
+        elif rule_type == 'partner_keyword':
+            return check_partner()
+        elif rule_type == 'description_keyword':
+            return check_description()
+        elif rule_type == 'combined':
+            # Toutes les conditions renseignées doivent être vraies (ET logique)
+            results = []
+            if rule['has_reference_pattern']:
+                results.append(check_reference())
+            if rule['description_keywords']:
+                results.append(check_description())
+            if rule['partner_keywords']:
+                results.append(check_partner())
+            if rule['amount_min'] or rule['amount_max']:
+                results.append(check_amount())
+            return all(results) if results else False
+
+        return False
+
 
 class ReconciliationRule(models.Model):
     _name = 'eazynova.reconciliation.rule'
@@ -91,98 +266,56 @@ class ReconciliationRule(models.Model):
         readonly=True
     )
 
-    def check_match(self, line):
-        """Vérifie si la ligne correspond à cette règle"""
-        self.ensure_one()
-
-        if not self.active:
-            return False
-
-        # Vérifier le journal
-        if self.journal_ids and line.import_id.journal_id.id not in self.journal_ids.ids:
-            return False
-
-        if self.rule_type == 'reference_pattern':
-            return self._check_reference_pattern(line)
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
 
-        elif self.rule_type == 'amount_range':
-            return self._check_amount_range(line)
-
-        elif self.rule_type == 'partner_keyword':
-            return self._check_partner_keyword(line)
-
-        elif self.rule_type == 'description_keyword':
-            return self._check_description_keyword(line)
-
-        elif self.rule_type == 'combined':
-            return self._check_combined(line)
-
-        return False
-
-    def _check_reference_pattern(self, line):
-        """Vérifie le pattern de référence"""
-        if not self.reference_pattern or not line.ref:
-            return False
-
-        try:
-            pattern = re.compile(self.reference_pattern, re.IGNORECASE)
-            return bool(pattern.search(line.ref))
-        except re.error:
-            _logger.warning("Pattern invalide pour règle %s: %s", self.id, self.reference_pattern)
-            return False
-
-    def _check_amount_range(self, line):
-        """Vérifie la plage de montant"""
-        amount = abs(line.amount)
-
-        if self.amount_min and amount < self.amount_min:
-            return False
-
-        if self.amount_max and amount > self.amount_max:
-            return False
+    def write(self, vals):
+        res = super().write(vals)
+        # Les statistiques (match_count...) n'invalident pas le cache
+        if RULE_MATCHING_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
 
-        return True
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
 
-    def _check_partner_keyword(self, line):
-        """Vérifie les mots-clés du partenaire"""
-        if not self.partner_keywords:
-            return False
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_compiled_rules(self, company_id):
+        """Règles actives de la société, compilées (mises en cache)"""
+        rules = self.sudo().search([
+            ('active', '=', True),
+            '|',
+            ('company_id', '=', False),
+            ('company_id', '=', company_id),
+        ], order='sequence, id')
 
-        partner_text = (line.partner_name or '').lower()
+        return CompiledRuleSet(rules)
 
-        keywords = [k.strip().lower() for k in self.partner_keywords.split(',')]
+    def _match_line(self, compiled, line):
+        """Règles compilées correspondant à une ligne bancaire"""
+        return compiled.match(
+            line.import_id.journal_id.id,
+            line.ref,
+            line.amount,
+            line.name,
+            line.partner_name,
+        )
 
-        return any(keyword in partner_text for keyword in keywords if keyword)
+    def check_match(self, line):
+        """Vérifie si la ligne correspond à cette règle"""
+        self.ensure_one()
 
-    def _check_description_keyword(self, line):
-        """Vérifie les mots-clés de la description"""
-        if not self.description_keywords:
+        if not self.active:
             return False
 
-        description_text = (line.name or '').lower()
-
-        keywords = [k.strip().lower() for k in self.description_keywords.split(',')]
-
-        return any(keyword in description_text for keyword in keywords if keyword)
-
-    def _check_combined(self, line):
-        """Vérifie une règle combinée (ET logique)"""
-        results = []
-
-        if self.reference_pattern:
-            results.append(self._check_reference_pattern(line))
-
-        if self.description_keywords:
-            results.append(self._check_description_keyword(line))
-
-        if self.partner_keywords:
-            results.append(self._check_partner_keyword(line))
-
-        if self.amount_min or self.amount_max:
-            results.append(self._check_amount_range(line))
-
-        # Toutes les conditions doivent être vraies
-        return all(results) if results else False
+        compiled = self._get_compiled_rules(line.import_id.company_id.id)
+        return any(rule['id'] == self.id for rule in self._match_line(compiled, line))
 
     def apply_rule(self, line):
         """Applique la règle à la ligne"""
@@ -206,30 +339,68 @@ class ReconciliationRule(models.Model):
     @api.model
     def apply_rules_to_line(self, line):
         """Applique toutes les règles correspondantes à une ligne"""
-        rules = self.search([
-            ('active', '=', True),
-            '|',
-            ('company_id', '=', False),
-            ('company_id', '=', line.import_id.company_id.id),
-        ], order='sequence, id')
-
-        total_confidence_boost = 0.0
-        matched_rules = []
-
-        for rule in rules:
-            if rule.check_match(line):
-                result = rule.apply_rule(line)
-                total_confidence_boost += result.get('confidence_boost', 0)
-                matched_rules.append(rule.name)
+        result = self.apply_rules_to_lines(line)
+        total_confidence_boost, matched_rules = result.get(line.id, (0.0, []))
 
-        if matched_rules:
-            _logger.info(
-                "Règles appliquées à la ligne %s: %s (boost: %.2f)",
-                line.id, ', '.join(matched_rules), total_confidence_boost
-            )
-
-            # Ajouter le boost au score de confiance
-            if line.confidence_score:
-                line.confidence_score = min(1.0, line.confidence_score + total_confidence_boost)
+        # Ajouter le boost au score de confiance
+        if matched_rules and line.confidence_score:
+            line.confidence_score = min(1.0, line.confidence_score + total_confidence_boost)
 
         return matched_rules
+
+    @api.model
+    def apply_rules_to_lines(self, lines):
+        """
+        Évalue toutes les règles sur un ensemble de lignes en une passe
+
+        Les règles compilées sont chargées une fois par société, les
+        partenaires sont assignés et les compteurs de correspondances mis à
+        jour en une écriture par règle.
+
+        :return: dict {line_id: (boost total, [noms des règles])}
+        """
+        results = {}
+        rule_matches = {}
+        partner_lines = {}
+
+        for company, company_lines in lines.grouped(lambda l: l.import_id.company_id).items():
+            compiled = self._get_compiled_rules(company.id)
+            if not compiled.rules:
+                continue
+
+            for line in company_lines:
+                matched = self._match_line(compiled, line)
+                if not matched:
+                    continue
+
+                total_confidence_boost = 0.0
+                partner_id = line.partner_id.id
+
+                for rule in matched:
+                    total_confidence_boost += rule['confidence_boost']
+                    rule_matches[rule['id']] = rule_matches.get(rule['id'], 0) + 1
+
+                    # Assigner le partenaire de la première règle qui en définit un
+                    if rule['partner_id'] and not partner_id:
+                        partner_id = rule['partner_id']
+                        partner_lines.setdefault(partner_id, []).append(line.id)
+
+                results[line.id] = (total_confidence_boost, [rule['name'] for rule in matched])
+
+                _logger.info(
+                    "Règles appliquées à la ligne %s: %s (boost: %.2f)",
+                    line.id, ', '.join(results[line.id][1]), total_confidence_boost
+                )
+
+        LineModel = self.env['eazynova.bank.statement.line']
+        for partner_id, line_ids in partner_lines.items():
+            LineModel.browse(line_ids).write({'partner_id': partner_id})
+
+        now = fields.Datetime.now()
+        for rule in self.sudo().browse(list(rule_matches)):
+            rule.write({
+                'match_count': rule.match_count + rule_matches[rule.id],
+                'last_match_date': now,
+            })
+
+        return results
@@ -2,6 +2,7 @@
 
 from . import res_company
 from . import res_partner
+from . import partner_ledger_summary
 from . import account_chart
 from . import account_journal
 from . import account_tax
@@ -170,15 +170,17 @@ class AccountChart(models.Model):
                 account.internal_group = False
 
     def _compute_balance(self):
-        """Calcule le solde du compte"""
-        for account in self:
-            lines = self.env['account.move.line'].search([
-                ('account_id', '=', account.id),
-                ('move_id.state', '=', 'posted')
-            ])
-            account.debit = sum(lines.mapped('debit'))
-            account.credit = sum(lines.mapped('credit'))
-            account.balance = account.debit - account.credit
+        """Calcule le solde du compte (totaux agrégés par société, une requête)"""
+        for company, accounts in self.grouped('company_id').items():
+            totals = {}
+            if company:
+                for account_id, __, debit, credit in self.env['account.move.line']._get_account_totals(company.id):
+                    totals[account_id] = (debit, credit)
+            for account in accounts:
+                debit, credit = totals.get(account.id, (0.0, 0.0))
+                account.debit = debit
+                account.credit = credit
+                account.balance = debit - credit
 
     @api.constrains('code', 'company_id')
     def _check_code_unique(self):
@@ -3,6 +3,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+from .account_move import HASH_CHAIN_CHUNK_SIZE, compute_move_hash
+
 
 class AccountJournal(models.Model):
     _name = 'account.journal'
@@ -174,3 +176,116 @@ class AccountJournal(models.Model):
                 'default_move_type': 'entry'
             }
         }
+
+    def _get_legacy_chain_hash(self):
+        """
+        Dernier hash calculé avant la numérotation des chaînes
+
+        Les écritures hachées sans numéro de chaîne (secure_sequence_number)
+        précèdent la chaîne numérotée : la première écriture numérotée est
+        chaînée au hash de la plus récente d'entre elles.
+
+        :return: hash, ou '' si le journal n'en a pas
+        """
+        self.ensure_one()
+        self.env['account.move'].flush_model(['inalterable_hash', 'secure_sequence_number'])
+        self.env.cr.execute("""
+            SELECT inalterable_hash
+              FROM account_move
+             WHERE journal_id = %s
+               AND inalterable_hash IS NOT NULL
+               AND COALESCE(secure_sequence_number, 0) = 0
+          ORDER BY id DESC
+             LIMIT 1
+        """, (self.id,))
+        row = self.env.cr.fetchone()
+        return row[0] if row else ''
+
+    def _verify_hash_chain(self):
+        """
+        Vérifie la chaîne de hash du journal
+
+        Les écritures sont relues dans l'ordre de la chaîne par un curseur
+        serveur, par paquets, à partir du dernier hash antérieur à la
+        numérotation ; la vérification s'arrête à la première rupture.
+
+        :return: Dict avec 'checked' (écritures vérifiées) et 'break' (None
+                 ou dict 'move_id', 'name', 'number', 'reason')
+        """
+        self.ensure_one()
+        self.env['account.move'].flush_model()
+        previous_hash = self._get_legacy_chain_hash()
+
+        cr = self.env.cr
+        cr.execute("""
+            DECLARE hash_chain NO SCROLL CURSOR FOR
+            SELECT id, name, date, amount_total, state, inalterable_hash, secure_sequence_number
+              FROM account_move
+             WHERE journal_id = %s AND secure_sequence_number > 0
+          ORDER BY secure_sequence_number
+        """, (self.id,))
+
+        checked = 0
+        failure = None
+        try:
+            while failure is None:
+                cr.execute("FETCH FORWARD %s FROM hash_chain", (HASH_CHAIN_CHUNK_SIZE,))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                for move_id, name, move_date, amount_total, state, stored_hash, number in rows:
+                    if number != checked + 1:
+                        reason = _('Écriture n°%s absente de la chaîne') % (checked + 1)
+                    elif state != 'posted':
+                        reason = _('Écriture remise en brouillon ou annulée')
+                    elif stored_hash != compute_move_hash(name, move_date, amount_total, previous_hash):
+                        reason = _('Hash ne correspondant pas au contenu de l\'écriture')
+                    else:
+                        checked += 1
+                        previous_hash = stored_hash
+                        continue
+
+                    failure = {
+                        'move_id': move_id,
+                        'name': name,
+                        'number': number,
+                        'reason': reason,
+                    }
+                    break
+        finally:
+            cr.execute("CLOSE hash_chain")
+
+        return {'checked': checked, 'break': failure}
+
+    def action_verify_hash_chain(self):
+        """Vérifie l'intégrité des chaînes de hash des journaux sélectionnés"""
+        messages = []
+        broken = False
+        for journal in self:
+            result = journal._verify_hash_chain()
+            if result['break']:
+                broken = True
+                messages.append(_(
+                    '%(journal)s : rupture à l\'écriture %(name)s (n°%(number)s) - %(reason)s'
+                ) % {
+                    'journal': journal.name,
+                    'name': result['break']['name'],
+                    'number': result['break']['number'],
+                    'reason': result['break']['reason'],
+                })
+            else:
+                messages.append(_('%(journal)s : %(count)s écriture(s) intègre(s)') % {
+                    'journal': journal.name,
+                    'count': result['checked'],
+                })
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Vérification des hash'),
+                'message': '\n'.join(messages),
+                'type': 'danger' if broken else 'success',
+                'sticky': broken,
+            }
+        }
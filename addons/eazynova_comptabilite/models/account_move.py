@@ -3,6 +3,20 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime
+from psycopg2.extras import execute_values
+import hashlib
+
+# Types d'écritures qui sont des factures ou avoirs
+INVOICE_TYPES = ('out_invoice', 'in_invoice', 'out_refund', 'in_refund')
+
+# Nombre d'écritures lues par paquet lors de la vérification d'une chaîne
+HASH_CHAIN_CHUNK_SIZE = 10000
+
+
+def compute_move_hash(name, date, amount_total, previous_hash):
+    """Hash inaltérable d'une écriture, chaîné au hash précédent du journal"""
+    hash_string = f"{name or ''}|{date}|{float(amount_total or 0.0):.2f}|{previous_hash or ''}"
+    return hashlib.sha256(hash_string.encode()).hexdigest()
 
 
 class AccountMove(models.Model):
@@ -194,6 +208,14 @@ class AccountMove(models.Model):
         copy=False
     )
 
+    secure_sequence_number = fields.Integer(
+        string='N° dans la chaîne de hash',
+        readonly=True,
+        copy=False,
+        index=True,
+        help='Position de l\'écriture dans la chaîne de hash de son journal'
+    )
+
     # Origine
     reversed_entry_id = fields.Many2one(
         'account.move',
@@ -256,6 +278,11 @@ class AccountMove(models.Model):
             else:
                 move.payment_state = 'not_paid'
 
+        # Facture créée, comptabilisée, payée ou annulée : synthèse à jour
+        self.env['account.partner.ledger.summary']._schedule_refresh(
+            self.filtered(lambda move: move.is_invoice()).partner_id.ids
+        )
+
     def _compute_attachment_count(self):
         """Compte les pièces jointes"""
         for move in self:
@@ -264,6 +291,15 @@ class AccountMove(models.Model):
                 ('res_id', '=', move.id)
             ])
 
+    def init(self):
+        super().init()
+        # Un numéro de chaîne ne peut servir qu'une fois par journal
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS account_move_secure_sequence_unique
+                ON account_move (journal_id, secure_sequence_number)
+             WHERE secure_sequence_number > 0
+        """)
+
     @api.model
     def create(self, vals):
         """Création d'une écriture avec numéro automatique"""
@@ -276,6 +312,26 @@ class AccountMove(models.Model):
         move = super(AccountMove, self).create(vals)
         return move
 
+    def write(self, vals):
+        if 'partner_id' in vals:
+            # Synthèse de l'ancien partenaire (le nouveau suit le recalcul
+            # de l'état de paiement)
+            self.env['account.partner.ledger.summary']._schedule_refresh(
+                self.filtered(lambda move: move.is_invoice()).partner_id.ids + [vals['partner_id']]
+            )
+        return super(AccountMove, self).write(vals)
+
+    def unlink(self):
+        self.env['account.partner.ledger.summary']._schedule_refresh(
+            self.filtered(lambda move: move.is_invoice()).partner_id.ids
+        )
+        return super(AccountMove, self).unlink()
+
+    def is_invoice(self):
+        """Facture ou avoir, client ou fournisseur"""
+        self.ensure_one()
+        return self.move_type in INVOICE_TYPES
+
     def action_post(self):
         """Comptabilise l'écriture"""
         for move in self:
@@ -301,12 +357,11 @@ class AccountMove(models.Model):
                 if move.journal_id.sequence_id:
                     move.name = move.journal_id.sequence_id.next_by_id()
 
-            # Générer hash si verrouillage activé
-            if move.journal_id.restrict_mode_hash_table:
-                move._compute_hash()
-
             move.state = 'posted'
 
+        # Générer les hash des journaux verrouillés
+        self._hash_moves()
+
         return True
 
     def action_draft(self):
@@ -346,22 +401,63 @@ class AccountMove(models.Model):
             }
         }
 
-    def _compute_hash(self):
-        """Calcule le hash inaltérable"""
-        import hashlib
-        for move in self:
-            # Récupérer le hash de l'écriture précédente
-            previous_move = self.search([
-                ('journal_id', '=', move.journal_id.id),
-                ('state', '=', 'posted'),
-                ('id', '<', move.id)
-            ], order='id desc', limit=1)
-
-            previous_hash = previous_move.inalterable_hash if previous_move else ''
-
-            # Calculer le hash
-            hash_string = f"{move.name}|{move.date}|{move.amount_total}|{previous_hash}"
-            move.inalterable_hash = hashlib.sha256(hash_string.encode()).hexdigest()
+    def _hash_moves(self):
+        """
+        Calcule les hash inaltérables des écritures comptabilisées
+
+        Les écritures sont traitées par journal verrouillé, dans l'ordre de
+        leur numéro : le journal est verrouillé une fois, le dernier hash de
+        sa chaîne est lu une fois puis reporté en mémoire d'une écriture à
+        l'autre, et tous les hash sont écrits en une seule requête. Une
+        chaîne neuve part du dernier hash calculé avant la numérotation.
+        """
+        values = []
+        self.flush_model(['inalterable_hash', 'secure_sequence_number'])
+
+        journals = self.grouped('journal_id')
+        for journal in sorted(journals, key=lambda journal: journal.id):
+            if not journal.restrict_mode_hash_table:
+                continue
+            moves = journals[journal].filtered(
+                lambda move: move.state == 'posted' and not move.inalterable_hash
+            )
+            if not moves:
+                continue
+
+            # Un verrou par journal, pris par une vraie écriture : en
+            # REPEATABLE READ, une transaction concurrente qui attendait ce
+            # verrou échoue en erreur de sérialisation (rejouée par Odoo)
+            # au lieu de relire une tête de chaîne périmée
+            self.env.cr.execute(
+                "UPDATE account_journal SET write_date = write_date WHERE id = %s", (journal.id,)
+            )
+            self.env.cr.execute("""
+                SELECT secure_sequence_number, inalterable_hash
+                  FROM account_move
+                 WHERE journal_id = %s AND secure_sequence_number > 0
+              ORDER BY secure_sequence_number DESC
+                 LIMIT 1
+            """, (journal.id,))
+            number, previous_hash = self.env.cr.fetchone() or (0, None)
+            if not number:
+                # Début de la chaîne numérotée : suite des hash antérieurs
+                previous_hash = journal._get_legacy_chain_hash()
+
+            for move in moves.sorted(lambda move: (move.name or '', move.id)):
+                number += 1
+                previous_hash = compute_move_hash(move.name, move.date, move.amount_total, previous_hash)
+                values.append((move.id, previous_hash, number))
+
+        if values:
+            execute_values(self.env.cr, """
+                UPDATE account_move m
+                   SET inalterable_hash = v.hash, secure_sequence_number = v.number
+                  FROM (VALUES %s) AS v(id, hash, number)
+                 WHERE m.id = v.id
+            """, values)
+            self.browse([move_id for move_id, __, __ in values]).invalidate_recordset(
+                ['inalterable_hash', 'secure_sequence_number']
+            )
 
     def action_view_attachments(self):
         """Affiche les pièces jointes"""
@@ -3,6 +3,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+# Découpages possibles des colonnes de période (unités de date_trunc)
+PERIOD_UNITS = ('month', 'quarter', 'year')
+
 
 class AccountMoveLine(models.Model):
     _name = 'account.move.line'
@@ -307,6 +310,63 @@ class AccountMoveLine(models.Model):
 
         return True
 
+    @api.model
+    def _get_account_totals(self, company_id, date_from=None, date_to=None, states=('posted',),
+                            journal_ids=(), period=None, opening=False):
+        """
+        Totaux débit/crédit par compte, en une seule requête agrégée
+
+        :param company_id: ID de la société
+        :param date_from: Début de période (inclus)
+        :param date_to: Fin de période (incluse)
+        :param states: Tuple des états d'écriture retenus
+        :param journal_ids: Tuple d'IDs de journaux (vide = tous)
+        :param period: Découpage en colonnes ('month', 'quarter', 'year') ou
+                       None pour une seule colonne
+        :param opening: Totaliser aussi les lignes antérieures à date_from
+                        (solde d'ouverture)
+        :return: Tuple de tuples (account_id, colonne, débit, crédit) ; la
+                 colonne vaut None pour le solde d'ouverture, la date de début
+                 de période avec découpage, False sinon.
+        """
+        if period and period not in PERIOD_UNITS:
+            raise ValueError(f"Découpage de période inconnu: {period}")
+
+        self.env['account.move'].flush_model(['state', 'journal_id'])
+        self.flush_model(['account_id', 'company_id', 'date', 'debit', 'credit', 'move_id'])
+
+        params = {
+            'company_id': company_id,
+            'states': tuple(states),
+            'date_from': date_from,
+            'date_to': date_to,
+            'journal_ids': tuple(journal_ids),
+            'period': period,
+        }
+        conditions = ['l.company_id = %(company_id)s', 'm.state IN %(states)s']
+        if date_to:
+            conditions.append('l.date <= %(date_to)s')
+        if journal_ids:
+            conditions.append('m.journal_id IN %(journal_ids)s')
+
+        column = 'date_trunc(%(period)s, l.date)::date' if period else 'FALSE'
+        if date_from and opening:
+            column = f'CASE WHEN l.date < %(date_from)s THEN NULL ELSE {column} END'
+        elif date_from:
+            conditions.append('l.date >= %(date_from)s')
+
+        self.env.cr.execute(f"""
+            SELECT l.account_id, {column}, SUM(l.debit), SUM(l.credit)
+              FROM account_move_line l
+              JOIN account_move m ON m.id = l.move_id
+             WHERE {' AND '.join(conditions)}
+          GROUP BY 1, 2
+        """, params)
+        return tuple(
+            (account_id, column, debit or 0.0, credit or 0.0)
+            for account_id, column, debit, credit in self.env.cr.fetchall()
+        )
+
 
 class AccountFullReconcile(models.Model):
     _name = 'account.full.reconcile'
@@ -1,12 +1,29 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api, _
-import base64
-from io import BytesIO
+from odoo.exceptions import UserError
+from datetime import date
+from dateutil.relativedelta import relativedelta
+import hashlib
+import io
 import logging
+import os
+import shutil
+import tempfile
+
+from .accounting_fec import (
+    FEC_COLUMNS, FEC_ENCODING, FecValidator,
+    fec_amount, fec_date, fec_line, fec_text,
+)
 
 _logger = logging.getLogger(__name__)
 
+# Taille des blocs recopiés dans le filestore (1 Mo)
+EXPORT_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Nombre de lignes d'écriture lues par requête lors des exports
+EXPORT_CHUNK_SIZE = 10000
+
 
 class AccountingExport(models.TransientModel):
     _name = 'accounting.export'
@@ -57,8 +74,21 @@ class AccountingExport(models.TransientModel):
         default=lambda self: self.env.company
     )
 
-    # Fichier exporté
-    file_data = fields.Binary(
+    target_move = fields.Selection([
+        ('posted', 'Écritures comptabilisées'),
+        ('all', 'Toutes les écritures'),
+    ], string='Écritures', required=True, default='posted')
+
+    period_split = fields.Selection([
+        ('month', 'Mois'),
+        ('quarter', 'Trimestre'),
+        ('year', 'Année'),
+    ], string='Colonnes par période',
+        help='Balance de vérification : ajoute le mouvement de chaque période')
+
+    # Fichier exporté (pièce jointe du filestore)
+    attachment_id = fields.Many2one(
+        'ir.attachment',
         string='Fichier',
         readonly=True
     )
@@ -68,11 +98,25 @@ class AccountingExport(models.TransientModel):
         readonly=True
     )
 
+    # FEC
+    fec_allow_anomalies = fields.Boolean(
+        string='Exporter malgré les anomalies',
+        help='Produit le FEC même si des écritures sont déséquilibrées ou si la numérotation présente des ruptures'
+    )
+
+    fec_report = fields.Text(
+        string='Rapport de validation FEC',
+        readonly=True
+    )
+
     def action_export(self):
         """Lance l'export"""
         self.ensure_one()
 
-        if self.export_format == 'xlsx':
+        if self.export_type == 'fec':
+            # Format imposé, quel que soit le format choisi
+            return self._export_fec()
+        elif self.export_format == 'xlsx':
             return self._export_xlsx()
         elif self.export_format == 'pdf':
             return self._export_pdf()
@@ -82,69 +126,49 @@ class AccountingExport(models.TransientModel):
         return True
 
     def _export_xlsx(self):
-        """Export Excel"""
+        """Export Excel, écrit ligne à ligne (mode constant_memory)"""
         try:
             import xlsxwriter
 
-            output = BytesIO()
-            workbook = xlsxwriter.Workbook(output)
-            worksheet = workbook.add_worksheet(self.export_type.replace('_', ' ').title())
-
-            # Formats
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#4472C4',
-                'font_color': 'white',
-                'border': 1
-            })
-
-            money_format = workbook.add_format({'num_format': '#,##0.00'})
-
-            # En-têtes selon le type
-            if self.export_type == 'balance':
-                headers = ['Code', 'Nom du compte', 'Débit', 'Crédit', 'Solde']
-                data = self._get_balance_data()
-            elif self.export_type == 'general_ledger':
-                headers = ['Date', 'Journal', 'Compte', 'Libellé', 'Débit', 'Crédit', 'Solde']
-                data = self._get_general_ledger_data()
-            elif self.export_type == 'journal':
-                headers = ['Date', 'Compte', 'Libellé', 'Référence', 'Débit', 'Crédit']
-                data = self._get_journal_data()
-            else:
-                headers = []
-                data = []
-
-            # Écrire les en-têtes
-            for col, header in enumerate(headers):
-                worksheet.write(0, col, header, header_format)
-
-            # Écrire les données
-            for row, line in enumerate(data, start=1):
-                for col, value in enumerate(line):
-                    if isinstance(value, (int, float)) and col >= len(headers) - 3:
-                        worksheet.write(row, col, value, money_format)
-                    else:
-                        worksheet.write(row, col, value)
-
-            # Ajuster la largeur des colonnes
-            for col, header in enumerate(headers):
-                worksheet.set_column(col, col, len(header) + 5)
-
-            workbook.close()
-            output.seek(0)
-
-            # Sauvegarder le fichier
-            file_name = f'{self.export_type}_{self.date_from}_{self.date_to}.xlsx'
-            self.write({
-                'file_data': base64.b64encode(output.read()),
-                'file_name': file_name
-            })
-
-            return {
-                'type': 'ir.actions.act_url',
-                'url': f'/web/content?model=accounting.export&id={self.id}&field=file_data&download=true&filename={file_name}',
-                'target': 'self',
-            }
+            # En-têtes et données selon le type
+            headers, data = self._get_export_data()
+
+            with tempfile.NamedTemporaryFile(suffix='.xlsx') as output:
+                # constant_memory : chaque ligne est vidée sur disque dès que
+                # la suivante commence, les lignes doivent donc être écrites
+                # dans l'ordre
+                workbook = xlsxwriter.Workbook(output.name, {'constant_memory': True})
+                worksheet = workbook.add_worksheet(self.export_type.replace('_', ' ').title())
+
+                # Formats
+                header_format = workbook.add_format({
+                    'bold': True,
+                    'bg_color': '#4472C4',
+                    'font_color': 'white',
+                    'border': 1
+                })
+
+                money_format = workbook.add_format({'num_format': '#,##0.00'})
+
+                # Largeur des colonnes et en-têtes
+                for col, header in enumerate(headers):
+                    worksheet.set_column(col, col, len(header) + 5)
+                    worksheet.write(0, col, header, header_format)
+
+                # Écrire les données
+                for row, line in enumerate(data, start=1):
+                    for col, value in enumerate(line):
+                        if isinstance(value, (int, float)):
+                            worksheet.write_number(row, col, value, money_format)
+                        else:
+                            worksheet.write(row, col, value)
+
+                workbook.close()
+
+                return self._save_export_file(
+                    output, 'xlsx',
+                    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
 
         except Exception as e:
             _logger.error(f'Erreur export XLSX: {str(e)}')
@@ -158,86 +182,426 @@ class AccountingExport(models.TransientModel):
                 }
             }
 
-    def _get_balance_data(self):
-        """Récupère les données de balance"""
-        accounts = self.env['account.chart'].search([
-            ('company_id', '=', self.company_id.id),
-            ('deprecated', '=', False)
-        ] + ([('id', 'in', self.account_ids.ids)] if self.account_ids else []))
+    def unlink(self):
+        # Les pièces jointes ne suivent pas la purge des assistants
+        self.attachment_id.unlink()
+        return super().unlink()
+
+    def _save_export_file(self, output, extension, mimetype, file_name=None):
+        """
+        Enregistre le fichier temporaire de l'export en pièce jointe et
+        renvoie l'action de téléchargement (servie en flux depuis le
+        filestore par /web/content)
+
+        Avec le stockage fichier (par défaut), le fichier est recopié par
+        blocs dans le filestore : il n'est jamais chargé en mémoire ni
+        indexé en texte (index_content). Le fichier d'un export précédent
+        du même assistant est supprimé.
+        """
+        previous_attachment = self.attachment_id
+        file_name = file_name or f'{self.export_type}_{self.date_from}_{self.date_to}.{extension}'
+        Attachment = self.env['ir.attachment']
+        vals = {
+            'name': file_name,
+            'mimetype': mimetype,
+            'res_model': self._name,
+            'res_id': self.id,
+        }
 
-        data = []
-        for account in accounts:
-            # Récupérer les lignes d'écriture
-            lines = self.env['account.move.line'].search([
-                ('account_id', '=', account.id),
-                ('move_id.state', '=', 'posted'),
-                ('date', '>=', self.date_from),
-                ('date', '<=', self.date_to)
-            ] + ([('journal_id', 'in', self.journal_ids.ids)] if self.journal_ids else []))
-
-            if lines:
-                debit = sum(lines.mapped('debit'))
-                credit = sum(lines.mapped('credit'))
-                balance = debit - credit
-
-                data.append([
-                    account.code,
-                    account.name,
-                    debit,
-                    credit,
-                    balance
-                ])
+        if Attachment._storage() == 'file':
+            store_fname, file_size, checksum = self._copy_to_filestore(output)
+            attachment = Attachment.create(vals)
+            # store_fname, file_size et checksum sont ignorés par create/write
+            self.env.cr.execute("""
+                UPDATE ir_attachment
+                   SET store_fname = %s, file_size = %s, checksum = %s
+                 WHERE id = %s
+            """, (store_fname, file_size, checksum, attachment.id))
+            attachment.invalidate_recordset(['store_fname', 'file_size', 'checksum', 'raw', 'datas'])
+        else:
+            output.seek(0)
+            attachment = Attachment.create(dict(vals, raw=output.read()))
 
-        return data
+        self.write({
+            'attachment_id': attachment.id,
+            'file_name': file_name
+        })
+        previous_attachment.unlink()
 
-    def _get_general_ledger_data(self):
-        """Récupère les données du grand livre"""
-        lines = self.env['account.move.line'].search([
-            ('move_id.state', '=', 'posted'),
-            ('date', '>=', self.date_from),
-            ('date', '<=', self.date_to),
-            ('company_id', '=', self.company_id.id)
-        ] + ([('journal_id', 'in', self.journal_ids.ids)] if self.journal_ids else [])
-          + ([('account_id', 'in', self.account_ids.ids)] if self.account_ids else []),
-            order='date, id')
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'self',
+        }
+
+    def _copy_to_filestore(self, output):
+        """
+        Recopie un fichier dans le filestore par blocs, à l'emplacement
+        qu'ir.attachment lui donnerait (empreinte SHA-1)
+
+        :return: tuple (store_fname, taille, empreinte)
+        """
+        sha = hashlib.sha1()
+        output.seek(0)
+        for chunk in iter(lambda: output.read(EXPORT_COPY_CHUNK_SIZE), b''):
+            sha.update(chunk)
+        checksum = sha.hexdigest()
+        file_size = output.tell()
+
+        Attachment = self.env['ir.attachment']
+        store_fname = f'{checksum[:2]}/{checksum}'
+        full_path = Attachment._full_path(store_fname)
+        if not os.path.isfile(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            output.seek(0)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(full_path), delete=False) as target:
+                shutil.copyfileobj(output, target, EXPORT_COPY_CHUNK_SIZE)
+            os.replace(target.name, full_path)
+        # Supprimé par le ramasse-miettes du filestore si la transaction échoue
+        Attachment._mark_for_gc(store_fname)
+
+        return store_fname, file_size, checksum
+
+    def _get_export_data(self):
+        """En-têtes et lignes de l'export selon son type"""
+        if self.export_type == 'balance':
+            headers = ['Code', 'Nom du compte', 'Débit', 'Crédit', 'Solde']
+            data = self._get_balance_data()
+        elif self.export_type == 'trial_balance':
+            periods = self._get_periods()
+            headers = ['Code', 'Nom du compte', 'Solde d\'ouverture', 'Débit', 'Crédit', 'Solde de clôture']
+            headers += [f'Mouvement {label}' for __, label in periods]
+            data = self._get_trial_balance_data(periods)
+        elif self.export_type == 'general_ledger':
+            headers = ['Date', 'Journal', 'Compte', 'Libellé', 'Débit', 'Crédit', 'Solde']
+            data = self._get_general_ledger_data()
+        elif self.export_type == 'journal':
+            headers = ['Date', 'Compte', 'Libellé', 'Référence', 'Débit', 'Crédit']
+            data = self._get_journal_data()
+        else:
+            headers = []
+            data = []
+        return headers, data
+
+    def _get_account_totals(self, opening=False, period=None):
+        """
+        Totaux par compte de l'export, regroupés en une requête
+
+        :return: {account_id: {'opening', 'debit', 'credit', 'columns'}} où
+                 'columns' donne le mouvement (débit - crédit) par période
+        """
+        rows = self.env['account.move.line']._get_account_totals(
+            self.company_id.id,
+            date_from=self.date_from,
+            date_to=self.date_to,
+            states=('posted',) if self.target_move == 'posted' else ('draft', 'posted'),
+            journal_ids=tuple(sorted(self.journal_ids.ids)),
+            period=period,
+            opening=opening,
+        )
+
+        totals = {}
+        for account_id, column, debit, credit in rows:
+            account = totals.setdefault(account_id, {
+                'opening': 0.0, 'debit': 0.0, 'credit': 0.0, 'columns': {},
+            })
+            if column is None:
+                account['opening'] += debit - credit
+            else:
+                account['debit'] += debit
+                account['credit'] += credit
+                account['columns'][column] = account['columns'].get(column, 0.0) + debit - credit
+        return totals
+
+    def _get_accounts(self, account_ids):
+        """Comptes actifs de l'export parmi account_ids, triés par code"""
+        domain = [
+            ('id', 'in', list(account_ids)),
+            ('company_id', '=', self.company_id.id),
+            ('deprecated', '=', False),
+        ]
+        if self.account_ids:
+            domain.append(('id', 'in', self.account_ids.ids))
+        return self.env['account.chart'].search(domain)
+
+    def _get_periods(self):
+        """Colonnes de période de la balance : liste de (début, libellé)"""
+        if not self.period_split or not self.date_from or not self.date_to:
+            return []
+
+        if self.period_split == 'month':
+            start, step = self.date_from.replace(day=1), relativedelta(months=1)
+        elif self.period_split == 'quarter':
+            month = (self.date_from.month - 1) // 3 * 3 + 1
+            start, step = self.date_from.replace(month=month, day=1), relativedelta(months=3)
+        else:
+            start, step = self.date_from.replace(month=1, day=1), relativedelta(years=1)
+
+        periods = []
+        while start <= self.date_to:
+            if self.period_split == 'month':
+                label = start.strftime('%m/%Y')
+            elif self.period_split == 'quarter':
+                label = f'T{(start.month - 1) // 3 + 1} {start.year}'
+            else:
+                label = str(start.year)
+            periods.append((start, label))
+            start += step
+        return periods
+
+    def _get_balance_data(self):
+        """Récupère les données de balance"""
+        totals = self._get_account_totals()
 
         data = []
-        for line in lines:
+        for account in self._get_accounts(totals):
+            debit = totals[account.id]['debit']
+            credit = totals[account.id]['credit']
             data.append([
-                line.date.strftime('%d/%m/%Y') if line.date else '',
-                line.move_id.journal_id.code,
-                line.account_id.code,
-                line.name,
-                line.debit,
-                line.credit,
-                line.balance
+                account.code,
+                account.name,
+                debit,
+                credit,
+                debit - credit
             ])
 
         return data
 
-    def _get_journal_data(self):
-        """Récupère les données du journal"""
-        lines = self.env['account.move.line'].search([
-            ('move_id.state', '=', 'posted'),
-            ('date', '>=', self.date_from),
-            ('date', '<=', self.date_to),
-            ('company_id', '=', self.company_id.id)
-        ] + ([('journal_id', 'in', self.journal_ids.ids)] if self.journal_ids else []),
-            order='date, id')
+    def _get_trial_balance_data(self, periods=None):
+        """Balance de vérification : ouverture, mouvements, clôture et
+        mouvement par période"""
+        totals = self._get_account_totals(opening=True, period=self.period_split or None)
 
         data = []
-        for line in lines:
+        for account in self._get_accounts(totals):
+            total = totals[account.id]
+            closing = total['opening'] + total['debit'] - total['credit']
             data.append([
-                line.date.strftime('%d/%m/%Y') if line.date else '',
-                line.account_id.code,
-                line.name,
-                line.ref or '',
-                line.debit,
-                line.credit
-            ])
+                account.code,
+                account.name,
+                total['opening'],
+                total['debit'],
+                total['credit'],
+                closing,
+            ] + [total['columns'].get(start, 0.0) for start, __ in periods or []])
 
         return data
 
+    def _iter_move_line_rows(self, select, filter_accounts=True):
+        """
+        Lignes d'écriture de l'export, lues par paquets de EXPORT_CHUNK_SIZE
+
+        Pagination par clé (date, id) : chaque requête ne charge que les
+        colonnes demandées et la mémoire reste bornée à un paquet, quel que
+        soit le nombre de lignes.
+
+        :param select: Expressions SQL des colonnes (alias l: ligne,
+                       m: écriture, j: journal, a: compte)
+        :param filter_accounts: Restreindre aux comptes de l'export
+        :return: Générateur de tuples (date, colonnes...)
+        """
+        self.env['account.move.line'].check_access('read')
+        self.env['account.move.line'].flush_model()
+        self.env['account.move'].flush_model(['state', 'journal_id'])
+
+        params = {
+            'company_id': self.company_id.id,
+            'states': ('posted',) if self.target_move == 'posted' else ('draft', 'posted'),
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'journal_ids': tuple(self.journal_ids.ids),
+            'account_ids': tuple(self.account_ids.ids),
+            'last_date': date.min,
+            'last_id': 0,
+            'limit': EXPORT_CHUNK_SIZE,
+        }
+        conditions = [
+            'l.company_id = %(company_id)s',
+            'm.state IN %(states)s',
+            'l.date >= %(date_from)s',
+            'l.date <= %(date_to)s',
+            '(l.date, l.id) > (%(last_date)s, %(last_id)s)',
+        ]
+        if self.journal_ids:
+            conditions.append('m.journal_id IN %(journal_ids)s')
+        if filter_accounts and self.account_ids:
+            conditions.append('l.account_id IN %(account_ids)s')
+
+        query = f"""
+            SELECT l.date, l.id, {select}
+              FROM account_move_line l
+              JOIN account_move m ON m.id = l.move_id
+              JOIN account_journal j ON j.id = m.journal_id
+              JOIN account_chart a ON a.id = l.account_id
+             WHERE {' AND '.join(conditions)}
+          ORDER BY l.date, l.id
+             LIMIT %(limit)s
+        """
+
+        while True:
+            self.env.cr.execute(query, params)
+            rows = self.env.cr.fetchall()
+            for row in rows:
+                yield (row[0],) + row[2:]
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                break
+            params['last_date'], params['last_id'] = rows[-1][:2]
+
+    def _get_general_ledger_data(self):
+        """Données du grand livre (générateur, lecture par paquets)"""
+        rows = self._iter_move_line_rows(
+            'j.code, a.code, l.name, l.debit, l.credit, l.debit - l.credit'
+        )
+        for line_date, journal_code, account_code, name, debit, credit, balance in rows:
+            yield [
+                line_date.strftime('%d/%m/%Y') if line_date else '',
+                journal_code,
+                account_code,
+                name,
+                debit,
+                credit,
+                balance
+            ]
+
+    def _get_journal_data(self):
+        """Données du journal (générateur, lecture par paquets)"""
+        rows = self._iter_move_line_rows(
+            'a.code, l.name, l.ref, l.debit, l.credit',
+            filter_accounts=False,
+        )
+        for line_date, account_code, name, ref, debit, credit in rows:
+            yield [
+                line_date.strftime('%d/%m/%Y') if line_date else '',
+                account_code,
+                name,
+                ref or '',
+                debit,
+                credit
+            ]
+
+    def _export_fec(self):
+        """
+        Export FEC (Fichier des Écritures Comptables)
+
+        Les lignes des écritures comptabilisées sont lues par un curseur
+        serveur unique, dans l'ordre journal / date / écriture, et écrites au
+        fil de l'eau ; l'équilibre des écritures et la continuité de la
+        numérotation sont contrôlés pendant la même passe.
+        """
+        self.env['account.move.line'].check_access('read')
+        self.env['account.move.line'].flush_model()
+        self.env['account.move'].flush_model()
+
+        company = self.company_id
+        validator = FecValidator(company.currency_id.decimal_places)
+
+        params = {
+            'company_id': company.id,
+            'currency_id': company.currency_id.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'journal_ids': tuple(self.journal_ids.ids),
+        }
+        conditions = [
+            'l.company_id = %(company_id)s',
+            "m.state = 'posted'",
+            'm.date >= %(date_from)s',
+            'm.date <= %(date_to)s',
+        ]
+        if self.journal_ids:
+            conditions.append('m.journal_id IN %(journal_ids)s')
+
+        query = f"""
+            SELECT j.code, j.name, m.id, m.name, m.date,
+                   a.code, a.name,
+                   CASE WHEN a.account_type IN ('asset_receivable', 'liability_payable')
+                        THEN COALESCE(NULLIF(p.ref, ''), p.id::text) END,
+                   CASE WHEN a.account_type IN ('asset_receivable', 'liability_payable')
+                        THEN p.name END,
+                   COALESCE(NULLIF(m.ref, ''), m.name),
+                   COALESCE(m.invoice_date, m.date),
+                   COALESCE(NULLIF(l.name, ''), m.name),
+                   l.debit, l.credit,
+                   r.name, r.create_date::date,
+                   CASE WHEN l.currency_id <> %(currency_id)s THEN l.amount_currency END,
+                   CASE WHEN l.currency_id <> %(currency_id)s THEN cur.name END
+              FROM account_move_line l
+              JOIN account_move m ON m.id = l.move_id
+              JOIN account_journal j ON j.id = m.journal_id
+              JOIN account_chart a ON a.id = l.account_id
+         LEFT JOIN res_partner p ON p.id = l.partner_id
+         LEFT JOIN account_full_reconcile r ON r.id = l.full_reconcile_id
+         LEFT JOIN res_currency cur ON cur.id = l.currency_id
+             WHERE {' AND '.join(conditions)}
+          ORDER BY j.code, m.date, m.name, m.id, l.id
+        """
+
+        with tempfile.TemporaryFile() as output:
+            stream = io.TextIOWrapper(output, encoding=FEC_ENCODING, errors='replace', newline='')
+            stream.write(fec_line(FEC_COLUMNS))
+
+            cr = self.env.cr
+            cr.execute(f"DECLARE fec_lines NO SCROLL CURSOR FOR {query}", params)
+            try:
+                while True:
+                    cr.execute("FETCH FORWARD %s FROM fec_lines", (EXPORT_CHUNK_SIZE,))
+                    rows = cr.fetchall()
+                    if not rows:
+                        break
+                    for (journal_code, journal_name, move_id, move_name, move_date,
+                         account_code, account_name, aux_code, aux_name,
+                         piece_ref, piece_date, label, debit, credit,
+                         matching, matching_date, amount_currency, currency) in rows:
+                        validator.add_line(journal_code, move_id, move_name, debit, credit)
+                        stream.write(fec_line((
+                            fec_text(journal_code),
+                            fec_text(journal_name),
+                            fec_text(move_name),
+                            fec_date(move_date),
+                            fec_text(account_code),
+                            fec_text(account_name),
+                            fec_text(aux_code),
+                            fec_text(aux_name),
+                            fec_text(piece_ref),
+                            fec_date(piece_date),
+                            fec_text(label),
+                            fec_amount(debit),
+                            fec_amount(credit),
+                            fec_text(matching),
+                            fec_date(matching_date),
+                            fec_date(move_date),
+                            fec_amount(amount_currency) if currency else '',
+                            fec_text(currency),
+                        )))
+            finally:
+                cr.execute("CLOSE fec_lines")
+
+            validator.finish()
+            stream.flush()
+            stream.detach()
+
+            report = validator.get_report()
+            self.fec_report = report
+            if validator.anomaly_count:
+                _logger.warning(f'FEC {company.name} : {validator.anomaly_count} anomalie(s)')
+                if not self.fec_allow_anomalies:
+                    raise UserError(_(
+                        'Le FEC présente des anomalies :\n%s\n\n'
+                        'Corrigez-les ou cochez « Exporter malgré les anomalies ».'
+                    ) % report)
+
+            return self._save_export_file(
+                output, 'txt', 'text/plain', file_name=self._get_fec_file_name()
+            )
+
+    def _get_fec_file_name(self):
+        """Nom réglementaire : SIREN + FEC + date de clôture (AAAAMMJJ)"""
+        company = self.company_id
+        siren = ''.join(char for char in company.company_registry or '' if char.isdigit())[:9]
+        if not siren and company.vat and company.vat.upper().startswith('FR'):
+            siren = company.vat[4:13]
+        return f'{siren or "000000000"}FEC{fec_date(self.date_to)}.txt'
+
     def _export_pdf(self):
         """Export PDF"""
         # TODO: Implémenter avec reportlab ou wkhtmltopdf
@@ -252,41 +616,22 @@ class AccountingExport(models.TransientModel):
         }
 
     def _export_csv(self):
-        """Export CSV"""
+        """Export CSV, écrit ligne à ligne dans un fichier temporaire"""
         try:
             import csv
 
-            output = BytesIO()
-            writer = csv.writer(output, delimiter=';')
-
             # En-têtes et données selon le type
-            if self.export_type == 'balance':
-                headers = ['Code', 'Nom du compte', 'Débit', 'Crédit', 'Solde']
-                data = self._get_balance_data()
-            elif self.export_type == 'general_ledger':
-                headers = ['Date', 'Journal', 'Compte', 'Libellé', 'Débit', 'Crédit', 'Solde']
-                data = self._get_general_ledger_data()
-            else:
-                headers = []
-                data = []
+            headers, data = self._get_export_data()
 
-            writer.writerow(headers)
-            writer.writerows(data)
+            with tempfile.TemporaryFile() as output:
+                stream = io.TextIOWrapper(output, encoding='utf-8', newline='')
+                writer = csv.writer(stream, delimiter=';')
+                writer.writerow(headers)
+                writer.writerows(data)
+                stream.flush()
+                stream.detach()
 
-            output.seek(0)
-
-            # Sauvegarder le fichier
-            file_name = f'{self.export_type}_{self.date_from}_{self.date_to}.csv'
-            self.write({
-                'file_data': base64.b64encode(output.read()),
-                'file_name': file_name
-            })
-
-            return {
-                'type': 'ir.actions.act_url',
-                'url': f'/web/content?model=accounting.export&id={self.id}&field=file_data&download=true&filename={file_name}',
-                'target': 'self',
-            }
+                return self._save_export_file(output, 'csv', 'text/csv')
 
         except Exception as e:
             _logger.error(f'Erreur export CSV: {str(e)}')
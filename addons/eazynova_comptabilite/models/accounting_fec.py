@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import re
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Colonnes imposées par l'article A47 A-1 du Livre des procédures fiscales
+FEC_COLUMNS = (
+    'JournalCode',
+    'JournalLib',
+    'EcritureNum',
+    'EcritureDate',
+    'CompteNum',
+    'CompteLib',
+    'CompAuxNum',
+    'CompAuxLib',
+    'PieceRef',
+    'PieceDate',
+    'EcritureLib',
+    'Debit',
+    'Credit',
+    'EcritureLet',
+    'DateLet',
+    'ValidDate',
+    'Montantdevise',
+    'Idevise',
+)
+
+# Fichier à plat : séparateur barre verticale, fin de ligne CRLF, jeu de
+# caractères ISO 8859-15
+FEC_SEPARATOR = '|'
+FEC_LINE_TERMINATOR = '\r\n'
+FEC_ENCODING = 'iso-8859-15'
+
+# Nombre maximum d'anomalies détaillées dans le rapport de validation
+FEC_MAX_ANOMALIES = 100
+
+SEQUENCE_PATTERN = re.compile(r'^(.*?)(\d+)$')
+
+
+def fec_date(value):
+    """Date au format AAAAMMJJ"""
+    return value.strftime('%Y%m%d') if value else ''
+
+
+def fec_amount(value):
+    """Montant avec virgule décimale, sans séparateur de milliers"""
+    return f'{value or 0.0:.2f}'.replace('.', ',')
+
+
+def fec_text(value):
+    """Texte sans séparateur ni retour à la ligne"""
+    if not value:
+        return ''
+    return ' '.join(str(value).replace(FEC_SEPARATOR, '/').split())
+
+
+def fec_line(values):
+    """Ligne du fichier à partir des 18 valeurs déjà formatées"""
+    return FEC_SEPARATOR.join(values) + FEC_LINE_TERMINATOR
+
+
+class FecValidator:
+    """
+    Contrôles du FEC effectués pendant l'écriture, en une seule passe.
+
+    Les lignes arrivent triées par journal, date et écriture : l'équilibre
+    d'une écriture est vérifié quand la suivante commence, et la continuité
+    de la numérotation est suivie par journal et préfixe de séquence. La
+    mémoire reste bornée : seuls l'écriture en cours, le dernier numéro de
+    chaque séquence et les FEC_MAX_ANOMALIES premières anomalies sont gardés.
+    """
+
+    def __init__(self, precision_digits=2):
+        self.precision_digits = precision_digits
+        self.line_count = 0
+        self.move_count = 0
+        self.total_debit = 0.0
+        self.total_credit = 0.0
+        self.anomaly_count = 0
+        self.anomalies = []
+        self.last_numbers = {}
+        self.current_move = None
+        self.move_name = None
+        self.move_debit = 0.0
+        self.move_credit = 0.0
+
+    def add_anomaly(self, message):
+        self.anomaly_count += 1
+        if len(self.anomalies) < FEC_MAX_ANOMALIES:
+            self.anomalies.append(message)
+
+    def add_line(self, journal_code, move_id, move_name, debit, credit):
+        """Prend en compte une ligne d'écriture"""
+        if move_id != self.current_move:
+            self._close_move()
+            self._open_move(journal_code, move_id, move_name)
+
+        self.line_count += 1
+        self.move_debit += debit or 0.0
+        self.move_credit += credit or 0.0
+        self.total_debit += debit or 0.0
+        self.total_credit += credit or 0.0
+
+    def finish(self):
+        """Termine la validation (contrôle de la dernière écriture)"""
+        self._close_move()
+        if round(self.total_debit - self.total_credit, self.precision_digits):
+            self.add_anomaly(
+                f"Fichier déséquilibré : débit {fec_amount(self.total_debit)}, "
+                f"crédit {fec_amount(self.total_credit)}"
+            )
+
+    def _open_move(self, journal_code, move_id, move_name):
+        self.current_move = move_id
+        self.move_name = move_name
+        self.move_debit = self.move_credit = 0.0
+        self.move_count += 1
+
+        if not move_name or move_name == '/':
+            self.add_anomaly(f"Écriture {move_id} du journal {journal_code} sans numéro")
+            return
+
+        match = SEQUENCE_PATTERN.match(move_name)
+        if not match:
+            self.add_anomaly(f"Numéro d'écriture non séquentiel : {move_name}")
+            return
+
+        key = (journal_code, match.group(1))
+        number = int(match.group(2))
+        last = self.last_numbers.get(key)
+        if last is not None and number != last + 1:
+            if number <= last:
+                self.add_anomaly(
+                    f"Journal {journal_code} : {move_name} hors de l'ordre chronologique "
+                    f"(dernier numéro {last})"
+                )
+            else:
+                self.add_anomaly(
+                    f"Journal {journal_code} : rupture de séquence entre {last} et {number}"
+                )
+        self.last_numbers[key] = max(number, last or 0)
+
+    def _close_move(self):
+        if self.current_move is None:
+            return
+        if round(self.move_debit - self.move_credit, self.precision_digits):
+            self.add_anomaly(
+                f"Écriture {self.move_name or self.current_move} déséquilibrée : "
+                f"débit {fec_amount(self.move_debit)}, crédit {fec_amount(self.move_credit)}"
+            )
+        self.current_move = None
+
+    def get_report(self):
+        """Résumé texte de la validation"""
+        lines = [
+            f"{self.line_count} ligne(s), {self.move_count} écriture(s)",
+            f"Total débit {fec_amount(self.total_debit)}, total crédit {fec_amount(self.total_credit)}",
+            f"{self.anomaly_count} anomalie(s)",
+        ]
+        lines += [f"- {anomaly}" for anomaly in self.anomalies]
+        if self.anomaly_count > len(self.anomalies):
+            lines.append(f"... {self.anomaly_count - len(self.anomalies)} autre(s)")
+        return '\n'.join(lines)
@@ -46,34 +46,16 @@ class EazynovaInvoiceOcrService(models.AbstractModel):
             }
 
     def _extract_from_pdf(self, file_content):
-        """Extrait les données d'un PDF"""
+        """Extrait les données d'un PDF (texte natif, sinon OCR de toutes les pages)"""
         try:
-            # Utiliser PyPDF2 pour extraction texte
-            import PyPDF2
-            from io import BytesIO
-
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-            # Extraire le texte de toutes les pages
-            text = ''
-            for page in pdf_reader.pages:
-                text += page.extract_text()
+            result = self.env['eazynova.ocr.service'].extract(
+                file_content, mimetype='application/pdf', lang='fra')
 
             # Utiliser l'IA pour analyser le texte
-            return self._analyze_text_with_ai(text)
+            return self._analyze_text_with_ai(result['text'])
 
         except Exception as e:
             _logger.error(f'Erreur extraction PDF: {str(e)}')
-            # Fallback sur OCR d'image
-            try:
-                from pdf2image import convert_from_bytes
-                images = convert_from_bytes(file_content, first_page=1, last_page=1)
-                if images:
-                    return self._extract_from_image_object(images[0])
-            except:
-                pass
-
             return {
                 'success': False,
                 'error': str(e)
@@ -82,32 +64,14 @@ class EazynovaInvoiceOcrService(models.AbstractModel):
     def _extract_from_image(self, file_content):
         """Extrait les données d'une image"""
         try:
-            from PIL import Image
-            from io import BytesIO
-
-            image = Image.open(BytesIO(file_content))
-            return self._extract_from_image_object(image)
-
-        except Exception as e:
-            _logger.error(f'Erreur extraction image: {str(e)}')
-            return {
-                'success': False,
-                'error': str(e)
-            }
-
-    def _extract_from_image_object(self, image):
-        """Extrait le texte d'un objet Image avec Tesseract"""
-        try:
-            import pytesseract
-
-            # OCR avec Tesseract
-            text = pytesseract.image_to_string(image, lang='fra')
+            result = self.env['eazynova.ocr.service'].extract(
+                file_content, mimetype='image', lang='fra')
 
             # Analyser avec IA
-            return self._analyze_text_with_ai(text)
+            return self._analyze_text_with_ai(result['text'])
 
         except Exception as e:
-            _logger.error(f'Erreur Tesseract: {str(e)}')
+            _logger.error(f'Erreur extraction image: {str(e)}')
             return {
                 'success': False,
                 'error': str(e)
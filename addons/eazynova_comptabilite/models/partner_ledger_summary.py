@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Paramètre d'activation de la synthèse comptable par partenaire
+SUMMARY_PARAM = 'eazynova_comptabilite.partner_ledger_summary'
+
+# Clé des partenaires dont la synthèse est à recalculer (precommit)
+SUMMARY_PENDING = 'eazynova_comptabilite.partner_ledger_summary_pending'
+
+# Indicateurs recopiés de res.partner._get_invoice_stats
+SUMMARY_FIELDS = (
+    'total_invoiced',
+    'total_due',
+    'invoice_count',
+    'open_invoice_count',
+    'unpaid_invoice_count',
+    'last_invoice_date',
+    'next_due_date',
+)
+
+
+class PartnerLedgerSummary(models.Model):
+    """
+    Synthèse comptable matérialisée par partenaire.
+
+    Optionnelle (paramètre eazynova_comptabilite.partner_ledger_summary) :
+    une ligne par partenaire facturé, recalculée en fin de transaction pour
+    les seuls partenaires dont une facture a été comptabilisée, payée ou
+    annulée. La liste des partenaires, le grand livre partenaires et
+    l'assistant de relance lisent ces chiffres au lieu d'interroger les
+    factures.
+    """
+    _name = 'account.partner.ledger.summary'
+    _description = 'Synthèse comptable par partenaire'
+    _order = 'total_due desc, partner_id'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one(
+        'res.partner',
+        string='Partenaire',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade'
+    )
+
+    currency_id = fields.Many2one(
+        'res.currency',
+        string='Devise',
+        readonly=True,
+        default=lambda self: self.env.company.currency_id
+    )
+
+    total_invoiced = fields.Monetary(
+        string='Total facturé',
+        readonly=True,
+        currency_field='currency_id'
+    )
+
+    total_due = fields.Monetary(
+        string='Total dû',
+        readonly=True,
+        currency_field='currency_id'
+    )
+
+    invoice_count = fields.Integer(
+        string='Nombre de factures',
+        readonly=True
+    )
+
+    open_invoice_count = fields.Integer(
+        string='Factures non soldées',
+        readonly=True
+    )
+
+    unpaid_invoice_count = fields.Integer(
+        string='Factures échues impayées',
+        readonly=True
+    )
+
+    last_invoice_date = fields.Date(
+        string='Date dernière facture',
+        readonly=True
+    )
+
+    next_due_date = fields.Date(
+        string='Prochaine échéance',
+        readonly=True,
+        index=True,
+        help='Première échéance non encore dépassée : la synthèse est recalculée quand elle passe'
+    )
+
+    _sql_constraints = [
+        ('partner_unique',
+         'unique(partner_id)',
+         'Un partenaire ne peut avoir qu\'une seule synthèse comptable.')
+    ]
+
+    @api.model
+    def _is_enabled(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return tools.str2bool(params.get_param(SUMMARY_PARAM, 'False'), default=False)
+
+    @api.model
+    def _read_stats(self, partner_ids):
+        """Indicateurs enregistrés des partenaires qui ont une synthèse"""
+        rows = self.sudo().search_read(
+            [('partner_id', 'in', list(partner_ids))],
+            ['partner_id'] + list(SUMMARY_FIELDS),
+            load=None,
+        )
+        return {
+            row['partner_id']: {field: row[field] for field in SUMMARY_FIELDS}
+            for row in rows
+        }
+
+    @api.model
+    def _schedule_refresh(self, partner_ids):
+        """
+        Programme le recalcul des synthèses en fin de transaction
+
+        Les partenaires touchés par plusieurs écritures de la même transaction
+        ne sont recalculés qu'une fois.
+        """
+        partner_ids = {partner_id for partner_id in partner_ids if partner_id}
+        if not partner_ids or not self._is_enabled():
+            return
+        pending = self.env.cr.precommit.data.setdefault(SUMMARY_PENDING, set())
+        if not pending:
+            self.env.cr.precommit.add(self._flush_refresh)
+        pending.update(partner_ids)
+
+    def _flush_refresh(self):
+        """Recalcule immédiatement les synthèses en attente"""
+        pending = self.env.cr.precommit.data.pop(SUMMARY_PENDING, set())
+        if pending:
+            self._refresh(pending)
+            # Les hooks precommit passent après le flush de la transaction
+            self.flush_model()
+
+    @api.model
+    def _refresh(self, partner_ids):
+        """Recalcule la synthèse des partenaires donnés"""
+        partners = self.env['res.partner'].sudo().browse(list(partner_ids)).exists()
+        stats = partners._get_invoice_stats(live=True)
+
+        summaries = self.sudo().search([('partner_id', 'in', partners.ids)])
+        existing = {summary.partner_id.id: summary for summary in summaries}
+
+        to_create = []
+        to_unlink = self.sudo().browse()
+        for partner_id, values in stats.items():
+            summary = existing.get(partner_id)
+            if not values['invoice_count']:
+                if summary:
+                    to_unlink |= summary
+            elif summary:
+                changes = {
+                    field: value
+                    for field, value in values.items()
+                    if summary[field] != value
+                }
+                if changes:
+                    summary.write(changes)
+            else:
+                to_create.append(dict(values, partner_id=partner_id))
+
+        if to_create:
+            self.sudo().create(to_create)
+        to_unlink.unlink()
+
+    @api.model
+    def action_rebuild(self):
+        """Reconstruit la synthèse de tous les partenaires facturés"""
+        partner_ids = {
+            partner.id
+            for [partner] in self.env['account.move'].sudo()._read_group(
+                [('partner_id', '!=', False)], ['partner_id'],
+            )
+        }
+        partner_ids.update(self.sudo().search([]).partner_id.ids)
+        self._refresh(partner_ids)
+        _logger.info(f"Synthèse comptable reconstruite pour {len(partner_ids)} partenaire(s)")
+        return True
+
+    @api.model
+    def _cron_refresh_due_dates(self):
+        """
+        Tâche quotidienne : met à jour les factures échues des partenaires
+        dont la prochaine échéance est passée (et construit la synthèse à
+        la première exécution après activation)
+        """
+        if not self._is_enabled():
+            return
+        if not self.sudo().search_count([], limit=1):
+            self.action_rebuild()
+            return
+        summaries = self.sudo().search([
+            ('next_due_date', '!=', False),
+            ('next_due_date', '<', fields.Date.context_today(self)),
+        ])
+        self._refresh(summaries.partner_id.ids)
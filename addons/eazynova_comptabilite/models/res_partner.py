@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields
+
+# Types de factures clients pris en compte dans les indicateurs
+CUSTOMER_INVOICE_TYPES = ['out_invoice', 'out_refund']
+
+# Tous les types de factures (nombre de factures)
+INVOICE_TYPES = ['out_invoice', 'in_invoice', 'out_refund', 'in_refund']
 
 
 class ResPartner(models.Model):
@@ -55,29 +61,29 @@ class ResPartner(models.Model):
     # Informations comptables
     total_invoiced = fields.Monetary(
         string='Total facturé',
-        compute='_compute_total_invoiced',
+        compute='_compute_invoice_stats',
         currency_field='currency_id'
     )
 
     total_due = fields.Monetary(
         string='Total dû',
-        compute='_compute_total_due',
+        compute='_compute_invoice_stats',
         currency_field='currency_id'
     )
 
     invoice_count = fields.Integer(
         string='Nombre de factures',
-        compute='_compute_invoice_count'
+        compute='_compute_invoice_stats'
     )
 
     unpaid_invoice_count = fields.Integer(
         string='Nombre de factures impayées',
-        compute='_compute_unpaid_invoice_count'
+        compute='_compute_invoice_stats'
     )
 
     last_invoice_date = fields.Date(
         string='Date dernière facture',
-        compute='_compute_last_invoice_date'
+        compute='_compute_invoice_stats'
     )
 
     # Relances
@@ -99,57 +105,94 @@ class ResPartner(models.Model):
         ('electronic', 'Facturation électronique'),
     ], string='Méthode d\'envoi factures', default='email')
 
-    @api.depends('currency_id')
-    def _compute_total_invoiced(self):
-        """Calcule le total facturé pour ce partenaire"""
-        for partner in self:
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', partner.id),
-                ('move_type', 'in', ['out_invoice', 'out_refund']),
-                ('state', '=', 'posted')
-            ])
-            partner.total_invoiced = sum(invoices.mapped('amount_total'))
-
-    @api.depends('currency_id')
-    def _compute_total_due(self):
-        """Calcule le total dû par ce partenaire"""
-        for partner in self:
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', partner.id),
-                ('move_type', 'in', ['out_invoice', 'out_refund']),
-                ('state', '=', 'posted'),
-                ('payment_state', 'in', ['not_paid', 'partial'])
-            ])
-            partner.total_due = sum(invoices.mapped('amount_residual'))
-
-    def _compute_invoice_count(self):
-        """Compte le nombre de factures"""
-        for partner in self:
-            partner.invoice_count = self.env['account.move'].search_count([
-                ('partner_id', '=', partner.id),
-                ('move_type', 'in', ['out_invoice', 'in_invoice', 'out_refund', 'in_refund'])
-            ])
+    def _compute_invoice_stats(self):
+        """
+        Indicateurs de facturation de tous les partenaires en une fois
 
-    def _compute_unpaid_invoice_count(self):
-        """Compte le nombre de factures impayées"""
+        Lus dans la synthèse comptable si elle est activée, sinon calculés
+        par quelques requêtes groupées sur l'ensemble des partenaires.
+        """
+        stats = self._get_invoice_stats()
         for partner in self:
-            partner.unpaid_invoice_count = self.env['account.move'].search_count([
-                ('partner_id', '=', partner.id),
-                ('move_type', 'in', ['out_invoice', 'out_refund']),
+            values = stats.get(partner._origin.id, {})
+            partner.total_invoiced = values.get('total_invoiced', 0.0)
+            partner.total_due = values.get('total_due', 0.0)
+            partner.invoice_count = values.get('invoice_count', 0)
+            partner.unpaid_invoice_count = values.get('unpaid_invoice_count', 0)
+            partner.last_invoice_date = values.get('last_invoice_date', False)
+
+    def _get_invoice_stats(self, live=False):
+        """
+        Indicateurs de facturation par partenaire
+
+        :param live: Ignorer la synthèse comptable et interroger les factures
+        :return: {partner_id: {'total_invoiced', 'total_due', 'invoice_count',
+                 'open_invoice_count', 'unpaid_invoice_count',
+                 'last_invoice_date', 'next_due_date'}}
+        """
+        partner_ids = set(self._origin.ids)
+        if not partner_ids:
+            return {}
+
+        stats = {}
+        summary = self.env['account.partner.ledger.summary']
+        if not live and summary._is_enabled():
+            stats = summary._read_stats(partner_ids)
+            partner_ids -= set(stats)
+            if not partner_ids:
+                return stats
+
+        Move = self.env['account.move']
+        today = fields.Date.context_today(self)
+        for partner_id in partner_ids:
+            stats[partner_id] = {
+                'total_invoiced': 0.0,
+                'total_due': 0.0,
+                'invoice_count': 0,
+                'open_invoice_count': 0,
+                'unpaid_invoice_count': 0,
+                'last_invoice_date': False,
+                'next_due_date': False,
+            }
+
+        # Nombre de factures (tous types et états)
+        for partner, count in Move._read_group(
+            [('partner_id', 'in', list(partner_ids)), ('move_type', 'in', INVOICE_TYPES)],
+            ['partner_id'], ['__count'],
+        ):
+            stats[partner.id]['invoice_count'] = count
+
+        # Factures clients comptabilisées
+        for partner, amount_total, last_date in Move._read_group(
+            [
+                ('partner_id', 'in', list(partner_ids)),
+                ('move_type', 'in', CUSTOMER_INVOICE_TYPES),
+                ('state', '=', 'posted'),
+            ],
+            ['partner_id'], ['amount_total:sum', 'invoice_date:max'],
+        ):
+            stats[partner.id]['total_invoiced'] = amount_total
+            stats[partner.id]['last_invoice_date'] = last_date or False
+
+        # Factures clients non soldées, par date d'échéance
+        for partner, due_date, amount_residual, count in Move._read_group(
+            [
+                ('partner_id', 'in', list(partner_ids)),
+                ('move_type', 'in', CUSTOMER_INVOICE_TYPES),
                 ('state', '=', 'posted'),
                 ('payment_state', 'in', ['not_paid', 'partial']),
-                ('invoice_date_due', '<', fields.Date.today())
-            ])
-
-    def _compute_last_invoice_date(self):
-        """Récupère la date de la dernière facture"""
-        for partner in self:
-            last_invoice = self.env['account.move'].search([
-                ('partner_id', '=', partner.id),
-                ('move_type', 'in', ['out_invoice', 'out_refund']),
-                ('state', '=', 'posted')
-            ], order='invoice_date desc', limit=1)
-            partner.last_invoice_date = last_invoice.invoice_date if last_invoice else False
+            ],
+            ['partner_id', 'invoice_date_due:day'], ['amount_residual:sum', '__count'],
+        ):
+            values = stats[partner.id]
+            values['total_due'] += amount_residual
+            values['open_invoice_count'] += count
+            if due_date and due_date < today:
+                values['unpaid_invoice_count'] += count
+            elif due_date and (not values['next_due_date'] or due_date < values['next_due_date']):
+                values['next_due_date'] = due_date
+
+        return stats
 
     def action_view_partner_invoices(self):
         """Affiche les factures du partenaire"""
@@ -8,8 +8,15 @@ class UnpaidReminderWizard(models.TransientModel):
     partner_ids = fields.Many2many('res.partner', string='Clients')
     
     def action_send_reminders(self):
+        # Indicateurs précalculés : seuls les clients ayant des factures
+        # échues impayées sont interrogés
+        partners = self.partner_ids.filtered('unpaid_invoice_count')
+        if not partners:
+            return {'type': 'ir.actions.act_window_close'}
         invoices = self.env['account.move'].search([
-            ('partner_id', 'in', self.partner_ids.ids),
+            ('partner_id', 'in', partners.ids),
+            ('move_type', 'in', ['out_invoice', 'out_refund']),
+            ('state', '=', 'posted'),
             ('payment_state', 'in', ['not_paid', 'partial']),
             ('invoice_date_due', '<', fields.Date.today())
         ])
@@ -6,7 +6,7 @@
     'summary': "Extraction IA+OCR des lignes de facture fournisseur (account.move)",
     'description': "Ajoute une action IA+OCR pour extraire automatiquement les lignes de facture fournisseur à partir d'une pièce jointe PDF/image.",
     'author': 'Eazynova',
-    'depends': ['account'],
+    'depends': ['account', 'eazynova'],
     'data': [
         'security/ir.model.access.csv',
         'views/account_move_ia_ocr_view.xml',
@@ -15,10 +15,6 @@ class AccountMoveIAOCR(models.Model):
         import openai
         import json
         import base64
-        from pdf2image import convert_from_bytes
-        from PIL import Image
-        import pytesseract
-        import io
 
         self.ensure_one()
         # 1. OCR sur la pièce jointe principale
@@ -29,13 +25,13 @@ class AccountMoveIAOCR(models.Model):
         mimetype = attachment.mimetype or ''
         ocr_text = ''
         try:
-            if mimetype == 'application/pdf' or (attachment.name and attachment.name.lower().endswith('.pdf')):
-                images = convert_from_bytes(file_data)
-                text_pages = [pytesseract.image_to_string(img, lang='fra+eng') for img in images]
-                ocr_text = "\n".join(text_pages)
-            elif mimetype.startswith('image'):
-                img = Image.open(io.BytesIO(file_data))
-                ocr_text = pytesseract.image_to_string(img, lang='fra+eng')
+            is_pdf = mimetype == 'application/pdf' or (attachment.name and attachment.name.lower().endswith('.pdf'))
+            if is_pdf or mimetype.startswith('image'):
+                # Pages du PDF reconnues en parallèle par le service OCR partagé
+                ocr_text = self.env['eazynova.ocr.service'].extract(
+                    file_data, filename=attachment.name, mimetype=mimetype,
+                    lang='fra+eng', native_text=False,
+                )['text']
             else:
                 ocr_text = "Format de fichier non supporté pour l'OCR."
         except Exception as e:
@@ -116,48 +116,21 @@ class EazynovaFactureOcr(models.Model):
 
     def _extract_text_from_pdf(self, pdf_data):
         try:
-            import PyPDF2
-            import io
-            from PIL import Image
-            import pdf2image
-            import pytesseract
-            pdf_file = io.BytesIO(pdf_data)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            if text.strip():
-                return {'text': text, 'confidence': 0.95}
-            images = pdf2image.convert_from_bytes(pdf_data)
-            text = ""
-            total_confidence = 0
-            for image in images:
-                ocr_data = pytesseract.image_to_data(image, lang='fra', output_type=pytesseract.Output.DICT)
-                page_text = pytesseract.image_to_string(image, lang='fra')
-                text += page_text + "\n"
-                confidences = [int(conf) for conf in ocr_data['conf'] if conf != '-1']
-                if confidences:
-                    total_confidence += sum(confidences) / len(confidences)
-            avg_confidence = total_confidence / len(images) if images else 0
-            return {'text': text, 'confidence': avg_confidence / 100.0}
-        except ImportError as e:
-            raise UserError(_("Bibliothèques manquantes pour OCR PDF: %s") % str(e))
+            result = self.env['eazynova.ocr.service'].extract(pdf_data, mimetype='application/pdf', lang='fra')
+            if result['native']:
+                return {'text': result['text'], 'confidence': 0.95}
+            return {'text': result['text'], 'confidence': result['confidence'] / 100.0}
+        except UserError:
+            raise
         except Exception as e:
             raise UserError(_("Erreur traitement PDF: %s") % str(e))
 
     def _extract_text_from_image(self, image_data):
         try:
-            import pytesseract
-            from PIL import Image
-            import io
-            image = Image.open(io.BytesIO(image_data))
-            ocr_data = pytesseract.image_to_data(image, lang='fra', output_type=pytesseract.Output.DICT)
-            text = pytesseract.image_to_string(image, lang='fra')
-            confidences = [int(conf) for conf in ocr_data['conf'] if conf != '-1']
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            return {'text': text, 'confidence': avg_confidence / 100.0}
-        except ImportError:
-            raise UserError(_("Tesseract n'est pas installé."))
+            result = self.env['eazynova.ocr.service'].extract(image_data, mimetype='image', lang='fra')
+            return {'text': result['text'], 'confidence': result['confidence'] / 100.0}
+        except UserError:
+            raise
         except Exception as e:
             raise UserError(_("Erreur traitement image: %s") % str(e))
 
@@ -37,6 +37,11 @@
         'product', 'stock', 'calendar', 'account', 'sale_management', 'crm', 'purchase', 'web',
         'eazynova',  # Module EAZYNOVA Core
     ],
+    'external_dependencies': {
+        'python': [
+            'numpy',            # Matrice de distances vectorisée
+        ],
+    },
     'data': [
         'security/intervention_security.xml',
         'security/intervention_rules.xml',
@@ -55,6 +60,7 @@
         'data/automation_send_report.xml',
         'data/automation_incoming_mail.xml',
         'data/cron_cleanup_geocoding.xml',
+        'data/cron_geocoding_queue.xml',
         'views/intervention_quick_create_views.xml',
         'views/settings_views.xml',
         'views/intervention_colors_template.xml',
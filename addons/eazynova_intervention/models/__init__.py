@@ -6,6 +6,9 @@ from . import intervention_quick_create
 from . import intervention_settings
 from . import materiel
 from . import geocoding_cache
+from . import geocoding_service
+from . import geocoding_job
+from . import distance_matrix
 from . import res_partner
 from . import res_config_settings
 from . import sale_account_models
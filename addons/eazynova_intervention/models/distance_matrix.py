@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Nombre de matrices journalières gardées en mémoire par processus
+MATRIX_CACHE_SIZE = 32
+
+_matrix_cache = {}
+_matrix_cache_lock = threading.Lock()
+
+
+def haversine_matrix(origins, destinations):
+    """Matrice N×M des distances orthodromiques (km)
+
+    :param origins: tableau (N, 2) de (latitude, longitude) en degrés
+    :param destinations: tableau (M, 2) de (latitude, longitude) en degrés
+    :return: numpy.ndarray de forme (N, M)
+    """
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+
+    lat1 = origins[:, 0][:, np.newaxis]
+    lon1 = origins[:, 1][:, np.newaxis]
+    lat2 = destinations[:, 0][np.newaxis, :]
+    lon2 = destinations[:, 1][np.newaxis, :]
+
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class InterventionDistanceMatrix(models.AbstractModel):
+    """Matrice des distances techniciens × interventions du jour.
+
+    Calculée hors ligne (haversine vectorisé) à partir des coordonnées
+    enregistrées, mise en cache par jour ; seuls les k meilleurs candidats
+    de chaque intervention peuvent être affinés par l'API d'itinéraire.
+    """
+    _name = 'intervention.distance.matrix'
+    _description = 'Matrice des distances pour la répartition des interventions'
+
+    @api.model
+    def get_matrix(self, day=None, technicians=None):
+        """Matrice des distances entre techniciens et interventions d'un jour
+
+        :param day: date (par défaut aujourd'hui)
+        :param technicians: recordset hr.employee (par défaut les intervenants
+                            des interventions du jour)
+        :return: dict avec 'technician_ids', 'intervention_ids', 'matrix'
+                 (numpy N×M en km) et 'routes' (itinéraires affinés)
+        """
+        day = day or fields.Date.context_today(self)
+        interventions = self._get_day_interventions(day)
+        if technicians is None:
+            technicians = interventions.technicien_principal_id
+
+        positions = self._get_technician_positions(technicians)
+        technician_ids = [tid for tid in technicians.ids if tid in positions]
+        origins = [positions[tid] for tid in technician_ids]
+        destinations = [(i.latitude, i.longitude) for i in interventions]
+
+        signature = hashlib.sha1(repr((
+            technician_ids, origins, interventions.ids, destinations,
+        )).encode('utf-8')).hexdigest()
+        cache_key = (self.env.cr.dbname, self.env.company.id, fields.Date.to_string(day))
+
+        with _matrix_cache_lock:
+            cached = _matrix_cache.get(cache_key)
+            if cached and cached['signature'] == signature:
+                return cached
+
+        if origins and destinations:
+            matrix = haversine_matrix(origins, destinations)
+        else:
+            matrix = np.zeros((len(origins), len(destinations)))
+
+        result = {
+            'signature': signature,
+            'technician_ids': technician_ids,
+            'intervention_ids': interventions.ids,
+            'origins': origins,
+            'destinations': destinations,
+            'matrix': matrix,
+            'routes': {},
+        }
+
+        with _matrix_cache_lock:
+            if len(_matrix_cache) >= MATRIX_CACHE_SIZE:
+                _matrix_cache.pop(next(iter(_matrix_cache)))
+            _matrix_cache[cache_key] = result
+
+        _logger.info(f"Matrice de distances {matrix.shape[0]}×{matrix.shape[1]} calculée pour le {day}")
+        return result
+
+    @api.model
+    def rank_technicians(self, day=None, technicians=None, top_k=3, refine=False):
+        """Techniciens les plus proches de chaque intervention du jour
+
+        :param top_k: nombre de candidats gardés par intervention
+        :param refine: affiner les candidats retenus via OpenRouteService
+        :return: {intervention_id: [{'technician_id', 'distance_km',
+                  'duree_trajet_min'}, ...]} trié par distance croissante
+        """
+        data = self.get_matrix(day=day, technicians=technicians)
+        matrix = data['matrix']
+        if not matrix.size:
+            return {intervention_id: [] for intervention_id in data['intervention_ids']}
+
+        k = min(top_k, matrix.shape[0])
+        # k plus petites distances de chaque colonne, puis tri de ces k seulement
+        candidates = np.argpartition(matrix, k - 1, axis=0)[:k, :]
+        order = np.argsort(np.take_along_axis(matrix, candidates, axis=0), axis=0)
+        candidates = np.take_along_axis(candidates, order, axis=0)
+
+        ors_api_key = refine and self.env['ir.config_parameter'].sudo().get_param(
+            'intervention.openroute_api_key'
+        )
+        Intervention = self.env['intervention.intervention']
+
+        ranking = {}
+        for col, intervention_id in enumerate(data['intervention_ids']):
+            entries = []
+            for row in candidates[:, col]:
+                distance_km = round(float(matrix[row, col]), 2)
+                duree_trajet_min = max(int(distance_km * 2), 1)
+
+                if ors_api_key:
+                    route_key = (int(row), col)
+                    if route_key not in data['routes']:
+                        lat_soc, lon_soc = data['origins'][row]
+                        lat_cli, lon_cli = data['destinations'][col]
+                        data['routes'][route_key] = Intervention._fetch_route_ors(
+                            lat_soc, lon_soc, lat_cli, lon_cli, ors_api_key
+                        )
+                    if data['routes'][route_key]:
+                        distance_km, duree_trajet_min = data['routes'][route_key]
+
+                entries.append({
+                    'technician_id': data['technician_ids'][row],
+                    'distance_km': distance_km,
+                    'duree_trajet_min': duree_trajet_min,
+                })
+
+            if ors_api_key:
+                entries.sort(key=lambda e: e['distance_km'])
+            ranking[intervention_id] = entries
+
+        return ranking
+
+    def _get_day_interventions(self, day):
+        """Interventions géolocalisées à réaliser dans la journée"""
+        start = datetime.combine(day, time.min)
+        return self.env['intervention.intervention'].search([
+            ('date_prevue', '>=', start),
+            ('date_prevue', '<', start + timedelta(days=1)),
+            ('statut', 'in', ['planifie', 'en_cours']),
+            ('company_id', '=', self.env.company.id),
+            ('latitude', '!=', 0.0),
+            ('longitude', '!=', 0.0),
+        ], order='date_prevue, id')
+
+    def _get_technician_positions(self, technicians):
+        """Dernière position connue de chaque technicien
+
+        Position GPS relevée sur son intervention la plus récente, sinon
+        l'adresse de la société (point de départ). Une seule ligne par
+        technicien est lue (DISTINCT ON), quel que soit l'historique.
+
+        :return: {employee_id: (latitude, longitude)}
+        """
+        positions = {}
+        if not technicians:
+            return positions
+
+        Intervention = self.env['intervention.intervention']
+        fnames = [
+            'technicien_principal_id', 'position_technicien_lat', 'position_technicien_lng',
+            'heure_arrivee', 'write_date',
+        ]
+        Intervention.flush_model(fnames)
+
+        # Domaine et règles d'accès appliqués par l'ORM
+        query = Intervention._search([
+            ('technicien_principal_id', 'in', technicians.ids),
+            ('position_technicien_lat', '!=', 0.0),
+            ('position_technicien_lng', '!=', 0.0),
+        ])
+        column = {fname: SQL.identifier(Intervention._table, fname) for fname in fnames}
+        self.env.cr.execute(SQL(
+            """
+            SELECT DISTINCT ON (%(technician)s)
+                   %(technician)s, %(lat)s, %(lng)s
+              FROM %(from_clause)s
+             WHERE %(where_clause)s
+             ORDER BY %(technician)s, %(arrival)s DESC NULLS LAST, %(write_date)s DESC
+            """,
+            technician=column['technicien_principal_id'],
+            lat=column['position_technicien_lat'],
+            lng=column['position_technicien_lng'],
+            arrival=column['heure_arrivee'],
+            write_date=column['write_date'],
+            from_clause=query.from_clause,
+            where_clause=query.where_clause,
+        ))
+
+        for technician_id, lat, lng in self.env.cr.fetchall():
+            positions[technician_id] = (lat, lng)
+
+        partner = self.env.company.partner_id
+        lat_soc = getattr(partner, 'partner_latitude', None)
+        lon_soc = getattr(partner, 'partner_longitude', None)
+        if lat_soc and lon_soc:
+            for technician_id in technicians.ids:
+                positions.setdefault(technician_id, (lat_soc, lon_soc))
+
+        return positions
@@ -10,8 +10,16 @@ class InterventionGeocodingCache(models.Model):
 
     cache_key = fields.Char(string="Clé de cache", required=True, index=True)
     address = fields.Text(string="Adresse", required=True)
-    latitude = fields.Float(string="Latitude", digits=(16, 6), required=True)
-    longitude = fields.Float(string="Longitude", digits=(16, 6), required=True)
+    latitude = fields.Float(string="Latitude", digits=(16, 6))
+    longitude = fields.Float(string="Longitude", digits=(16, 6))
+    status = fields.Selection([
+        ('found', 'Trouvée'),
+        ('not_found', 'Introuvable'),
+    ], string="Résultat", default='found', required=True)
+    expires_at = fields.Datetime(
+        string="Expire le",
+        help="Date d'expiration des résultats négatifs (adresse introuvable)"
+    )
     created_at = fields.Datetime(string="Créé le", default=fields.Datetime.now)
 
     _sql_constraints = [
@@ -21,9 +29,34 @@ class InterventionGeocodingCache(models.Model):
 
     @api.model
     def cleanup_old_cache(self):
-        """Nettoyer les anciens enregistrements de cache (plus de 30 jours)"""
+        """Nettoyer les anciens enregistrements de cache (plus de 30 jours)
+        et les résultats négatifs expirés"""
         from datetime import timedelta
-        cutoff_date = fields.Datetime.now() - timedelta(days=30)
-        old_records = self.search([('created_at', '<', cutoff_date)])
+        now = fields.Datetime.now()
+        cutoff_date = now - timedelta(days=30)
+        old_records = self.search([
+            '|',
+            ('created_at', '<', cutoff_date),
+            '&', ('status', '=', 'not_found'), ('expires_at', '<', now),
+        ])
         old_records.unlink()
         return True
+
+
+class InterventionGeocodingThrottle(models.Model):
+    """Horodatage de la dernière requête par fournisseur de géocodage,
+    partagé entre tous les workers pour respecter les limites d'usage"""
+    _name = 'intervention.geocoding.throttle'
+    _description = 'Limitation des requêtes de géocodage'
+    _rec_name = 'provider'
+
+    provider = fields.Char(string="Fournisseur", required=True, index=True)
+    last_request = fields.Float(
+        string="Dernière requête (timestamp)",
+        help="Timestamp Unix (avec décimales) du dernier créneau d'envoi réservé"
+    )
+
+    _sql_constraints = [
+        ('provider_unique', 'UNIQUE(provider)',
+         'Un seul enregistrement par fournisseur.'),
+    ]
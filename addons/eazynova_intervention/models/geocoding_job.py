@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from datetime import timedelta
+
+import requests
+
+from odoo import models, fields, api, Command
+
+_logger = logging.getLogger(__name__)
+
+# Délais successifs avant nouvelle tentative (minutes)
+RETRY_DELAYS = [1, 5, 15, 60, 240]
+
+# Nombre de tâches traitées par exécution de la tâche planifiée
+JOB_BATCH_SIZE = 50
+
+
+class InterventionGeocodingJob(models.Model):
+    """File d'attente de géocodage et de calcul de trajet.
+
+    Une tâche par adresse canonique : les interventions partageant la même
+    adresse sont rattachées à la même tâche en attente et ne déclenchent
+    qu'un seul géocodage. La tâche planifiée écrit ensuite latitude,
+    longitude, distance et durée sur chaque intervention.
+    """
+    _name = 'intervention.geocoding.job'
+    _description = "File d'attente de géocodage des interventions"
+    _order = 'next_attempt, id'
+    _rec_name = 'address'
+
+    address_key = fields.Char(string="Clé d'adresse", required=True, index=True)
+    address = fields.Text(string="Adresse", required=True)
+    queries = fields.Text(
+        string="Variantes",
+        help="Variantes JSON de l'adresse à essayer auprès de Nominatim"
+    )
+    intervention_ids = fields.Many2many(
+        'intervention.intervention',
+        'intervention_geocoding_job_rel',
+        'job_id', 'intervention_id',
+        string="Interventions"
+    )
+    state = fields.Selection([
+        ('pending', 'En attente'),
+        ('failed', 'Échec'),
+    ], string="État", default='pending', required=True, index=True)
+    attempts = fields.Integer(string="Tentatives", default=0)
+    next_attempt = fields.Datetime(
+        string="Prochaine tentative",
+        default=fields.Datetime.now,
+        index=True
+    )
+    last_error = fields.Text(string="Dernière erreur")
+
+    @api.model
+    def enqueue(self, interventions):
+        """Placer des interventions dans la file, dédoublonnées par adresse
+
+        :param interventions: recordset intervention.intervention
+        :return: tâches en attente concernées
+        """
+        service = self.env['intervention.geocoding.service']
+        by_key = {}
+
+        for intervention in interventions.filtered('adresse_intervention'):
+            address, queries = intervention._prepare_geocoding_queries()
+            key = service.cache_key(address)
+            if key not in by_key:
+                by_key[key] = {'address': address, 'queries': queries, 'interventions': []}
+            by_key[key]['interventions'].append(intervention.id)
+
+        if not by_key:
+            return self.browse()
+
+        Job = self.sudo()
+        jobs = Job.search([
+            ('address_key', 'in', list(by_key)),
+            ('state', '=', 'pending'),
+        ])
+
+        for job in jobs:
+            pending = by_key.pop(job.address_key, None)
+            if pending:
+                job.intervention_ids = [Command.link(i) for i in pending['interventions']]
+
+        if by_key:
+            jobs |= Job.create([{
+                'address_key': key,
+                'address': pending['address'],
+                'queries': json.dumps(pending['queries'], ensure_ascii=False),
+                'intervention_ids': [Command.set(pending['interventions'])],
+            } for key, pending in by_key.items()])
+
+        jobs.intervention_ids.filtered(
+            lambda i: i.geocoding_state != 'pending'
+        ).write({'geocoding_state': 'pending'})
+
+        self._trigger_queue()
+        return jobs
+
+    def _trigger_queue(self, at=None):
+        cron = self.env.ref(
+            'eazynova_intervention.ir_cron_process_geocoding_queue',
+            raise_if_not_found=False
+        )
+        if cron:
+            cron._trigger(at=at)
+
+    @api.model
+    def process_pending_jobs(self, limit=JOB_BATCH_SIZE, auto_commit=False):
+        """Traiter les tâches dont l'échéance est atteinte (tâche planifiée)"""
+        jobs = self.search([
+            ('state', '=', 'pending'),
+            ('next_attempt', '<=', fields.Datetime.now()),
+        ], limit=limit)
+
+        ors_api_key = self.env['ir.config_parameter'].sudo().get_param('intervention.openroute_api_key')
+        routes = {}
+
+        for job in jobs:
+            try:
+                with self.env.cr.savepoint():
+                    job._process(ors_api_key, routes)
+            except Exception as e:
+                _logger.warning(f"Erreur géocodage en arrière-plan ({job.address}): {str(e)}")
+                job._schedule_retry(str(e))
+
+            if auto_commit:
+                self.env.cr.commit()
+
+        # Reprogrammer pour la prochaine tâche à échéance
+        next_job = self.search([('state', '=', 'pending')], limit=1)
+        if next_job:
+            self._trigger_queue(at=max(next_job.next_attempt, fields.Datetime.now()))
+
+        return True
+
+    def _process(self, ors_api_key=None, routes=None):
+        """Géocoder l'adresse de la tâche et mettre à jour ses interventions"""
+        self.ensure_one()
+        service = self.env['intervention.geocoding.service']
+
+        # Ignorer les interventions dont l'adresse a changé depuis la mise en file
+        interventions = self.intervention_ids.filtered(
+            lambda i: i.adresse_intervention
+            and service.cache_key(i._prepare_geocoding_queries()[0]) == self.address_key
+        )
+
+        if not interventions:
+            self.unlink()
+            return
+
+        try:
+            coords = service.geocode(self.address, queries=json.loads(self.queries or '[]'))
+        except requests.RequestException as e:
+            self._schedule_retry(f"Erreur de connexion au service de géocodage: {str(e)}")
+            return
+
+        if not coords:
+            interventions.write({'geocoding_state': 'failed'})
+            self.write({
+                'state': 'failed',
+                'attempts': self.attempts + 1,
+                'last_error': f"Adresse non trouvée: {self.address}",
+            })
+            return
+
+        latitude, longitude = coords
+        for intervention in interventions:
+            vals = intervention._prepare_trajet_vals(latitude, longitude, ors_api_key, routes)
+            vals.update({
+                'latitude': latitude,
+                'longitude': longitude,
+                'geocoding_state': 'done',
+            })
+            intervention.write(vals)
+
+        _logger.info(f"Géocodage en arrière-plan terminé pour {len(interventions)} intervention(s): {self.address}")
+        self.unlink()
+
+    def _schedule_retry(self, error):
+        """Reprogrammer la tâche avec un délai croissant"""
+        self.ensure_one()
+        attempts = self.attempts + 1
+
+        if attempts > len(RETRY_DELAYS):
+            self.intervention_ids.filtered(
+                lambda i: i.geocoding_state == 'pending'
+            ).write({'geocoding_state': 'failed'})
+            self.write({'state': 'failed', 'attempts': attempts, 'last_error': error})
+            return
+
+        self.write({
+            'attempts': attempts,
+            'last_error': error,
+            'next_attempt': fields.Datetime.now() + timedelta(minutes=RETRY_DELAYS[attempts - 1]),
+        })
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+import psycopg2
+import requests
+
+from odoo import models, fields, api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+
+# Intervalle minimum entre deux requêtes Nominatim (politique d'usage : 1 req/s)
+NOMINATIM_MIN_INTERVAL = 1.0
+
+# Durée de validité par défaut d'un résultat négatif (heures)
+DEFAULT_NEGATIVE_TTL_HOURS = 24
+
+
+class GeocodingLRU:
+    """Cache LRU en mémoire du processus, devant le cache en base.
+
+    Les valeurs sont (latitude, longitude) ou None pour une adresse
+    introuvable ; les résultats négatifs portent une date d'expiration.
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retourne (trouvé, valeur)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return False, None
+
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_geocoding_lru = GeocodingLRU()
+
+
+def canonical_address_key(address):
+    """Clé canonique d'une adresse : minuscules, sans accents, espaces normalisés"""
+    address = unicodedata.normalize('NFKD', (address or '').casefold())
+    address = ''.join(c for c in address if not unicodedata.combining(c))
+    address = re.sub(r'[\s,;]+', ' ', address)
+    return address.strip()
+
+
+class InterventionGeocodingService(models.AbstractModel):
+    """Service de géocodage à plusieurs niveaux :
+
+    1. cache LRU en mémoire du processus ;
+    2. cache en base (intervention.geocoding.cache), y compris les résultats
+       négatifs avec une durée de validité ;
+    3. requêtes Nominatim espacées d'au moins une seconde entre tous les
+       workers, par réservation de créneaux dans un horodatage partagé.
+    """
+    _name = 'intervention.geocoding.service'
+    _description = 'Service de géocodage des interventions'
+
+    @api.model
+    def cache_key(self, address):
+        return hashlib.sha1(canonical_address_key(address).encode('utf-8')).hexdigest()
+
+    @api.model
+    def geocode(self, address, queries=None):
+        """Géocoder une adresse
+
+        :param address: adresse normalisée (clé du cache)
+        :param queries: variantes de l'adresse à essayer auprès de Nominatim
+                        (par défaut l'adresse elle-même)
+        :return: (latitude, longitude) ou None si l'adresse est introuvable
+        :raise requests.RequestException: si aucune variante n'a pu être
+               interrogée (erreur réseau, non mise en cache)
+        """
+        key = self.cache_key(address)
+        lru_key = (self.env.cr.dbname, key)
+
+        # 1. Cache mémoire
+        found, value = _geocoding_lru.get(lru_key)
+        if found:
+            _logger.info(f"Géocodage depuis le cache mémoire pour: {address}")
+            return value
+
+        # 2. Cache en base
+        found, value, expires_at = self._get_db_cache(key, address)
+        if found:
+            _logger.info(f"Géocodage depuis le cache pour: {address}")
+            _geocoding_lru.set(lru_key, value, expires_at)
+            return value
+
+        # 3. Nominatim (file d'attente globale)
+        queries = queries or [address]
+        network_error = None
+
+        for idx, query in enumerate(queries):
+            _logger.info(f"Tentative {idx+1}/{len(queries)} de géocodage: {query}")
+            try:
+                value = self._nominatim_search(query)
+            except requests.RequestException as e:
+                _logger.warning(f"Erreur tentative {idx+1}: {str(e)}")
+                network_error = e
+                continue
+
+            if value:
+                _logger.info(f"✓ Géocodage réussi: lat={value[0]}, lon={value[1]}")
+                self._set_db_cache(key, address, value)
+                _geocoding_lru.set(lru_key, value)
+                return value
+
+        if network_error is not None:
+            # Ne pas mémoriser un échec dû au réseau
+            raise network_error
+
+        expires_at = self._set_db_cache(key, address, None)
+        _geocoding_lru.set(lru_key, None, expires_at)
+        return None
+
+    def _get_negative_ttl(self):
+        ttl = self.env['ir.config_parameter'].sudo().get_param(
+            'intervention.geocoding_negative_ttl_hours', DEFAULT_NEGATIVE_TTL_HOURS
+        )
+        try:
+            return max(0.0, float(ttl))
+        except (TypeError, ValueError):
+            return float(DEFAULT_NEGATIVE_TTL_HOURS)
+
+    def _get_db_cache(self, key, address):
+        """Retourne (trouvé, valeur, expiration en timestamp)"""
+        legacy_key = hashlib.sha1(address.encode('utf-8')).hexdigest()
+        cache = self.env['intervention.geocoding.cache'].sudo().search([
+            ('cache_key', 'in', [key, legacy_key]),
+        ], limit=1)
+
+        if not cache:
+            return False, None, None
+
+        if cache.status == 'found':
+            return True, (float(cache.latitude), float(cache.longitude)), None
+
+        if cache.expires_at and cache.expires_at > fields.Datetime.now():
+            return True, None, cache.expires_at.timestamp()
+
+        return False, None, None
+
+    def _set_db_cache(self, key, address, value):
+        """Enregistre un résultat dans le cache en base.
+
+        L'écriture se fait dans un curseur séparé, validé immédiatement :
+        un résultat négatif reste mémorisé même si la transaction de
+        l'utilisateur est annulée par l'erreur qui suit.
+
+        :return: timestamp d'expiration pour un résultat négatif, sinon None
+        """
+        expires_at = None
+        vals = {
+            'cache_key': key,
+            'address': address,
+            'status': 'found' if value else 'not_found',
+            'latitude': value[0] if value else 0.0,
+            'longitude': value[1] if value else 0.0,
+            'created_at': fields.Datetime.now(),
+            'expires_at': False,
+        }
+
+        if not value:
+            expires = fields.Datetime.now() + timedelta(hours=self._get_negative_ttl())
+            vals['expires_at'] = expires
+            expires_at = expires.timestamp()
+
+        try:
+            with self.env.registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                Cache = env['intervention.geocoding.cache']
+                cache = Cache.search([('cache_key', '=', key)], limit=1)
+                if cache:
+                    cache.write(vals)
+                else:
+                    Cache.create(vals)
+            _logger.info("Résultat de géocodage sauvegardé dans le cache")
+        except psycopg2.Error as e:
+            # Un autre worker a enregistré la même adresse en parallèle
+            _logger.info(f"Cache de géocodage déjà renseigné: {str(e)}")
+        except Exception as e:
+            _logger.warning(f"Erreur sauvegarde cache: {str(e)}")
+
+        return expires_at
+
+    def _nominatim_search(self, query):
+        """Interroge Nominatim via la file d'attente globale
+
+        Le créneau d'envoi est réservé dans l'horodatage partagé, puis
+        l'attente et la requête HTTP se font sans connexion ni verrou en
+        base.
+
+        :return: (latitude, longitude) ou None
+        """
+        params = {
+            'q': query,
+            'format': 'json',
+            'limit': 3,
+            'addressdetails': 1,
+            'countrycodes': 'fr',  # Priorité France
+        }
+
+        company_email = self.env.company.email or ''
+        if company_email:
+            params['email'] = company_email
+
+        headers = {'User-Agent': 'OdooIntervention/1.0'}
+
+        wait = self._reserve_request_slot('nominatim', NOMINATIM_MIN_INTERVAL) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        response = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=10)
+
+        if response.status_code != 200:
+            _logger.warning(f"Nominatim HTTP {response.status_code}: {response.text[:200]}")
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.RequestException(f"Nominatim HTTP {response.status_code}")
+            return None
+
+        data = response.json()
+        if data:
+            # Prendre le premier résultat
+            return float(data[0]['lat']), float(data[0]['lon'])
+
+        return None
+
+    def _reserve_request_slot(self, provider, min_interval):
+        """Réserve le prochain créneau d'envoi d'un fournisseur
+
+        Le créneau est au plus tôt maintenant, et au moins min_interval
+        secondes après le précédent. La mise à jour est atomique et validée
+        aussitôt dans un curseur séparé : la ligne n'est verrouillée que le
+        temps de l'UPDATE, pas pendant l'attente ni la requête HTTP.
+
+        :return: timestamp Unix du créneau réservé
+        """
+        with self.env.registry.cursor() as cr:
+            query = """
+                UPDATE intervention_geocoding_throttle
+                   SET last_request = GREATEST(COALESCE(last_request, 0) + %s, %s)
+                 WHERE provider = %s
+             RETURNING last_request
+            """
+            cr.execute(query, (min_interval, time.time(), provider))
+            row = cr.fetchone()
+            if row:
+                return row[0]
+
+        try:
+            with self.env.registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['intervention.geocoding.throttle'].create({
+                    'provider': provider,
+                    'last_request': time.time(),
+                })
+        except psycopg2.Error:
+            # Créé en parallèle par un autre worker : réserver à la suite
+            return self._reserve_request_slot(provider, min_interval)
+        return time.time()
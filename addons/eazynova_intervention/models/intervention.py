@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 import base64
-import hashlib
 import logging
 import re
 from datetime import timedelta
@@ -186,87 +185,66 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
             }
         }
     def action_calculer_distance(self):
-        """Calculer la distance et la durée via OpenRouteService ou vol d'oiseau"""
+        """Calculer la distance et la durée (OpenRouteService ou vol d'oiseau)
+        en arrière-plan, géocodage compris"""
         self.ensure_one()
         
         if not self.adresse_intervention:
             raise UserError("Veuillez renseigner l'adresse d'intervention.")
 
-        try:
-            # Géocoder l'adresse si les coordonnées ne sont pas déjà présentes
-            if not self.latitude or not self.longitude:
-                _logger.info(f"Géocodage nécessaire pour intervention {self.numero}")
-                try:
-                    self._geocoder_adresse()
-                    _logger.info(f"Géocodage réussi: lat={self.latitude}, lon={self.longitude}")
-                except UserError as e:
-                    # Le géocodage a échoué, afficher l'erreur à l'utilisateur
-                    return self._display_notification(
-                        'Erreur de géocodage',
-                        str(e),
-                        'warning',
-                        sticky=True
-                    )
-
-            # Récupérer les coordonnées
-            partner = self.company_id.partner_id
-            lat_soc = getattr(partner, 'partner_latitude', None)
-            lon_soc = getattr(partner, 'partner_longitude', None)
-            lat_cli, lon_cli = self.latitude, self.longitude
-            
-            _logger.debug(f"Calcul distance - Société: lat={lat_soc} lon={lon_soc} | Client: lat={lat_cli} lon={lon_cli}")
-            
-            # Vérifications
-            if not lat_soc or not lon_soc:
-                return self._display_notification(
-                    'Erreur coordonnées société',
-                    f"Le point de départ (société) n'est pas géolocalisé.\n"
-                    f"Valeurs lues: lat={lat_soc} lon={lon_soc}\n"
-                    "Vérifiez les champs latitude/longitude sur la fiche société.",
-                    'warning',
-                    sticky=True
-                )
-            
-            if not lat_cli or not lon_cli:
-                return self._display_notification(
-                    'Erreur coordonnées client',
-                    "Le point d'arrivée (client) n'est pas géolocalisé.\n"
-                    "Le géocodage automatique n'a pas fonctionné.\n"
-                    "Saisissez manuellement les coordonnées GPS dans l'onglet Navigation.",
-                    'warning',
-                    sticky=True
-                )
-            
-            # Tentative avec OpenRouteService
-            ors_api_key = self.env['ir.config_parameter'].sudo().get_param('intervention.openroute_api_key')
-            if ors_api_key:
-                distance_calculated = self._calculate_distance_ors(lat_soc, lon_soc, lat_cli, lon_cli, ors_api_key)
-                if distance_calculated:
-                    return distance_calculated
-            
-            # Fallback : distance à vol d'oiseau
-            self._calculer_distance_waze()
-            return self._display_notification(
-                'Calcul terminé (à vol d\'oiseau)',
-                f'⚠️ Itinéraire routier non disponible, calcul à vol d\'oiseau\n'
-                f'📏 Distance: {self.distance_km} km (distance réelle en voiture sera plus longue)\n'
-                f'⏱️ Durée estimée: {self.duree_trajet_min} min\n'
-                f'Point de départ (société): lat={lat_soc}, lon={lon_soc}\n'
-                f'Point d\'arrivée (client): lat={lat_cli}, lon={lon_cli}\n\n'
-                f'💡 Utilisez Google Maps ou Waze pour l\'itinéraire routier précis',
-                'warning'
-            )
-            
-        except Exception as e:
-            _logger.error(f"Erreur calcul distance: {str(e)}", exc_info=True)
+        partner = self.company_id.partner_id
+        lat_soc = getattr(partner, 'partner_latitude', None)
+        lon_soc = getattr(partner, 'partner_longitude', None)
+        
+        if not lat_soc or not lon_soc:
             return self._display_notification(
-                'Erreur de calcul automatique',
-                f'{str(e)}\n\nVous pouvez saisir manuellement les coordonnées GPS.',
-                'warning'
+                'Erreur coordonnées société',
+                f"Le point de départ (société) n'est pas géolocalisé.\n"
+                f"Valeurs lues: lat={lat_soc} lon={lon_soc}\n"
+                "Vérifiez les champs latitude/longitude sur la fiche société.",
+                'warning',
+                sticky=True
             )
+
+        self._enqueue_geocoding()
+        return self._display_notification(
+            'Calcul en cours',
+            "Le géocodage et le calcul de la distance sont en file d'attente.\n"
+            "La distance et la durée seront mises à jour dans quelques instants.",
+            'info'
+        )
     
     def _calculate_distance_ors(self, lat_soc, lon_soc, lat_cli, lon_cli, api_key):
         """Calcul de distance via OpenRouteService API"""
+        route = self._fetch_route_ors(lat_soc, lon_soc, lat_cli, lon_cli, api_key)
+        if not route:
+            return False
+
+        self.distance_km, self.duree_trajet_min = route
+
+        if self.distance_km > 0:
+            ors_link = (
+                f"https://maps.openrouteservice.org/directions?engine=fossilfuel&profile=driving-car"
+                f"&start={lon_soc},{lat_soc}&end={lon_cli},{lat_cli}"
+            )
+            return self._display_notification(
+                'Distance calculée (OpenRouteService)',
+                f'🗺️ {self.distance_km:.1f} km - ⏱️ {self.duree_trajet_min} min\n'
+                f'Point de départ (société): lat={lat_soc}, lon={lon_soc}\n'
+                f'Point d\'arrivée (client): lat={lat_cli}, lon={lon_cli}\n'
+                f"<a href='{ors_link}' target='_blank'>Voir l'itinéraire OpenRouteService</a>",
+                'info',
+                html=True
+            )
+
+        return False
+
+    @api.model
+    def _fetch_route_ors(self, lat_soc, lon_soc, lat_cli, lon_cli, api_key):
+        """Itinéraire routier via OpenRouteService API
+
+        :return: (distance en km, durée en minutes) ou None
+        """
         url = 'https://api.openrouteservice.org/v2/directions/driving-car'
         headers = {'Authorization': api_key, 'Accept': 'application/json'}
         body = {
@@ -279,57 +257,25 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
             
             if response.status_code == 200:
                 data = response.json()
+                summary = None
                 
                 # Nouveau format API v2 : chercher dans 'routes'
                 if 'routes' in data and data['routes']:
-                    route = data['routes'][0]
-                    if 'summary' in route:
-                        summary = route['summary']
-                        self.distance_km = round(summary['distance'] / 1000.0, 2)
-                        self.duree_trajet_min = int(summary['duration'] / 60)
-                        
-                        _logger.info(f"OpenRouteService (routes): {self.distance_km} km, {self.duree_trajet_min} min")
-                        
-                        if self.distance_km > 0:
-                            ors_link = (
-                                f"https://maps.openrouteservice.org/directions?engine=fossilfuel&profile=driving-car"
-                                f"&start={lon_soc},{lat_soc}&end={lon_cli},{lat_cli}"
-                            )
-                            return self._display_notification(
-                                'Distance calculée (OpenRouteService)',
-                                f'🗺️ {self.distance_km:.1f} km - ⏱️ {self.duree_trajet_min} min\n'
-                                f'Point de départ (société): lat={lat_soc}, lon={lon_soc}\n'
-                                f'Point d\'arrivée (client): lat={lat_cli}, lon={lon_cli}\n'
-                                f"<a href='{ors_link}' target='_blank'>Voir l'itinéraire OpenRouteService</a>",
-                                'info',
-                                html=True
-                            )
+                    summary = data['routes'][0].get('summary')
+                    source = 'routes'
                 
                 # Ancien format API : chercher dans 'features' (fallback)
                 elif 'features' in data and data['features']:
-                    if 'properties' in data['features'][0] and 'summary' in data['features'][0]['properties']:
-                        summary = data['features'][0]['properties']['summary']
-                        self.distance_km = round(summary['distance'] / 1000.0, 2)
-                        self.duree_trajet_min = int(summary['duration'] / 60)
-                        
-                        _logger.info(f"OpenRouteService (features): {self.distance_km} km, {self.duree_trajet_min} min")
-                        
-                        if self.distance_km > 0:
-                            ors_link = (
-                                f"https://maps.openrouteservice.org/directions?engine=fossilfuel&profile=driving-car"
-                                f"&start={lon_soc},{lat_soc}&end={lon_cli},{lat_cli}"
-                            )
-                            return self._display_notification(
-                                'Distance calculée (OpenRouteService)',
-                                f'🗺️ {self.distance_km:.1f} km - ⏱️ {self.duree_trajet_min} min\n'
-                                f'Point de départ (société): lat={lat_soc}, lon={lon_soc}\n'
-                                f'Point d\'arrivée (client): lat={lat_cli}, lon={lon_cli}\n'
-                                f"<a href='{ors_link}' target='_blank'>Voir l'itinéraire OpenRouteService</a>",
-                                'info',
-                                html=True
-                            )
+                    summary = data['features'][0].get('properties', {}).get('summary')
+                    source = 'features'
                 else:
                     _logger.warning(f"OpenRouteService: format de réponse non reconnu - {data}")
+                
+                if summary:
+                    distance_km = round(summary['distance'] / 1000.0, 2)
+                    duree_trajet_min = int(summary['duration'] / 60)
+                    _logger.info(f"OpenRouteService ({source}): {distance_km} km, {duree_trajet_min} min")
+                    return distance_km, duree_trajet_min
                     
             elif response.status_code == 404:
                 error_msg = response.json().get('error', {}).get('message', 'Adresse non trouvée') if response.text else 'Adresse non trouvée'
@@ -344,7 +290,7 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
         except Exception as e:
             _logger.warning(f"OpenRouteService API erreur: {str(e)}")
         
-        return False
+        return None
     
     def _display_notification(self, title, message, notification_type='info', sticky=False, html=False):
         """Affiche une notification à l'utilisateur"""
@@ -363,23 +309,23 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
             'params': params
         }
     def action_geocoder_adresse(self):
-        """Action bouton : géocoder l'adresse d'intervention"""
+        """Action bouton : géocoder l'adresse d'intervention en arrière-plan"""
         self.ensure_one()
         
         if not self.adresse_intervention:
             raise UserError("Veuillez renseigner l'adresse d'intervention.")
         
-        try:
-            self._geocoder_adresse()
-            return {'type': 'ir.actions.client', 'tag': 'reload'}
-        except Exception as e:
-            _logger.error(f"Erreur géocodage: {str(e)}")
-            return self._display_notification(
-                'Erreur de géocodage',
-                str(e),
-                'warning',
-                sticky=True
-            )
+        self._enqueue_geocoding()
+        return self._display_notification(
+            'Géocodage en cours',
+            "Le géocodage et le calcul du trajet sont en file d'attente.\n"
+            "Les coordonnées seront mises à jour dans quelques instants.",
+            'info'
+        )
+
+    def _enqueue_geocoding(self):
+        """Placer les interventions dans la file de géocodage en arrière-plan"""
+        return self.env['intervention.geocoding.job'].enqueue(self)
 
     # ===== DÉFINITION DES CHAMPS =====
     
@@ -438,141 +384,87 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
             'target': 'current',
             'context': {'create': False}
         }
+    def _prepare_geocoding_queries(self):
+        """Normaliser l'adresse d'intervention pour le géocodage
+
+        :return: (adresse normalisée, variantes à essayer auprès de Nominatim)
+        """
+        self.ensure_one()
+        adresse = self.adresse_intervention.strip()
+        
+        # Normaliser l'adresse (supprimer lignes vides, fusionner)
+        lignes = [l.strip() for l in adresse.splitlines() if l.strip()]
+        
+        # Retirer les lignes qui ne sont pas utiles pour le géocodage
+        lignes_filtrees = []
+        for ligne in lignes:
+            # Ignorer les lignes sans chiffre (nom de société/personne)
+            if not re.search(r'\d', ligne):
+                # Mais garder si c'est juste un nom de ville
+                if not any(mot in ligne.lower() for mot in ['immeuble', 'bâtiment', 'batiment', 'résidence', 'residence', 'chez', 'société', 'societe', 'sarl', 'sas', 'eurl']):
+                    lignes_filtrees.append(ligne)
+            else:
+                lignes_filtrees.append(ligne)
+        
+        # Si on a tout filtré, reprendre les lignes originales sauf la première
+        if not lignes_filtrees and len(lignes) > 1:
+            lignes_filtrees = lignes[1:]
+        elif not lignes_filtrees:
+            lignes_filtrees = lignes
+        
+        adresse_join = ' '.join(lignes_filtrees)
+        
+        _logger.info(f"Adresse normalisée pour géocodage: {adresse_join}")
+        
+        # Extraire rue, code postal, ville, pays
+        match = re.match(
+            r'(.+?)\s+(\d{5})\s+([A-Za-z\- ]+)'
+            r'(?:\s+(France|Belgique|Suisse|Luxembourg|Espagne|Italie|Germany|Deutschland|Portugal|Royaume-Uni|UK|Maroc|Tunisie|Algérie))?$',
+            adresse_join,
+            re.I
+        )
+        
+        # Préparer plusieurs variantes d'adresses à tester
+        adresses_a_tester = []
+        
+        if match:
+            rue = match.group(1).strip()
+            code_postal = match.group(2)
+            ville = match.group(3).strip()
+            pays = match.group(4) if match.group(4) else 'France'
+            
+            # Variante 1 : Format structuré avec virgules
+            adresses_a_tester.append(f"{rue}, {code_postal} {ville}, {pays}")
+            # Variante 2 : Format compact
+            adresses_a_tester.append(f"{rue} {code_postal} {ville} {pays}")
+            # Variante 3 : Sans la rue (parfois plus fiable)
+            adresses_a_tester.append(f"{code_postal} {ville}, {pays}")
+        else:
+            # Si le regex ne matche pas, essayer l'adresse telle quelle
+            adresses_a_tester.append(adresse_join)
+            if 'france' not in adresse_join.lower():
+                adresses_a_tester.append(f"{adresse_join}, France")
+
+        return adresse_join, adresses_a_tester
+
     def _geocoder_adresse(self):
         """Géocoder l'adresse d'intervention avec cache et gestion robuste"""
         if not self.adresse_intervention:
             return
         
         try:
-            import re
-            adresse = self.adresse_intervention.strip()
-            
-            # Normaliser l'adresse (supprimer lignes vides, fusionner)
-            lignes = [l.strip() for l in adresse.splitlines() if l.strip()]
-            
-            # Retirer les lignes qui ne sont pas utiles pour le géocodage
-            lignes_filtrees = []
-            for ligne in lignes:
-                # Ignorer les lignes sans chiffre (nom de société/personne)
-                if not re.search(r'\d', ligne):
-                    # Mais garder si c'est juste un nom de ville
-                    if not any(mot in ligne.lower() for mot in ['immeuble', 'bâtiment', 'batiment', 'résidence', 'residence', 'chez', 'société', 'societe', 'sarl', 'sas', 'eurl']):
-                        lignes_filtrees.append(ligne)
-                else:
-                    lignes_filtrees.append(ligne)
-            
-            # Si on a tout filtré, reprendre les lignes originales sauf la première
-            if not lignes_filtrees and len(lignes) > 1:
-                lignes_filtrees = lignes[1:]
-            elif not lignes_filtrees:
-                lignes_filtrees = lignes
-            
-            adresse_join = ' '.join(lignes_filtrees)
-            
-            _logger.info(f"Adresse normalisée pour géocodage: {adresse_join}")
-            
-            # Vérifier le cache avec l'adresse originale
-            cache = self.env['intervention.geocoding.cache'].sudo().search([
-                ('address', '=', adresse_join)
-            ], limit=1)
-            
-            if cache:
-                self.latitude = float(cache.latitude)
-                self.longitude = float(cache.longitude)
-                _logger.info(f"Géocodage depuis cache pour: {adresse_join}")
-                return
-
-            # Extraire rue, code postal, ville, pays
-            match = re.match(
-                r'(.+?)\s+(\d{5})\s+([A-Za-z\- ]+)'
-                r'(?:\s+(France|Belgique|Suisse|Luxembourg|Espagne|Italie|Germany|Deutschland|Portugal|Royaume-Uni|UK|Maroc|Tunisie|Algérie))?$',
-                adresse_join,
-                re.I
+            adresse_join, adresses_a_tester = self._prepare_geocoding_queries()
+
+            # Cache mémoire, cache en base (résultats négatifs compris) puis
+            # Nominatim via la file d'attente partagée entre les workers
+            coords = self.env['intervention.geocoding.service'].geocode(
+                adresse_join, queries=adresses_a_tester
             )
-            
-            # Préparer plusieurs variantes d'adresses à tester
-            adresses_a_tester = []
-            
-            if match:
-                rue = match.group(1).strip()
-                code_postal = match.group(2)
-                ville = match.group(3).strip()
-                pays = match.group(4) if match.group(4) else 'France'
-                
-                # Variante 1 : Format structuré avec virgules
-                adresses_a_tester.append(f"{rue}, {code_postal} {ville}, {pays}")
-                # Variante 2 : Format compact
-                adresses_a_tester.append(f"{rue} {code_postal} {ville} {pays}")
-                # Variante 3 : Sans la rue (parfois plus fiable)
-                adresses_a_tester.append(f"{code_postal} {ville}, {pays}")
-            else:
-                # Si le regex ne matche pas, essayer l'adresse telle quelle
-                adresses_a_tester.append(adresse_join)
-                if 'france' not in adresse_join.lower():
-                    adresses_a_tester.append(f"{adresse_join}, France")
-
-            # Appel API Nominatim avec plusieurs tentatives
-            url = "https://nominatim.openstreetmap.org/search"
-            company_email = self.env.company.email or ''
-            headers = {'User-Agent': 'OdooIntervention/1.0'}
-            
-            result_found = False
-            lat, lon = None, None
-            
-            for idx, adresse_test in enumerate(adresses_a_tester):
-                _logger.info(f"Tentative {idx+1}/{len(adresses_a_tester)} de géocodage: {adresse_test}")
-                
-                params = {
-                    'q': adresse_test,
-                    'format': 'json',
-                    'limit': 3,  # Augmenter à 3 pour avoir plus de résultats
-                    'addressdetails': 1,
-                    'countrycodes': 'fr',  # Priorité France
-                }
-                
-                if company_email:
-                    params['email'] = company_email
-                
-                try:
-                    response = requests.get(url, params=params, headers=headers, timeout=10)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        if data and len(data) > 0:
-                            # Prendre le premier résultat
-                            lat = float(data[0]['lat'])
-                            lon = float(data[0]['lon'])
-                            result_found = True
-                            _logger.info(f"✓ Géocodage réussi: lat={lat}, lon={lon}")
-                            break
-                    
-                    # Pause entre les requêtes pour respecter l'usage de Nominatim
-                    import time
-                    time.sleep(0.5)
-                    
-                except requests.RequestException as e:
-                    _logger.warning(f"Erreur tentative {idx+1}: {str(e)}")
-                    continue
-            
-            if result_found and lat and lon:
-                self.latitude = lat
-                self.longitude = lon
-                
-                # Sauvegarder dans le cache
-                try:
-                    cache_key = hashlib.sha1(adresse_join.encode('utf-8')).hexdigest()
-                    self.env['intervention.geocoding.cache'].sudo().create({
-                        'cache_key': cache_key,
-                        'address': adresse_join,
-                        'latitude': self.latitude,
-                        'longitude': self.longitude,
-                    })
-                    _logger.info(f"Coordonnées sauvegardées dans le cache")
-                except Exception as e:
-                    _logger.warning(f"Erreur sauvegarde cache: {str(e)}")
+
+            if coords:
+                self.latitude, self.longitude = coords
             else:
-                # Aucune tentative n'a réussi
+                # Aucune tentative n'a réussi (ou échec récent mémorisé)
                 raise UserError(
                     f"Adresse non trouvée après {len(adresses_a_tester)} tentatives.\n"
                     f"Adresse recherchée: {adresse_join}\n\n"
@@ -662,6 +554,14 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
         string="Durée trajet (min)",
         help="Durée estimée du trajet via Waze"
     )
+    geocoding_state = fields.Selection([
+        ('none', 'Non géolocalisée'),
+        ('pending', 'En attente'),
+        ('done', 'Géolocalisée'),
+        ('failed', 'Échec'),
+    ], string="Géolocalisation", default='none', copy=False, readonly=True,
+        help="État du géocodage et du calcul de trajet en arrière-plan"
+    )
     lien_waze = fields.Char(
         string="Lien Waze",
         compute='_compute_lien_waze',
@@ -1246,6 +1146,9 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
                 else:
                     _logger.warning(f"[DEBUG INTERVENTION] Numéro fourni (batch): {val.get('numero')}")
                 interventions += super(InterventionIntervention, self).create(val)
+            interventions.filtered(
+                lambda i: i.adresse_intervention and not i.latitude
+            )._enqueue_geocoding()
             return interventions
 
         # Contrôle d'accès global intervention
@@ -1270,6 +1173,9 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
                 intervention._create_calendar_event()
             except Exception:
                 pass
+        # Géolocalisation en arrière-plan
+        if intervention.adresse_intervention and not intervention.latitude:
+            intervention._enqueue_geocoding()
         return intervention
 
     def write(self, vals):
@@ -1320,14 +1226,10 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
                     except Exception as e:
                         _logger.warning(f"Erreur mise à jour calendrier: {str(e)}")
         
-        # Géolocalisation automatique si adresse change
-        if 'adresse_intervention' in vals:
-            for record in self:
-                if record.adresse_intervention and not record.latitude:
-                    try:
-                        record._geocoder_adresse()
-                    except Exception as e:
-                        _logger.warning(f"Erreur géocodage auto: {str(e)}")
+        # Géolocalisation en arrière-plan si l'adresse change (sauf si les
+        # coordonnées sont fournies dans la même écriture)
+        if 'adresse_intervention' in vals and 'latitude' not in vals:
+            self.filtered('adresse_intervention')._enqueue_geocoding()
         
         return res
     def unlink(self):
@@ -1561,6 +1463,46 @@ class InterventionIntervention(models.Model, InterventionAccessMixin, MailThread
         # Durée estimée (2 min/km, minimum 1 min)
         self.duree_trajet_min = max(int(distance * 2), 1)
 
+    def _prepare_trajet_vals(self, lat_cli, lon_cli, ors_api_key=None, routes=None):
+        """Distance et durée de trajet depuis la société, sans effet de bord
+
+        Itinéraire OpenRouteService si la société est géolocalisée et qu'une
+        clé API est configurée, sinon estimation à vol d'oiseau comme
+        `_calculer_distance_waze`.
+
+        :param routes: dictionnaire partagé entre appels pour ne calculer
+                       qu'une fois chaque couple départ/arrivée
+        """
+        self.ensure_one()
+        routes = {} if routes is None else routes
+
+        partner = self.company_id.partner_id
+        lat_soc = getattr(partner, 'partner_latitude', None)
+        lon_soc = getattr(partner, 'partner_longitude', None)
+
+        if not lat_soc or not lon_soc:
+            # Fallback Paris si société non géocodée
+            lat_soc, lon_soc = 48.8566, 2.3522
+            ors_api_key = None
+
+        key = (lat_soc, lon_soc, lat_cli, lon_cli)
+        if key not in routes:
+            route = None
+            if ors_api_key:
+                route = self._fetch_route_ors(lat_soc, lon_soc, lat_cli, lon_cli, ors_api_key)
+
+            if not route or not route[0]:
+                distance = self._haversine(lat_soc, lon_soc, lat_cli, lon_cli)
+                route = (round(distance, 2), max(int(distance * 2), 1))
+
+            routes[key] = route
+
+        distance_km, duree_trajet_min = routes[key]
+        return {
+            'distance_km': distance_km,
+            'duree_trajet_min': duree_trajet_min,
+        }
+
     def action_create_calendar_event(self):
         """Action pour créer manuellement un événement calendrier"""
         self.ensure_one()
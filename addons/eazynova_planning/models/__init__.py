@@ -4,6 +4,7 @@ from . import planning_task
 from . import planning_resource
 from . import planning_calendar
 from . import planning_assignment
+from . import planning_sync
 from . import planning_absence
 from . import planning_slot
 from . import project_task
@@ -181,15 +181,13 @@ class PlanningAbsence(models.Model):
         """Vérifie les conflits avec les assignations existantes"""
         self.ensure_one()
 
-        conflicts = self.env['eazynova.planning.assignment'].search([
-            ('resource_id', '=', self.resource_id.id),
-            ('state', 'in', ('confirmed', 'in_progress')),
-            '|',
-            '&', ('date_start', '<=', self.date_start), ('date_end', '>=', self.date_start),
-            '&', ('date_start', '<=', self.date_end), ('date_end', '>=', self.date_end),
-        ])
-
-        return conflicts
+        Assignment = self.env['eazynova.planning.assignment']
+        index = Assignment._build_conflict_index(self.resource_id, self.date_start, self.date_end)
+
+        return Assignment.browse(index.overlapping_assignments(
+            self.resource_id.id, self.date_start, self.date_end,
+            states=('confirmed', 'in_progress'),
+        ))
 
     def action_view_conflicts(self):
         """Affiche les conflits d'assignation"""
@@ -1,9 +1,21 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import html2plaintext
+from .planning_calendar import WORKING_TIME_DEPENDS
+from .planning_conflict import PlanningConflictIndex, HolidaySet, first_weekend_day
+from .planning_working_time import to_local
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Champs dont la modification impose de mettre à jour l'événement calendrier
+CALENDAR_SYNC_FIELDS = (
+    'task_id', 'resource_id', 'date_start', 'date_end', 'notes', 'active',
+)
+
+# Clé des assignations en attente de synchronisation calendrier (precommit)
+CALENDAR_SYNC_PENDING = 'eazynova_planning.calendar_sync'
+
 
 class PlanningAssignment(models.Model):
     _name = 'eazynova.planning.assignment'
@@ -24,48 +36,35 @@ class PlanningAssignment(models.Model):
     chantier_id = fields.Many2one('chantier.chantier', string='Chantier')
     color = fields.Integer('Couleur')
 
+    # Clé stable de la source synchronisée ("intervention,<id>" ou "chantier,<id>")
+    source_key = fields.Char(string="Clé de source", index=True, copy=False, readonly=True)
+    active = fields.Boolean(string="Actif", default=True)
+
     @api.model
     def create_from_interventions(self):
-        """Crée des assignments à partir des interventions en cours."""
-        interventions = self.env['intervention.intervention'].search([('state', '=', 'in_progress')])
-        for inter in interventions:
-            self.create({
-                'name': inter.name,
-                'date_start': inter.date_start,
-                'date_end': inter.date_end,
-                'resource_id': inter.technician_id.id,
-                'type': 'intervention',
-                'intervention_id': inter.id,
-                'client_id': inter.client_id.id if hasattr(inter, 'client_id') else False,
-                'donneur_ordre_id': inter.donneur_ordre_id.id if hasattr(inter, 'donneur_ordre_id') else False,
-            })
+        """Synchronise les assignments à partir des interventions en cours."""
+        return self.env['eazynova.planning.assignment.sync'].run(
+            full=True, source_types=('intervention',))
 
     @api.model
     def create_from_chantiers(self):
-        """Crée des assignments à partir des chantiers en cours."""
-        chantiers = self.env['chantier.chantier'].search([('state', '=', 'in_progress')])
-        for ch in chantiers:
-            self.create({
-                'name': ch.name,
-                'date_start': ch.date_start,
-                'date_end': ch.date_end,
-                'resource_id': ch.responsible_id.id,
-                'type': 'chantier',
-                'chantier_id': ch.id,
-                'client_id': ch.client_id.id if hasattr(ch, 'client_id') else False,
-                'donneur_ordre_id': ch.donneur_ordre_id.id if hasattr(ch, 'donneur_ordre_id') else False,
-            })
+        """Synchronise les assignments à partir des chantiers en cours."""
+        return self.env['eazynova.planning.assignment.sync'].run(
+            full=True, source_types=('chantier',))
 
     @api.model
-    def cron_sync_assignments(self):
-        """Synchronisation automatique quotidienne du planning global."""
-        self.env['eazynova.planning.assignment'].search([]).unlink()  # Reset pour éviter doublons
-        self.create_from_interventions()
-        self.create_from_chantiers()
+    def cron_sync_assignments(self, full=False):
+        """Synchronisation automatique quotidienne du planning global.
+
+        Incrémentale : seules les sources modifiées depuis la dernière
+        exécution sont comparées aux assignations existantes.
+        """
+        return self.env['eazynova.planning.assignment.sync'].run(full=full)
 
     def action_view_calendar_event(self):
         """Ouvre l'événement calendrier lié à l'assignation"""
         self.ensure_one()
+        self._flush_calendar_sync()
         if not self.calendar_event_id:
             return False
         return {
@@ -85,41 +84,93 @@ class PlanningAssignment(models.Model):
         help="Synchronisation automatique avec le calendrier Odoo."
     )
 
+    def _prepare_calendar_event_vals(self):
+        """Valeurs de l'événement calendrier lié à l'assignation."""
+        self.ensure_one()
+        return {
+            'name': self.name or _('Assignation'),
+            'start': self.date_start,
+            'stop': self.date_end,
+            'user_id': self.resource_id.user_id.id if self.resource_id.user_id else self.env.user.id,
+            'allday': False,
+            'description': self.notes or '',
+            'active': self.active,
+        }
+
+    def _get_calendar_event_changes(self, event, vals):
+        """Champs de l'événement dont la valeur diffère réellement."""
+        changes = {}
+        for field_name, value in vals.items():
+            current, compared = event[field_name], value
+            if field_name == 'user_id':
+                current = current.id
+            elif field_name == 'description':
+                # Champ HTML : comparer le texte brut
+                current = html2plaintext(current or '').strip()
+                compared = (value or '').strip()
+            if current != compared:
+                changes[field_name] = value
+        return changes
+
+    def _schedule_calendar_sync(self):
+        """Reporte la synchronisation calendrier à la fin de la transaction.
+
+        Les assignations modifiées plusieurs fois dans la même transaction
+        ne sont synchronisées qu'une fois, toutes ensemble.
+        """
+        if not self:
+            return
+        pending = self.env.cr.precommit.data.setdefault(CALENDAR_SYNC_PENDING, set())
+        if not pending:
+            self.env.cr.precommit.add(self._flush_calendar_sync)
+        pending.update(self.ids)
+
+    def _flush_calendar_sync(self):
+        """Synchronise immédiatement les assignations en attente."""
+        pending = self.env.cr.precommit.data.pop(CALENDAR_SYNC_PENDING, set())
+        if pending:
+            self.browse(pending).with_context(active_test=False).exists()._sync_calendar_event()
+            # Les hooks precommit passent après le flush de la transaction
+            self.env.flush_all()
+
     def _sync_calendar_event(self):
-        """Crée ou met à jour l'événement calendar.event lié à l'assignation."""
-        CalendarEvent = self.env['calendar.event']
+        """Crée ou met à jour l'événement calendar.event lié à l'assignation.
+
+        Les nouveaux événements sont créés en un seul appel ; les événements
+        existants ne sont écrits que si l'un de leurs champs change, en une
+        écriture par ensemble de valeurs identique.
+        """
+        to_create = []
+        to_write = {}
         for assignment in self:
-            vals = {
-                'name': assignment.name or _('Assignation'),
-                'start': assignment.date_start,
-                'stop': assignment.date_end,
-                'user_id': assignment.resource_id.user_id.id if assignment.resource_id.user_id else self.env.user.id,
-                'allday': False,
-                'description': assignment.notes or '',
-                'active': True,
-            }
-            if assignment.calendar_event_id:
-                assignment.calendar_event_id.write(vals)
-            else:
-                event = CalendarEvent.create(vals)
+            vals = assignment._prepare_calendar_event_vals()
+            event = assignment.calendar_event_id.with_context(active_test=False)
+            if event:
+                changes = assignment._get_calendar_event_changes(event, vals)
+                if changes:
+                    key = tuple(sorted(changes.items()))
+                    to_write.setdefault(key, event.browse())
+                    to_write[key] |= event
+            elif assignment.active:
+                to_create.append((assignment, vals))
+
+        for changes, events in to_write.items():
+            events.write(dict(changes))
+
+        if to_create:
+            events = self.env['calendar.event'].create([vals for __, vals in to_create])
+            for (assignment, __), event in zip(to_create, events):
                 assignment.calendar_event_id = event.id
 
-    @api.model
-    def create(self, vals):
-        record = super().create(vals)
-        record._sync_calendar_event()
-        return record
-
     def write(self, vals):
         res = super().write(vals)
-        self._sync_calendar_event()
+        if any(field_name in vals for field_name in CALENDAR_SYNC_FIELDS):
+            self._schedule_calendar_sync()
         return res
 
     def unlink(self):
-        # Supprimer l'événement calendrier lié si présent
-        for assignment in self:
-            if assignment.calendar_event_id:
-                assignment.calendar_event_id.unlink()
+        # Supprimer les événements calendrier liés
+        self.calendar_event_id.unlink()
         return super().unlink()
 
     name = fields.Char(string="Nom", compute='_compute_name', store=True)
@@ -224,21 +275,27 @@ class PlanningAssignment(models.Model):
     # Couleur
     color = fields.Integer(string="Couleur", default=0)
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Génère la référence à la création"""
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code(
-                'eazynova.planning.assignment') or _('New')
-
-        # Si les dates ne sont pas fournies, prendre celles de la tâche
-        if 'task_id' in vals and not ('date_start' in vals and 'date_end' in vals):
-            task = self.env['eazynova.planning.task'].browse(vals['task_id'])
-            if task:
-                vals.setdefault('date_start', task.date_start)
-                vals.setdefault('date_end', task.date_end)
-
-        return super(PlanningAssignment, self).create(vals)
+        tasks = self.env['eazynova.planning.task'].browse(
+            [vals['task_id'] for vals in vals_list if vals.get('task_id')]
+        )
+        for vals in vals_list:
+            if vals.get('reference', _('New')) == _('New'):
+                vals['reference'] = self.env['ir.sequence'].next_by_code(
+                    'eazynova.planning.assignment') or _('New')
+
+            # Si les dates ne sont pas fournies, prendre celles de la tâche
+            if 'task_id' in vals and not ('date_start' in vals and 'date_end' in vals):
+                task = tasks.browse(vals['task_id'])
+                if task:
+                    vals.setdefault('date_start', task.date_start)
+                    vals.setdefault('date_end', task.date_end)
+
+        records = super(PlanningAssignment, self).create(vals_list)
+        records._schedule_calendar_sync()
+        return records
 
     @api.depends('task_id', 'resource_id')
     def _compute_name(self):
@@ -259,87 +316,159 @@ class PlanningAssignment(models.Model):
             else:
                 assignment.duration = 0.0
 
-    @api.depends('duration', 'resource_id.cost_per_hour', 'allocation_percentage')
+    @api.depends('duration', 'resource_id.cost_per_hour', 'resource_id.calendar_id',
+                 'resource_id.work_holidays', 'allocation_percentage',
+                 'resource_id.user_id.tz', 'resource_id.company_id.partner_id.tz',
+                 *(f'resource_id.calendar_id.{path}' for path in WORKING_TIME_DEPENDS))
     def _compute_cost(self):
-        """Calcule le coût de l'assignation"""
+        """Calcule le coût de l'assignation sur les heures ouvrées de la ressource"""
+        priced = self.filtered(
+            lambda a: a.resource_id.cost_per_hour and a.date_start and a.date_end)
+        working_hours = priced._get_working_hours()
         for assignment in self:
-            if assignment.resource_id and assignment.resource_id.cost_per_hour:
-                hours = assignment.duration * \
+            if assignment in priced:
+                hours = working_hours[assignment.id] * \
                     (assignment.allocation_percentage / 100.0)
                 assignment.cost = hours * assignment.resource_id.cost_per_hour
             else:
                 assignment.cost = 0.0
 
+    def _get_working_hours(self):
+        """
+        Heures ouvrées de chaque assignation selon le calendrier de sa
+        ressource (jours fériés déduits), calculées en une passe
+
+        :return: {assignment_id: heures}
+        """
+        assignments = self.filtered(lambda a: a.resource_id and a.date_start and a.date_end)
+        if not assignments:
+            return {}
+
+        # Les absences relèvent des conflits, pas du coût
+        working_times = assignments.resource_id._get_working_times(
+            min(assignments.mapped('date_start')),
+            max(assignments.mapped('date_end')),
+            absences=False,
+        )
+        return {
+            assignment.id: working_times[assignment.resource_id.id].working_hours(
+                assignment.date_start, assignment.date_end)
+            for assignment in assignments
+        }
+
     @api.depends('resource_id', 'date_start', 'date_end', 'state')
     def _compute_has_conflict(self):
         """Détecte les conflits d'assignation, y compris week-end et jours fériés selon la ressource"""
-        import datetime
+        details = self._get_conflict_details()
         for assignment in self:
-            if not assignment.resource_id or not assignment.date_start or not assignment.date_end:
-                assignment.has_conflict = False
-                assignment.conflict_details = ""
-                continue
-
-            # Conflits d'assignation
-            overlapping = self.search([
-                ('resource_id', '=', assignment.resource_id.id),
-                ('id', '!=', assignment.id),
-                ('state', 'not in', ('cancelled', 'done')),
-                '|',
-                '&', ('date_start', '<=', assignment.date_start), ('date_end',
-                                                                   '>=', assignment.date_start),
-                '&', ('date_start', '<=', assignment.date_end), ('date_end',
-                                                                 '>=', assignment.date_end),
-            ])
-
-            # Conflits d'absence
-            absences = self.env['eazynova.planning.absence'].search([
-                ('resource_id', '=', assignment.resource_id.id),
-                ('state', '=', 'approved'),
-                '|',
-                '&', ('date_start', '<=', assignment.date_start), ('date_end',
-                                                                   '>=', assignment.date_start),
-                '&', ('date_start', '<=', assignment.date_end), ('date_end',
-                                                                 '>=', assignment.date_end),
-            ])
+            conflicts = details.get(assignment.id, [])
+            assignment.has_conflict = bool(conflicts)
+            assignment.conflict_details = "\n".join(conflicts)
 
+    @api.model
+    def _build_conflict_index(self, resources, date_from, date_to):
+        """
+        Charge en deux requêtes les assignations et absences approuvées des
+        ressources sur la période et les indexe par ressource.
+
+        :return: PlanningConflictIndex
+        """
+        if not resources or not date_from or not date_to:
+            return PlanningConflictIndex([], [])
+
+        assignments = self.search_read([
+            ('resource_id', 'in', resources.ids),
+            ('state', 'not in', ('cancelled', 'done')),
+            ('date_start', '<=', date_to),
+            ('date_end', '>=', date_from),
+        ], ['resource_id', 'date_start', 'date_end', 'state'], order='id')
+
+        absences = self.env['eazynova.planning.absence'].search_read([
+            ('resource_id', 'in', resources.ids),
+            ('state', '=', 'approved'),
+            ('date_start', '<=', date_to),
+            ('date_end', '>=', date_from),
+        ], ['resource_id', 'date_start', 'date_end', 'name'], order='id')
+
+        return PlanningConflictIndex(
+            [(a['resource_id'][0], a['date_start'], a['date_end'], a['id'], a['state'])
+             for a in assignments],
+            [(a['resource_id'][0], a['date_start'], a['date_end'], a['id'], a['name'])
+             for a in absences],
+        )
+
+    def _get_conflict_details(self, index=None):
+        """
+        Conflits de chaque assignation, calculés en une passe
+
+        :param index: PlanningConflictIndex déjà construit (optionnel)
+        :return: {assignment_id: [messages]}
+        """
+        assignments = self.filtered(lambda a: a.resource_id and a.date_start and a.date_end)
+        if not assignments:
+            return {}
+
+        if index is None:
+            index = self._build_conflict_index(
+                assignments.resource_id,
+                min(assignments.mapped('date_start')),
+                max(assignments.mapped('date_end')),
+            )
+
+        holiday_sets = {}
+        details = {}
+
+        for assignment in assignments:
+            resource = assignment.resource_id
             conflicts = []
+
+            # Conflits d'assignation (chevauchement ou inclusion)
+            overlapping = index.overlapping_assignments(
+                resource.id, assignment.date_start, assignment.date_end,
+                exclude_id=assignment.id,
+            )
             if overlapping:
                 conflicts.append(
                     f"Chevauche {len(overlapping)} autre(s) assignation(s)")
+
+            # Conflits d'absence
+            absences = index.overlapping_absences(
+                resource.id, assignment.date_start, assignment.date_end)
             if absences:
                 conflicts.append(
-                    f"La ressource est absente ({', '.join(absences.mapped('name'))})")
+                    f"La ressource est absente ({', '.join(name for __, name in absences)})")
+
+            # Jours de l'assignation dans le fuseau de la ressource
+            tz = resource._get_tz()
+            date_from = to_local(assignment.date_start, tz).date()
+            date_to = to_local(assignment.date_end, tz).date()
 
             # Vérification week-end
-            current = assignment.date_start
-            while current <= assignment.date_end:
-                if current.weekday() >= 5 and not assignment.resource_id.work_weekend:
+            if not resource.work_weekend:
+                weekend_day = first_weekend_day(date_from, date_to)
+                if weekend_day:
                     conflicts.append(_(
-                        "Week-end non autorisé pour cette ressource (%s)" % current.strftime(
+                        "Week-end non autorisé pour cette ressource (%s)" % weekend_day.strftime(
                             '%A')
                     ))
-                    break
-                current += datetime.timedelta(days=1)
 
             # Vérification jours fériés
-            calendar = assignment.resource_id.calendar_id
-            if calendar and calendar.holiday_ids and not assignment.resource_id.work_holidays:
-                holidays = calendar.holiday_ids.mapped('date')
-                current = assignment.date_start.date()
-                end = assignment.date_end.date()
-                while current <= end:
-                    if current in holidays:
-                        conflicts.append(_(
-                            "Jour férié non autorisé pour cette ressource (%s)" % current.strftime(
-                                '%Y-%m-%d')
-                        ))
-                        break
-                    current += datetime.timedelta(days=1)
+            calendar = resource.calendar_id
+            if calendar and not resource.work_holidays:
+                if calendar.id not in holiday_sets:
+                    holiday_sets[calendar.id] = HolidaySet(
+                        (holiday.date, holiday.is_recurring) for holiday in calendar.holiday_ids
+                    )
+                holiday = holiday_sets[calendar.id].first_in(date_from, date_to)
+                if holiday:
+                    conflicts.append(_(
+                        "Jour férié non autorisé pour cette ressource (%s)" % holiday.strftime(
+                            '%Y-%m-%d')
+                    ))
 
-            assignment.has_conflict = bool(conflicts)
-            assignment.conflict_details = "\n".join(
-                conflicts) if conflicts else ""
+            details[assignment.id] = conflicts
+
+        return details
 
     @api.constrains('date_start', 'date_end')
     def _check_dates(self):
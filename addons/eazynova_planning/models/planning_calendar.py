@@ -1,11 +1,29 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
+from .planning_conflict import HolidaySet
+from .planning_working_time import (
+    DAYS_OF_WEEK, WorkingTime, WorkingTimeTemplate, day_interval, get_timezone, to_local,
+)
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Champs du calendrier qui définissent sa semaine type
+TEMPLATE_FIELDS = {
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+    'hour_start_morning', 'hour_end_morning', 'hour_start_afternoon', 'hour_end_afternoon',
+    'slot_ids',
+}
+
+# Chemins, depuis le calendrier, dont dépendent les heures ouvrées calculées
+# (semaine type, créneaux et jours fériés)
+WORKING_TIME_DEPENDS = tuple(sorted(TEMPLATE_FIELDS - {'slot_ids'})) + (
+    'slot_ids.day_of_week', 'slot_ids.hour_start', 'slot_ids.hour_end', 'slot_ids.active',
+    'holiday_ids.date', 'holiday_ids.is_recurring', 'holiday_ids.active',
+)
+
 
 class PlanningCalendar(models.Model):
     _name = 'eazynova.planning.calendar'
@@ -117,11 +135,78 @@ class PlanningCalendar(models.Model):
                 'name': f"{day.capitalize()} - Après-midi",
             })
 
+    def write(self, vals):
+        res = super(PlanningCalendar, self).write(vals)
+        if TEMPLATE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(PlanningCalendar, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('calendar_id')
+    def _get_working_template(self, calendar_id):
+        """Semaine type compilée du calendrier (mise en cache)"""
+        calendar = self.sudo().browse(calendar_id)
+        slots = calendar.slot_ids.filtered('active')
+        if slots:
+            intervals = [
+                (DAYS_OF_WEEK.index(slot.day_of_week), slot.hour_start, slot.hour_end)
+                for slot in slots
+            ]
+        else:
+            # Sans créneaux : jours cochés et horaires standards
+            intervals = [
+                (day, hour_start, hour_end)
+                for day, day_name in enumerate(DAYS_OF_WEEK) if calendar[day_name]
+                for hour_start, hour_end in (
+                    (calendar.hour_start_morning, calendar.hour_end_morning),
+                    (calendar.hour_start_afternoon, calendar.hour_end_afternoon),
+                )
+            ]
+        return WorkingTimeTemplate(intervals)
+
+    def _get_tz(self):
+        """Fuseau des heures du calendrier : utilisateur, sinon société"""
+        self.ensure_one()
+        return get_timezone(self.env.user.tz or self.company_id.partner_id.tz)
+
+    def _get_holiday_intervals(self, date_from, date_to, tz):
+        """
+        Jours fériés du calendrier sur la période (bornes UTC), en
+        intervalles d'heures locales de minuit à minuit
+        """
+        self.ensure_one()
+        holidays = HolidaySet((holiday.date, holiday.is_recurring) for holiday in self.holiday_ids)
+        return [
+            day_interval(day)
+            for day in holidays.all_in(to_local(date_from, tz).date(), to_local(date_to, tz).date())
+        ]
+
+    def _get_working_time(self, date_from, date_to, exclusions=(), holidays=True):
+        """
+        Temps de travail du calendrier sur une période
+
+        :param exclusions: intervalles (début, fin) en heures locales à retirer
+        :param holidays: retirer les jours fériés du calendrier
+        :return: WorkingTime
+        """
+        self.ensure_one()
+        tz = self._get_tz()
+        exclusions = list(exclusions)
+        if holidays:
+            exclusions += self._get_holiday_intervals(date_from, date_to, tz)
+        return WorkingTime(self._get_working_template(self.id), exclusions, tz)
+
     def get_working_hours(self, date_start, date_end):
         """Calcule les heures de travail entre deux dates"""
         self.ensure_one()
-        # TODO: Implémenter le calcul des heures ouvrées
-        return 0.0
+        if not date_start or not date_end or date_end <= date_start:
+            return 0.0
+        return self._get_working_time(date_start, date_end).working_hours(date_start, date_end)
 
 
 class PlanningCalendarSlot(models.Model):
@@ -153,6 +238,22 @@ class PlanningCalendarSlot(models.Model):
 
     active = fields.Boolean(string="Actif", default=True)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        slots = super(PlanningCalendarSlot, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return slots
+
+    def write(self, vals):
+        res = super(PlanningCalendarSlot, self).write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(PlanningCalendarSlot, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends('hour_start', 'hour_end')
     def _compute_duration(self):
         """Calcule la durée du créneau"""
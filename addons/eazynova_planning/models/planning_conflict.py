@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class IntervalTree:
+    """
+    Arbre d'intervalles statique (centré).
+
+    Les bornes sont incluses : deux intervalles qui se touchent se
+    chevauchent, comme dans les recherches de conflits d'origine. Une
+    requête renvoie tous les intervalles qui recoupent la période, y compris
+    ceux qui la contiennent entièrement.
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        """
+        :param intervals: liste de tuples (début, fin, valeur)
+        """
+        endpoints = sorted(point for start, end, __ in intervals for point in (start, end))
+        self.center = endpoints[len(endpoints) // 2]
+
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start, end):
+        """Valeurs des intervalles qui recoupent [start, end]"""
+        result = []
+        node = self
+        stack = []
+        while node or stack:
+            if not node:
+                node = stack.pop()
+
+            if end < node.center:
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    result.append(interval[2])
+                node = node.left
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    result.append(interval[2])
+                node = node.right
+            else:
+                result.extend(interval[2] for interval in node.by_start)
+                if node.right:
+                    stack.append(node.right)
+                node = node.left
+
+        return result
+
+
+class HolidaySet:
+    """Jours fériés d'un calendrier, interrogeables par période"""
+
+    def __init__(self, holidays):
+        """
+        :param holidays: itérable de tuples (date, récurrent)
+        """
+        holidays = list(holidays)
+        self.dates = sorted({day for day, __ in holidays})
+        self.recurring = sorted({(day.month, day.day) for day, recurring in holidays if recurring})
+
+    def first_in(self, date_from, date_to):
+        """Premier jour férié entre deux dates incluses, ou None"""
+        found = []
+
+        index = bisect_left(self.dates, date_from)
+        if index < len(self.dates) and self.dates[index] <= date_to:
+            found.append(self.dates[index])
+
+        for year in range(date_from.year, date_to.year + 1):
+            for month, day in self.recurring:
+                try:
+                    holiday = date(year, month, day)
+                except ValueError:
+                    # 29 février d'une année non bissextile
+                    continue
+                if date_from <= holiday <= date_to:
+                    found.append(holiday)
+                    break
+
+        return min(found) if found else None
+
+    def all_in(self, date_from, date_to):
+        """Jours fériés entre deux dates incluses, triés"""
+        found = set(self.dates[bisect_left(self.dates, date_from):bisect_left(self.dates, date_to + timedelta(days=1))])
+
+        for year in range(date_from.year, date_to.year + 1):
+            for month, day in self.recurring:
+                try:
+                    holiday = date(year, month, day)
+                except ValueError:
+                    continue
+                if date_from <= holiday <= date_to:
+                    found.add(holiday)
+
+        return sorted(found)
+
+
+def first_weekend_day(date_from, date_to):
+    """Premier samedi ou dimanche entre deux dates incluses, ou None"""
+    for offset in range(min((date_to - date_from).days, 6) + 1):
+        day = date_from + timedelta(days=offset)
+        if day.weekday() >= 5:
+            return day
+    return None
+
+
+class PlanningConflictIndex:
+    """
+    Index des conflits de planning pour un ensemble de ressources.
+
+    Les assignations et absences approuvées de la période sont chargées une
+    seule fois ; un arbre d'intervalles par ressource répond ensuite à
+    chaque question de chevauchement sans nouvelle requête.
+    """
+
+    def __init__(self, assignments, absences):
+        """
+        :param assignments: tuples (resource_id, début, fin, id, état)
+        :param absences: tuples (resource_id, début, fin, id, nom)
+        """
+        self.assignment_trees = self._build_trees(assignments)
+        self.absence_trees = self._build_trees(absences)
+
+    def _build_trees(self, rows):
+        by_resource = defaultdict(list)
+        for resource_id, start, end, *value in rows:
+            by_resource[resource_id].append((start, end, tuple(value)))
+        return {
+            resource_id: IntervalTree(intervals)
+            for resource_id, intervals in by_resource.items()
+        }
+
+    def overlapping_assignments(self, resource_id, start, end, exclude_id=None, states=None):
+        """Identifiants des assignations de la ressource qui recoupent la période"""
+        tree = self.assignment_trees.get(resource_id)
+        if not tree:
+            return []
+        return [
+            assignment_id
+            for assignment_id, state in tree.overlapping(start, end)
+            if assignment_id != exclude_id and (states is None or state in states)
+        ]
+
+    def overlapping_absences(self, resource_id, start, end):
+        """Tuples (id, nom) des absences de la ressource qui recoupent la période"""
+        tree = self.absence_trees.get(resource_id)
+        if not tree:
+            return []
+        return tree.overlapping(start, end)
@@ -4,10 +4,26 @@
 from odoo import api, fields, models
 from odoo.tools.translate import _
 from odoo.exceptions import ValidationError
+from odoo.addons.eazynova_intervention.models.distance_matrix import haversine_matrix
+from .planning_conflict import HolidaySet, first_weekend_day
+from .planning_working_time import (
+    CONTINUOUS_TEMPLATE, WorkingTime, get_timezone, to_local, to_local_hours,
+)
+from collections import defaultdict
+from datetime import datetime, time, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Pondération du classement des ressources pour l'assignation automatique
+RANKING_WEIGHTS = {'skill': 0.5, 'load': 0.3, 'distance': 0.2}
+
+# Fenêtre (jours) autour de la tâche pour mesurer la charge des ressources
+RANKING_LOAD_DAYS = 7
+
+# Horizon (jours) de recherche du prochain créneau libre
+FREE_SLOT_HORIZON_DAYS = 90
+
 
 class PlanningResource(models.Model):
     # Peut travailler le week-end ?
@@ -256,87 +272,327 @@ class PlanningResource(models.Model):
         en tenant compte des week-ends et jours fériés
         """
         self.ensure_one()
+        return self.get_availability_batch(date_start, date_end)[self.id]
 
-        # Vérifier les absences
-        absences = self.env['eazynova.planning.absence'].search([
-            ('resource_id', '=', self.id),
-            ('state', '=', 'approved'),
-            '|',
-            '&',
-            ('date_start', '<=', date_start),
-            ('date_end', '>=', date_start),
-            '&', ('date_start', '<=', date_end), ('date_end', '>=', date_end),
-        ])
-        if absences:
-            return {
-                'available': False,
-                'reason': 'absence',
-                'details': absences.mapped('name')
-            }
+    def get_availability_batch(self, date_start, date_end):
+        """
+        Disponibilité de toutes les ressources du recordset sur une période,
+        en un nombre fixe de requêtes
 
-        # Vérifier les assignations existantes
-        assignments = self.env['eazynova.planning.assignment'].search([
-            ('resource_id', '=', self.id),
-            ('state', 'in', ('confirmed', 'in_progress')),
-            '|',
-            '&',
-            ('date_start', '<=', date_start),
-            ('date_end', '>=', date_start),
-            '&', ('date_start', '<=', date_end), ('date_end', '>=', date_end),
-        ])
-        if assignments:
-            return {
-                'available': False,
-                'reason': 'busy',
-                'details': assignments.mapped('task_id.name')
-            }
+        :return: {resource_id: {'available', 'reason', 'details'}}
+        """
+        Assignment = self.env['eazynova.planning.assignment']
+        index = Assignment._build_conflict_index(self, date_start, date_end)
+
+        holiday_sets = {}
 
-        # Vérifier week-end
-        import datetime
-        current = date_start
-        while current <= date_end:
-            if current.weekday() >= 5 and not self.work_weekend:
-                return {
+        results = {}
+        busy = {}
+        for resource in self:
+            # Vérifier les absences
+            absences = index.overlapping_absences(resource.id, date_start, date_end)
+            if absences:
+                results[resource.id] = {
+                    'available': False,
+                    'reason': 'absence',
+                    'details': [name for __, name in absences],
+                }
+                continue
+
+            # Vérifier les assignations existantes
+            assignment_ids = index.overlapping_assignments(
+                resource.id, date_start, date_end,
+                states=('confirmed', 'in_progress'),
+            )
+            if assignment_ids:
+                busy[resource.id] = assignment_ids
+                continue
+
+            # Jours de la période dans le fuseau de la ressource
+            tz = resource._get_tz()
+            date_from = to_local(date_start, tz).date()
+            date_to = to_local(date_end, tz).date()
+
+            # Vérifier week-end
+            weekend_day = first_weekend_day(date_from, date_to)
+            if weekend_day and not resource.work_weekend:
+                results[resource.id] = {
                     'available': False,
                     'reason': 'weekend',
                     'details': [
                         _(
                             "Week-end non autorisé pour cette ressource ("
-                            + current.strftime('%A')
+                            + weekend_day.strftime('%A')
                             + ")"
                         )
                     ]
                 }
-            current += datetime.timedelta(days=1)
-
-        # Vérifier jours fériés
-        if (
-            self.calendar_id and
-            self.calendar_id.holiday_ids and
-            not self.work_holidays
-        ):
-            holidays = self.calendar_id.holiday_ids.mapped('date')
-            current = date_start.date()
-            end = date_end.date()
-            while current <= end:
-                if current in holidays:
-                    return {
+                continue
+
+            # Vérifier jours fériés
+            calendar = resource.calendar_id
+            if calendar and not resource.work_holidays:
+                if calendar.id not in holiday_sets:
+                    holiday_sets[calendar.id] = HolidaySet(
+                        (holiday.date, holiday.is_recurring) for holiday in calendar.holiday_ids
+                    )
+                holiday = holiday_sets[calendar.id].first_in(date_from, date_to)
+                if holiday:
+                    results[resource.id] = {
                         'available': False,
                         'reason': 'holiday',
                         'details': [
                             _(
                                 "Jour férié non autorisé pour cette ressource ("
-                                + current.strftime('%Y-%m-%d')
+                                + holiday.strftime('%Y-%m-%d')
                                 + ")"
                             )
                         ]
                     }
-                current += datetime.timedelta(days=1)
+                    continue
+
+            results[resource.id] = {
+                'available': True,
+                'reason': None,
+                'details': []
+            }
+
+        if busy:
+            # Noms des tâches des assignations en une lecture
+            all_ids = [assignment_id for ids in busy.values() for assignment_id in ids]
+            task_names = {
+                assignment.id: assignment.task_id.name
+                for assignment in Assignment.browse(all_ids)
+            }
+            for resource_id, assignment_ids in busy.items():
+                results[resource_id] = {
+                    'available': False,
+                    'reason': 'busy',
+                    'details': [task_names[assignment_id] for assignment_id in assignment_ids],
+                }
+
+        return results
+
+    def _get_tz(self):
+        """Fuseau de la ressource : son utilisateur, sinon sa société"""
+        self.ensure_one()
+        return get_timezone(self.user_id.tz or self.company_id.partner_id.tz)
+
+    def _get_working_times(self, date_from, date_to, absences=True, busy=False):
+        """
+        Temps de travail de chaque ressource sur une période : semaine type
+        du calendrier moins les jours fériés (sauf si la ressource y
+        travaille), les absences approuvées et, si demandé, les assignations
+        confirmées. Une requête par type d'exclusion pour tout le recordset.
+
+        Les bornes et les exclusions sont converties dans le fuseau de
+        chaque ressource, la semaine type étant en heure locale.
+
+        :return: {resource_id: WorkingTime}
+        """
+        timezones = {resource.id: resource._get_tz() for resource in self}
+        exclusions = defaultdict(list)
+        if absences and self:
+            for absence in self.env['eazynova.planning.absence'].search_read([
+                ('resource_id', 'in', self.ids),
+                ('state', '=', 'approved'),
+                ('date_start', '<=', date_to),
+                ('date_end', '>=', date_from),
+            ], ['resource_id', 'date_start', 'date_end']):
+                tz = timezones[absence['resource_id'][0]]
+                exclusions[absence['resource_id'][0]].append(
+                    (to_local_hours(absence['date_start'], tz), to_local_hours(absence['date_end'], tz))
+                )
+
+        if busy and self:
+            for assignment in self.env['eazynova.planning.assignment'].search_read([
+                ('resource_id', 'in', self.ids),
+                ('state', 'in', ('confirmed', 'in_progress')),
+                ('date_start', '<=', date_to),
+                ('date_end', '>=', date_from),
+            ], ['resource_id', 'date_start', 'date_end']):
+                tz = timezones[assignment['resource_id'][0]]
+                exclusions[assignment['resource_id'][0]].append(
+                    (to_local_hours(assignment['date_start'], tz), to_local_hours(assignment['date_end'], tz))
+                )
+
+        Calendar = self.env['eazynova.planning.calendar']
+        holidays = {}
+        working_times = {}
+        for resource in self:
+            tz = timezones[resource.id]
+            calendar = resource.calendar_id
+            if not calendar:
+                # Sans calendrier, la ressource est disponible en continu
+                working_times[resource.id] = WorkingTime(CONTINUOUS_TEMPLATE, exclusions[resource.id], tz)
+                continue
+
+            resource_exclusions = exclusions[resource.id]
+            if not resource.work_holidays:
+                key = (calendar.id, tz.zone)
+                if key not in holidays:
+                    holidays[key] = calendar._get_holiday_intervals(date_from, date_to, tz)
+                resource_exclusions = resource_exclusions + holidays[key]
+
+            working_times[resource.id] = WorkingTime(
+                Calendar._get_working_template(calendar.id), resource_exclusions, tz
+            )
+
+        return working_times
+
+    def get_working_hours(self, date_start, date_end):
+        """
+        Heures travaillables de chaque ressource entre deux dates
+
+        :return: {resource_id: heures}
+        """
+        working_times = self._get_working_times(date_start, date_end)
+        return {
+            resource_id: working_time.working_hours(date_start, date_end)
+            for resource_id, working_time in working_times.items()
+        }
+
+    def get_next_free_slot(self, hours, date_from=None, horizon_days=FREE_SLOT_HORIZON_DAYS):
+        """
+        Premier créneau continu de `hours` heures travaillables, hors
+        absences et assignations confirmées, pour chaque ressource
+
+        :return: {resource_id: (début, fin) ou None}
+        """
+        date_from = date_from or fields.Datetime.now()
+        date_to = date_from + timedelta(days=horizon_days)
+        working_times = self._get_working_times(date_from, date_to, busy=True)
+        return {
+            resource_id: working_time.next_free_slot(date_from, hours, date_to)
+            for resource_id, working_time in working_times.items()
+        }
+
+    def get_capacity_heatmap(self, date_from, date_to):
+        """
+        Capacité journalière de chaque ressource entre deux dates incluses :
+        heures travaillables, heures planifiées (assignations confirmées ou
+        en cours, au prorata de l'allocation) et heures libres. Les jours
+        sont ceux du fuseau de chaque ressource.
+
+        :return: {resource_id: {date: {'capacity', 'planned', 'free'}}}
+        """
+        # Fenêtre en heure locale ; la recherche en UTC est élargie d'un
+        # jour de chaque côté pour couvrir tous les fuseaux
+        window_start = datetime.combine(date_from, time.min)
+        window_end = datetime.combine(date_to + timedelta(days=1), time.min)
+        search_start = window_start - timedelta(days=1)
+        search_end = window_end + timedelta(days=1)
+        working_times = self._get_working_times(search_start, search_end)
+
+        heatmap = {
+            resource_id: {
+                day: {'capacity': hours, 'planned': 0.0, 'free': hours}
+                for day, hours in working_time.daily_hours(date_from, date_to).items()
+            }
+            for resource_id, working_time in working_times.items()
+        }
+        if not self:
+            return heatmap
+
+        assignments = self.env['eazynova.planning.assignment'].search_read([
+            ('resource_id', 'in', self.ids),
+            ('state', 'in', ('confirmed', 'in_progress')),
+            ('date_start', '<', search_end),
+            ('date_end', '>', search_start),
+        ], ['resource_id', 'date_start', 'date_end', 'allocation_percentage'])
+
+        for assignment in assignments:
+            resource_id = assignment['resource_id'][0]
+            working_time = working_times[resource_id]
+            ratio = (assignment['allocation_percentage'] or 0.0) / 100.0
+            start = max(to_local(assignment['date_start'], working_time.tz), window_start)
+            end = min(to_local(assignment['date_end'], working_time.tz), window_end)
+
+            day = start.date()
+            while day <= date_to and datetime.combine(day, time.min) < end:
+                day_start = datetime.combine(day, time.min)
+                day_end = day_start + timedelta(days=1)
+                cell = heatmap[resource_id][day]
+                cell['planned'] += ratio * working_time.local_working_hours(
+                    max(start, day_start), min(end, day_end)
+                )
+                cell['free'] = max(cell['capacity'] - cell['planned'], 0.0)
+                day += timedelta(days=1)
+
+        return heatmap
+
+    def rank_for_task(self, task, skills=None):
+        """
+        Classe les ressources pour une tâche selon l'adéquation des
+        compétences, la charge sur la période et la distance au lieu de la
+        tâche
+
+        :param task: eazynova.planning.task
+        :param skills: compétences requises (par défaut celles de la tâche)
+        :return: {resource_id: score entre 0 et 1}
+        """
+        if not self:
+            return {}
+
+        skills = skills if skills is not None else task.resource_skill_ids
+
+        # Charge : heures planifiées rapportées à la capacité autour de la tâche
+        heatmap = self.get_capacity_heatmap(
+            task.date_start.date() - timedelta(days=RANKING_LOAD_DAYS),
+            task.date_end.date() + timedelta(days=RANKING_LOAD_DAYS),
+        )
+
+        distances = self._get_distances_to(task.location_latitude, task.location_longitude)
+        max_distance = max(distances.values(), default=0.0)
+
+        scores = {}
+        for resource in self:
+            if skills:
+                skill_score = len(skills & resource.skill_ids) / len(skills)
+            else:
+                skill_score = 1.0
+
+            capacity = sum(day['capacity'] for day in heatmap[resource.id].values())
+            planned = sum(day['planned'] for day in heatmap[resource.id].values())
+            load_score = 1.0 - min(planned / capacity, 1.0) if capacity else 0.0
+
+            if resource.id in distances and max_distance:
+                distance_score = 1.0 - distances[resource.id] / max_distance
+            else:
+                distance_score = 0.5 if task.location_latitude else 1.0
+
+            scores[resource.id] = (
+                RANKING_WEIGHTS['skill'] * skill_score
+                + RANKING_WEIGHTS['load'] * load_score
+                + RANKING_WEIGHTS['distance'] * distance_score
+            )
 
+        return scores
+
+    def _get_distances_to(self, latitude, longitude):
+        """Distance (km) de chaque ressource humaine à un point, d'après la
+        dernière position connue de l'employé"""
+        if not latitude or not longitude:
+            return {}
+
+        employees = self.employee_id
+        positions = self.env['intervention.distance.matrix']._get_technician_positions(employees)
+
+        resource_positions = [
+            (resource.id, positions[resource.employee_id.id])
+            for resource in self
+            if resource.employee_id.id in positions
+        ]
+        if not resource_positions:
+            return {}
+
+        matrix = haversine_matrix(
+            [position for __, position in resource_positions],
+            [(latitude, longitude)],
+        )
         return {
-            'available': True,
-            'reason': None,
-            'details': []
+            resource_id: float(matrix[row, 0])
+            for row, (resource_id, __) in enumerate(resource_positions)
         }
 
     def action_create_absence(self):
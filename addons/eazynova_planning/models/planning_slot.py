@@ -2,6 +2,7 @@
 
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from .planning_calendar import WORKING_TIME_DEPENDS
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -73,6 +74,18 @@ class PlanningSlot(models.Model):
         compute='_compute_remaining_capacity',
         store=True
     )
+    working_hours = fields.Float(
+        string="Heures ouvrées",
+        compute='_compute_working_hours',
+        store=True,
+        help="Heures travaillables du créneau selon le calendrier de la ressource"
+    )
+    remaining_hours = fields.Float(
+        string="Heures disponibles",
+        compute='_compute_remaining_capacity',
+        store=True,
+        help="Heures ouvrées du créneau non encore allouées"
+    )
 
     # Répétition
     is_recurring = fields.Boolean(string="Récurrent")
@@ -102,11 +115,34 @@ class PlanningSlot(models.Model):
             else:
                 slot.duration = 0.0
 
-    @api.depends('capacity', 'allocated')
+    @api.depends('date_start', 'date_end', 'resource_id.calendar_id', 'resource_id.work_holidays',
+                 'resource_id.user_id.tz', 'resource_id.company_id.partner_id.tz',
+                 *(f'resource_id.calendar_id.{path}' for path in WORKING_TIME_DEPENDS))
+    def _compute_working_hours(self):
+        """Heures ouvrées du créneau selon le calendrier de la ressource"""
+        slots = self.filtered(lambda s: s.resource_id and s.date_start and s.date_end)
+        working_times = {}
+        if slots:
+            working_times = slots.resource_id._get_working_times(
+                min(slots.mapped('date_start')),
+                max(slots.mapped('date_end')),
+            )
+        for slot in self:
+            if slot in slots:
+                slot.working_hours = working_times[slot.resource_id.id].working_hours(
+                    slot.date_start, slot.date_end)
+            else:
+                slot.working_hours = 0.0
+
+    @api.depends('capacity', 'allocated', 'working_hours')
     def _compute_remaining_capacity(self):
         """Calcule la capacité restante"""
         for slot in self:
             slot.remaining_capacity = slot.capacity - slot.allocated
+            if slot.capacity:
+                slot.remaining_hours = slot.working_hours * max(slot.remaining_capacity, 0.0) / slot.capacity
+            else:
+                slot.remaining_hours = 0.0
 
     @api.depends('state', 'remaining_capacity')
     def _compute_color(self):
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from datetime import datetime, time, timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+SYNC_WATERMARK_PARAM = 'eazynova_planning.assignment_sync_watermark'
+
+# Marge de recouvrement entre deux exécutions : une source modifiée par une
+# transaction encore ouverte au début de la synchronisation est reprise la
+# fois suivante (sans effet si rien n'a changé).
+SYNC_OVERLAP = timedelta(minutes=10)
+
+SOURCE_TYPES = ('intervention', 'chantier')
+INTERVENTION_ACTIVE_STATES = ('planifie', 'en_cours')
+CHANTIER_ACTIVE_STATES = ('in_progress',)
+
+# Champs de l'assignation alimentés par la source ; les autres (état,
+# allocation, notes...) restent modifiables à la main
+ASSIGNMENT_SOURCE_FIELDS = (
+    'type', 'intervention_id', 'chantier_id', 'resource_id',
+    'date_start', 'date_end', 'client_id', 'donneur_ordre_id',
+)
+TASK_SOURCE_FIELDS = ('name', 'date_start', 'date_end')
+
+
+class PlanningAssignmentSync(models.AbstractModel):
+    """
+    Synchronisation incrémentale du planning global.
+
+    Les interventions et chantiers modifiés depuis la dernière exécution
+    (filigrane sur write_date) sont comparés aux assignations existantes
+    par une clé de source stable. Les nouvelles assignations sont créées en
+    lot, celles dont la source a changé sont mises à jour champ par champ et
+    celles dont la source a disparu sont archivées.
+    """
+    _name = 'eazynova.planning.assignment.sync'
+    _description = 'Synchronisation du planning global'
+
+    @api.model
+    def run(self, full=False, source_types=SOURCE_TYPES):
+        """
+        Synchronise les assignations avec leurs sources
+
+        :param full: compare toutes les sources actives, sans filigrane
+        :param source_types: types de sources à synchroniser
+        :return: statistiques {'created', 'updated', 'archived', 'skipped'}
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        started_at = fields.Datetime.now()
+
+        watermark = None
+        if not full:
+            value = ICP.get_param(SYNC_WATERMARK_PARAM)
+            watermark = fields.Datetime.to_datetime(value) if value else None
+
+        desired = {}
+        seen_keys = set()
+        for source_type in source_types:
+            collect = getattr(self, '_collect_%s_sources' % source_type)
+            collect(watermark, desired, seen_keys)
+
+        stats = self._apply(desired, seen_keys, source_types, watermark is None)
+
+        if set(source_types) >= set(SOURCE_TYPES):
+            ICP.set_param(SYNC_WATERMARK_PARAM, fields.Datetime.to_string(started_at - SYNC_OVERLAP))
+
+        _logger.info(
+            "Synchronisation du planning (%s): %d créée(s), %d mise(s) à jour, "
+            "%d archivée(s), %d ignorée(s) sans ressource",
+            'complète' if watermark is None else 'incrémentale',
+            stats['created'], stats['updated'], stats['archived'], stats['skipped'],
+        )
+        return stats
+
+    # ------------------------------------------------------------------
+    # Collecte des sources
+    # ------------------------------------------------------------------
+
+    def _collect_intervention_sources(self, watermark, desired, seen_keys):
+        """Valeurs attendues pour les interventions à synchroniser"""
+        if watermark:
+            domain = [('write_date', '>', watermark)]
+        else:
+            domain = [('statut', 'in', INTERVENTION_ACTIVE_STATES)]
+
+        interventions = self.env['intervention.intervention'].with_context(
+            active_test=False
+        ).search(domain)
+
+        active = interventions.filtered(lambda i: i.statut in INTERVENTION_ACTIVE_STATES)
+        resources = self._get_resources_by_employee(active.technicien_principal_id)
+
+        for inter in interventions:
+            key = 'intervention,%d' % inter.id
+            seen_keys.add(key)
+            if inter not in active:
+                continue
+
+            date_start = inter.date_prevue
+            date_end = inter.date_calendar_stop or date_start + timedelta(hours=inter.duree_prevue or 2.0)
+            desired[key] = {
+                'task': {
+                    'name': inter.numero,
+                    'date_start': date_start,
+                    'date_end': max(date_end, date_start + timedelta(hours=1)),
+                },
+                'assignment': {
+                    'type': 'intervention',
+                    'intervention_id': inter.id,
+                    'chantier_id': False,
+                    'resource_id': resources.get(inter.technicien_principal_id.id, False),
+                    'client_id': inter.client_final_id.id,
+                    'donneur_ordre_id': inter.donneur_ordre_id.id,
+                },
+            }
+
+    def _collect_chantier_sources(self, watermark, desired, seen_keys):
+        """Valeurs attendues pour les chantiers à synchroniser"""
+        if watermark:
+            domain = [('write_date', '>', watermark)]
+        else:
+            domain = [('state', 'in', CHANTIER_ACTIVE_STATES)]
+
+        chantiers = self.env['chantier.chantier'].with_context(active_test=False).search(domain)
+
+        active = chantiers.filtered(lambda c: c.state in CHANTIER_ACTIVE_STATES)
+        resources = self._get_resources_by_user(active.user_id)
+
+        for chantier in chantiers:
+            key = 'chantier,%d' % chantier.id
+            seen_keys.add(key)
+            if chantier not in active:
+                continue
+
+            date_start = datetime.combine(chantier.date_debut, time.min)
+            date_end = datetime.combine(chantier.date_fin_prevue or chantier.date_debut, time(23, 59, 59))
+            desired[key] = {
+                'task': {
+                    'name': chantier.title or chantier.name,
+                    'date_start': date_start,
+                    'date_end': max(date_end, date_start + timedelta(hours=1)),
+                },
+                'assignment': {
+                    'type': 'chantier',
+                    'intervention_id': False,
+                    'chantier_id': chantier.id,
+                    'resource_id': resources.get(chantier.user_id.id, False),
+                    'client_id': chantier.partner_id.id,
+                    'donneur_ordre_id': False,
+                },
+            }
+
+    def _get_resources_by_employee(self, employees):
+        """{employee_id: resource_id} en une requête"""
+        resources = {}
+        if employees:
+            for resource in self.env['eazynova.planning.resource'].search([
+                ('employee_id', 'in', employees.ids),
+            ]):
+                resources.setdefault(resource.employee_id.id, resource.id)
+        return resources
+
+    def _get_resources_by_user(self, users):
+        """{user_id: resource_id} en une requête"""
+        resources = {}
+        if users:
+            for resource in self.env['eazynova.planning.resource'].search([
+                ('user_id', 'in', users.ids),
+            ]):
+                resources.setdefault(resource.user_id.id, resource.id)
+        return resources
+
+    # ------------------------------------------------------------------
+    # Application des différences
+    # ------------------------------------------------------------------
+
+    def _apply(self, desired, seen_keys, source_types, full):
+        """Crée, met à jour et archive les assignations"""
+        Assignment = self.env['eazynova.planning.assignment'].with_context(
+            active_test=False, tracking_disable=True
+        )
+        stats = {'created': 0, 'updated': 0, 'archived': 0, 'skipped': 0}
+
+        if full:
+            # Toutes les assignations synchronisées de ces types sont comparées
+            existing = Assignment.search([('type', 'in', list(source_types)), ('source_key', '!=', False)])
+        else:
+            existing = Assignment.search([('source_key', 'in', list(seen_keys))])
+        existing_by_key = {assignment.source_key: assignment for assignment in existing}
+
+        to_create = []
+        for key, vals in desired.items():
+            # Date de l'assignation alignée sur la tâche
+            vals['assignment'].update({
+                'date_start': vals['task']['date_start'],
+                'date_end': vals['task']['date_end'],
+            })
+
+            assignment = existing_by_key.get(key)
+            if not assignment:
+                if vals['assignment']['resource_id']:
+                    to_create.append((key, vals))
+                else:
+                    stats['skipped'] += 1
+                continue
+
+            if self._update_assignment(assignment, vals):
+                stats['updated'] += 1
+
+        if to_create:
+            tasks = self.env['eazynova.planning.task'].with_context(tracking_disable=True).create([
+                dict(vals['task'], state='planned') for __, vals in to_create
+            ])
+            Assignment.create([
+                dict(vals['assignment'], source_key=key, task_id=task.id)
+                for (key, vals), task in zip(to_create, tasks)
+            ])
+            stats['created'] = len(to_create)
+
+        # Sources disparues : sorties de l'état actif ou supprimées
+        vanished = existing.filtered(lambda a: a.active and a.source_key not in desired)
+        vanished |= Assignment.search([
+            ('active', '=', True),
+            ('source_key', '!=', False),
+            ('type', 'in', list(source_types)),
+            ('intervention_id', '=', False),
+            ('chantier_id', '=', False),
+        ])
+        if vanished:
+            vanished.write({'active': False})
+            stats['archived'] = len(vanished)
+
+        return stats
+
+    def _update_assignment(self, assignment, vals):
+        """Écrit uniquement les champs dont la valeur source a changé"""
+        task_changes = self._get_changes(assignment.task_id, vals['task'], TASK_SOURCE_FIELDS)
+        if task_changes:
+            assignment.task_id.write(task_changes)
+
+        assignment_vals = dict(vals['assignment'])
+        if not assignment_vals['resource_id']:
+            # Ressource introuvable : conserver l'affectation existante
+            assignment_vals.pop('resource_id')
+
+        changes = self._get_changes(assignment, assignment_vals, ASSIGNMENT_SOURCE_FIELDS)
+        if not assignment.active:
+            changes['active'] = True
+        if changes:
+            assignment.write(changes)
+
+        return bool(changes or task_changes)
+
+    def _get_changes(self, record, vals, field_names):
+        changes = {}
+        for field_name in field_names:
+            if field_name not in vals:
+                continue
+            current = record[field_name]
+            if isinstance(current, models.BaseModel):
+                current = current.id
+            if current != vals[field_name]:
+                changes[field_name] = vals[field_name]
+        return changes
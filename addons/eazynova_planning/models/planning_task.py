@@ -138,12 +138,13 @@ class PlanningTask(models.Model):
     # Couleur pour le calendrier
     color = fields.Integer(string="Couleur", default=0)
 
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Génère la référence à la création"""
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('eazynova.planning.task') or _('New')
-        return super(PlanningTask, self).create(vals)
+        for vals in vals_list:
+            if vals.get('reference', _('New')) == _('New'):
+                vals['reference'] = self.env['ir.sequence'].next_by_code('eazynova.planning.task') or _('New')
+        return super(PlanningTask, self).create(vals_list)
 
     @api.depends('date_start', 'date_end')
     def _compute_duration(self):
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+import logging
+
+import pytz
+
+_logger = logging.getLogger(__name__)
+
+WEEK_HOURS = 168.0
+
+# Lundi de référence : les dates sont converties en heures écoulées depuis
+# cette date, la semaine type se répète donc tous les 168 h
+EPOCH = datetime(2000, 1, 3)
+
+DAYS_OF_WEEK = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Tolérance sur les comparaisons d'heures (flottants)
+EPSILON = 1e-6
+
+
+def get_timezone(name):
+    """Fuseau horaire pytz d'après son nom (UTC si vide ou inconnu)"""
+    try:
+        return pytz.timezone(name) if name else pytz.utc
+    except pytz.UnknownTimeZoneError:
+        _logger.warning("Fuseau horaire inconnu: %s", name)
+        return pytz.utc
+
+
+def to_local(value, tz):
+    """Datetime naïf UTC (valeur stockée) → heure locale naïve"""
+    return pytz.utc.localize(value).astimezone(tz).replace(tzinfo=None)
+
+
+def to_utc(value, tz):
+    """Heure locale naïve → datetime naïf UTC (valeur stockée)"""
+    return tz.localize(value).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def to_hours(value):
+    """Heures écoulées depuis EPOCH (heure locale)"""
+    return (value - EPOCH).total_seconds() / 3600.0
+
+
+def to_local_hours(value, tz):
+    """Heures locales écoulées depuis EPOCH d'un datetime naïf UTC"""
+    return to_hours(to_local(value, tz))
+
+
+def from_hours(hours):
+    """Date correspondant à un nombre d'heures depuis EPOCH (à la seconde)"""
+    return EPOCH + timedelta(seconds=round(hours * 3600.0))
+
+
+def day_interval(day):
+    """Intervalle en heures couvrant une journée entière (minuit local)"""
+    start = to_hours(datetime.combine(day, time.min))
+    return start, start + 24.0
+
+
+def merge_intervals(intervals):
+    """Fusionne les intervalles qui se chevauchent ou se touchent"""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class WorkingTimeTemplate:
+    """
+    Semaine type d'un calendrier, compilée.
+
+    Les créneaux sont fusionnés en intervalles triés (heures depuis le lundi
+    0 h) avec le cumul des heures ouvrées avant chacun : le nombre d'heures
+    ouvrées avant un instant quelconque s'obtient par une recherche
+    dichotomique, sans parcourir les jours.
+    """
+
+    __slots__ = ('starts', 'ends', 'before', 'week_hours')
+
+    def __init__(self, slots):
+        """
+        :param slots: itérable de tuples (jour 0-6, heure début, heure fin)
+        """
+        intervals = merge_intervals(
+            (day * 24.0 + hour_start, day * 24.0 + hour_end)
+            for day, hour_start, hour_end in slots
+        )
+        self.starts = [start for start, __ in intervals]
+        self.ends = [end for __, end in intervals]
+        self.before = []
+        total = 0.0
+        for start, end in intervals:
+            self.before.append(total)
+            total += end - start
+        self.week_hours = total
+
+    def cumulative(self, t):
+        """Heures ouvrées entre EPOCH et l'instant t (en heures)"""
+        weeks, offset = divmod(t, WEEK_HOURS)
+        index = bisect_right(self.starts, offset) - 1
+        within = 0.0
+        if index >= 0:
+            within = self.before[index] + min(offset, self.ends[index]) - self.starts[index]
+        return weeks * self.week_hours + within
+
+    def position(self, cumulative):
+        """Premier instant (en heures) où le cumul d'heures ouvrées est atteint"""
+        if not self.week_hours:
+            return None
+        weeks, rest = divmod(cumulative, self.week_hours)
+        index = bisect_left(self.before, rest) - 1
+        if index < 0:
+            # Cumul atteint à la fin du dernier créneau de la semaine précédente
+            return (weeks - 1) * WEEK_HOURS + self.ends[-1]
+        return weeks * WEEK_HOURS + self.starts[index] + rest - self.before[index]
+
+    def intervals(self, t_from, t_to):
+        """Intervalles ouvrés (en heures) compris entre t_from et t_to"""
+        week = int(t_from // WEEK_HOURS)
+        while week * WEEK_HOURS < t_to:
+            base = week * WEEK_HOURS
+            for start, end in zip(self.starts, self.ends):
+                start, end = max(base + start, t_from), min(base + end, t_to)
+                if start < end:
+                    yield start, end
+            week += 1
+
+
+# Semaine type d'une ressource sans calendrier : disponible en continu
+CONTINUOUS_TEMPLATE = WorkingTimeTemplate([(day, 0.0, 24.0) for day in range(7)])
+
+
+class WorkingTime:
+    """
+    Temps de travail d'une ressource : semaine type moins les périodes
+    exclues (jours fériés, absences, assignations).
+
+    Les exclusions sont fusionnées et cumulées comme la semaine type, si
+    bien que les heures ouvrées entre deux dates restent en O(log n).
+
+    La semaine type est en heure locale : les dates reçues et rendues sont
+    des datetimes naïfs UTC (valeurs des champs Datetime), convertis dans
+    le fuseau de la ressource.
+    """
+
+    __slots__ = ('template', 'tz', 'ex_starts', 'ex_ends', 'ex_before')
+
+    def __init__(self, template, exclusions=(), tz=pytz.utc):
+        """
+        :param template: WorkingTimeTemplate
+        :param exclusions: itérable de tuples (début, fin) en heures locales
+        :param tz: fuseau horaire pytz de la ressource
+        """
+        self.template = template
+        self.tz = tz
+        intervals = merge_intervals(exclusions)
+        self.ex_starts = [start for start, __ in intervals]
+        self.ex_ends = [end for __, end in intervals]
+        self.ex_before = []
+        total = 0.0
+        for start, end in intervals:
+            self.ex_before.append(total)
+            total += template.cumulative(end) - template.cumulative(start)
+
+    def _excluded(self, t):
+        """Heures ouvrées exclues entre EPOCH et l'instant t"""
+        index = bisect_right(self.ex_starts, t) - 1
+        if index < 0:
+            return 0.0
+        return (
+            self.ex_before[index]
+            + self.template.cumulative(min(t, self.ex_ends[index]))
+            - self.template.cumulative(self.ex_starts[index])
+        )
+
+    def cumulative(self, t):
+        """Heures réellement travaillables entre EPOCH et l'instant t"""
+        return self.template.cumulative(t) - self._excluded(t)
+
+    def working_hours(self, date_start, date_end):
+        """Heures travaillables entre deux dates (UTC)"""
+        if date_end <= date_start:
+            return 0.0
+        return self.local_working_hours(to_local(date_start, self.tz), to_local(date_end, self.tz))
+
+    def local_working_hours(self, date_start, date_end):
+        """Heures travaillables entre deux heures locales"""
+        if date_end <= date_start:
+            return 0.0
+        return max(self.cumulative(to_hours(date_end)) - self.cumulative(to_hours(date_start)), 0.0)
+
+    def plan_hours(self, date_start, hours):
+        """Date (UTC) à laquelle `hours` heures travaillables sont écoulées, ou None"""
+        if not self.template.week_hours:
+            return None
+        t = to_local_hours(date_start, self.tz)
+        target = self.cumulative(t) + hours
+        # Chaque itération atteint la cible ou franchit une exclusion
+        for __ in range(2 * len(self.ex_starts) + 2):
+            missing = target - self.cumulative(t)
+            if missing <= EPSILON:
+                break
+            index = bisect_right(self.ex_starts, t) - 1
+            if index >= 0 and t < self.ex_ends[index]:
+                t = self.ex_ends[index]
+            else:
+                t = self.template.position(self.template.cumulative(t) + missing)
+        return to_utc(from_hours(t), self.tz)
+
+    def free_intervals(self, t_from, t_to):
+        """Intervalles travaillables (en heures) entre t_from et t_to"""
+        index = bisect_right(self.ex_ends, t_from)
+        count = len(self.ex_starts)
+        for start, end in self.template.intervals(t_from, t_to):
+            while start < end:
+                while index < count and self.ex_ends[index] <= start:
+                    index += 1
+                if index < count and self.ex_starts[index] < end:
+                    if self.ex_starts[index] > start:
+                        yield start, self.ex_starts[index]
+                    start = self.ex_ends[index]
+                else:
+                    yield start, end
+                    break
+
+    def next_free_slot(self, date_from, hours, date_to):
+        """
+        Premier créneau continu de `hours` heures travaillables
+
+        :return: tuple (début, fin) en UTC ou None si aucun avant date_to
+        """
+        stretch_start = stretch_end = None
+        t_from, t_to = to_local_hours(date_from, self.tz), to_local_hours(date_to, self.tz)
+        for start, end in self.free_intervals(t_from, t_to):
+            if stretch_end is None or start > stretch_end + EPSILON:
+                stretch_start = start
+            stretch_end = end
+            if stretch_end - stretch_start >= hours - EPSILON:
+                return (
+                    to_utc(from_hours(stretch_start), self.tz),
+                    to_utc(from_hours(stretch_start + hours), self.tz),
+                )
+        return None
+
+    def daily_hours(self, date_from, date_to):
+        """
+        Heures travaillables de chaque jour (local) entre deux dates incluses
+
+        :return: {date: heures}
+        """
+        result = {}
+        day = date_from
+        previous = self.cumulative(day_interval(day)[0])
+        while day <= date_to:
+            current = self.cumulative(day_interval(day)[1])
+            result[day] = current - previous
+            previous = current
+            day += timedelta(days=1)
+        return result
@@ -56,6 +56,13 @@ class PlanningAutoAssignWizard(models.TransientModel):
         help="Autoriser l'assignation même en cas de conflit"
     )
 
+    rank_resources = fields.Boolean(
+        string="Classer les ressources",
+        default=True,
+        help="Pré-sélectionner en priorité les ressources dont les compétences, "
+             "la charge et la distance conviennent le mieux à la tâche"
+    )
+
     # Résultats
     available_resource_ids = fields.Many2many(
         'eazynova.planning.resource',
@@ -97,21 +104,20 @@ class PlanningAutoAssignWizard(models.TransientModel):
 
         # Filtrer par disponibilité si demandé
         if self.check_availability and not self.allow_conflicts:
-            available_resources = self.env['eazynova.planning.resource']
-
-            for resource in resources:
-                availability = resource.get_availability(
-                    self.task_id.date_start,
-                    self.task_id.date_end
-                )
-
-                if availability['available']:
-                    available_resources |= resource
-                elif self.ignore_absences and availability['reason'] != 'busy':
-                    # Si on ignore les absences, on garde la ressource si elle n'est pas occupée
-                    available_resources |= resource
+            availabilities = resources.get_availability_batch(
+                self.task_id.date_start,
+                self.task_id.date_end
+            )
+            resources = resources.filtered(
+                lambda r: availabilities[r.id]['available']
+                # Si on ignore les absences, on garde la ressource si elle n'est pas occupée
+                or (self.ignore_absences and availabilities[r.id]['reason'] != 'busy')
+            )
 
-            resources = available_resources
+        # Classer les ressources, les mieux adaptées en premier
+        if self.rank_resources and resources:
+            scores = resources.rank_for_task(self.task_id, skills=self.skill_ids)
+            resources = resources.sorted(lambda r: (-scores[r.id], r.id))
 
         self.available_resource_ids = resources
 
@@ -153,13 +159,17 @@ class PlanningAutoAssignWizard(models.TransientModel):
 
         created_assignments = self.env['eazynova.planning.assignment']
 
+        availabilities = {}
+        if not self.allow_conflicts:
+            availabilities = self.selected_resource_ids.get_availability_batch(
+                self.task_id.date_start,
+                self.task_id.date_end
+            )
+
         for resource in self.selected_resource_ids:
             # Vérifier les conflits si demandé
             if not self.allow_conflicts:
-                availability = resource.get_availability(
-                    self.task_id.date_start,
-                    self.task_id.date_end
-                )
+                availability = availabilities[resource.id]
 
                 if not availability['available']:
                     _logger.warning(
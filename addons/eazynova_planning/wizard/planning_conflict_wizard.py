@@ -56,37 +56,51 @@ class PlanningConflictWizard(models.TransientModel):
     def _detect_conflicts(self):
         """Détecte tous les conflits de planning"""
         conflicts = []
+        Assignment = self.env['eazynova.planning.assignment']
 
-        # Conflits d'assignation (ressource assignée plusieurs fois)
-        assignments = self.env['eazynova.planning.assignment'].search([
+        assignments = Assignment.search([
             ('state', 'in', ('confirmed', 'in_progress'))
         ])
+        absences = self.env['eazynova.planning.absence'].search([
+            ('state', '=', 'approved')
+        ])
 
+        records = assignments + absences
+        if not records:
+            return conflicts
+
+        # Un seul index pour les assignations et les absences concernées
+        index = Assignment._build_conflict_index(
+            assignments.resource_id | absences.resource_id,
+            min(records.mapped('date_start')),
+            max(records.mapped('date_end')),
+        )
+
+        # Conflits d'assignation (ressource assignée plusieurs fois)
+        details = assignments._get_conflict_details(index)
         for assignment in assignments:
-            if assignment.has_conflict:
+            if details.get(assignment.id):
                 conflicts.append({
                     'conflict_type': 'assignment',
                     'assignment_id': assignment.id,
                     'resource_id': assignment.resource_id.id,
-                    'description': assignment.conflict_details,
+                    'description': "\n".join(details[assignment.id]),
                 })
 
         # Conflits absence/assignation
-        absences = self.env['eazynova.planning.absence'].search([
-            ('state', '=', 'approved')
-        ])
-
         for absence in absences:
-            conflict_assignments = absence.check_assignment_conflicts()
-            if conflict_assignments:
-                for assignment in conflict_assignments:
-                    conflicts.append({
-                        'conflict_type': 'absence_conflict',
-                        'assignment_id': assignment.id,
-                        'absence_id': absence.id,
-                        'resource_id': absence.resource_id.id,
-                        'description': f"La ressource {absence.resource_id.name} est absente ({absence.name})",
-                    })
+            assignment_ids = index.overlapping_assignments(
+                absence.resource_id.id, absence.date_start, absence.date_end,
+                states=('confirmed', 'in_progress'),
+            )
+            for assignment_id in assignment_ids:
+                conflicts.append({
+                    'conflict_type': 'absence_conflict',
+                    'assignment_id': assignment_id,
+                    'absence_id': absence.id,
+                    'resource_id': absence.resource_id.id,
+                    'description': f"La ressource {absence.resource_id.name} est absente ({absence.name})",
+                })
 
         return conflicts
 